@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Firecrawl Benchmark - 基于本地模拟服务器的下载器基准测试
+
+启动 mock_server.py 的模拟服务器，让下载器通过 FIRECRAWL_API_URL 连接它，测量:
+    - single: 单个 URL 顺序抓取的延迟 (p50 / p95)
+    - batch: 不同并发数下的批量吞吐量 (页/秒)
+    - memory: 抓取并保存超大页面时的内存峰值 (tracemalloc)
+    - ratelimit: 服务器按滑动窗口配额限流时（约 30 秒），未指定 --rpm 的限速器能达到配额的多少吞吐量、
+      最终速率是否收敛到配额附近；同时检查并发的多个 429 只降速一次
+
+不需要网络和 API 额度，可以在 CI 中运行，用 --json 保存结果，用 --compare 与基线比较。
+
+用法:
+    python benchmark.py [选项]
+
+参数:
+    --latency: 模拟服务器平均延迟毫秒数 (可选，默认 20)
+    --jitter: 延迟随机波动毫秒数 (可选，默认 5)
+    --size: 普通页面的 markdown 字节数 (可选，默认 8192)
+    --requests: single 和每个并发级别的请求数 (可选，默认 50)
+    --concurrency: 批量测试的并发级别，逗号分隔 (可选，默认 1,3,8,16)
+    --large-size: memory 测试的页面大小 MB (可选，默认 50)
+    --formats: 请求的格式 (可选，默认 markdown)
+    --sink: 输出方式 files / jsonl / sqlite (可选，默认 files)
+    --error-rate / --rate-limit-rate: 模拟服务器的错误率和限流率 (可选，默认 0)
+    --quota-rate: ratelimit 场景的服务器配额，每秒请求数 (可选，默认 15)
+    --only: 只运行指定场景，逗号分隔 (single, batch, memory, ratelimit；默认不含 ratelimit)
+    --json: 把结果写入 JSON 文件
+    --compare: 与之前保存的 JSON 结果比较，显示变化百分比
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from download import DEFAULT_MAX_RETRIES, Downloader, Metrics, RateLimiter, percentile, validate_format
+from mock_server import MockConfig, MockServer
+
+
+MOCK_API_KEY = "fc-mock"
+
+# 结果中数值越小越好的指标，比较时据此判断变好还是变差
+LOWER_IS_BETTER = ("seconds", "bytes", "ratio")
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽下载器的逐条输出，避免终端输出影响测量"""
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+# ratelimit 场景的配额窗口秒数、持续秒数和重试次数（限流时页面不应因重试次数耗尽而失败）
+QUOTA_WINDOW = 2.0
+QUOTA_SECONDS = 30
+QUOTA_RETRIES = 20
+
+
+def make_downloader(server: MockServer, concurrency: int, sink: str,
+                    max_retries: int = DEFAULT_MAX_RETRIES) -> Downloader:
+    """不使用缓存的下载器，每个场景使用独立的指标"""
+    limiter = RateLimiter(max_concurrency=concurrency, max_retries=max_retries, base_delay=0.05, max_delay=1)
+    return Downloader(MOCK_API_KEY, limiter=limiter, cache=None, sink=sink, metrics=Metrics(),
+                      api_url=server.url)
+
+
+def bench_single(server: MockServer, output_dir: Path, formats: list[str], requests: int, sink: str) -> dict:
+    """顺序抓取 requests 个 URL，测量单个请求的延迟"""
+    downloader = make_downloader(server, 1, sink)
+    with quiet():
+        for i in range(requests):
+            downloader.download(f"https://bench.example.com/single/{i}", str(output_dir), formats)
+        downloader.close()
+
+    page = downloader.metrics.samples("page_seconds")
+    write = downloader.metrics.samples("write_seconds")
+    return {
+        "requests": requests,
+        "p50_seconds": percentile(page, 50),
+        "p95_seconds": percentile(page, 95),
+        "mean_seconds": sum(page) / len(page),
+        # 减去服务器延迟后的本地开销（客户端、解析和写入）
+        "overhead_p50_seconds": percentile(page, 50) - server.config.latency / 1000,
+        "write_p50_seconds": percentile(write, 50),
+    }
+
+
+def bench_batch(server: MockServer, output_dir: Path, formats: list[str], requests: int, sink: str,
+                concurrency: int) -> dict:
+    """以给定并发数批量抓取，测量吞吐量"""
+    downloader = make_downloader(server, concurrency, sink)
+    urls = [f"https://bench.example.com/batch-{concurrency}/{i}" for i in range(requests)]
+
+    start = time.perf_counter()
+    with quiet():
+        results = downloader.download_many(urls, str(output_dir), formats, concurrency)
+        downloader.close()
+    elapsed = time.perf_counter() - start
+
+    summary = downloader.metrics.summary()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "failed": sum(1 for r in results if not r["success"]),
+        "retries": summary["retries"],
+        "elapsed_seconds": elapsed,
+        "pages_per_second": requests / elapsed,
+        "p95_seconds": summary["page_p95"],
+    }
+
+
+def bench_memory(server: MockServer, output_dir: Path, formats: list[str], size_mb: float, sink: str) -> dict:
+    """抓取并保存一个超大页面，测量 Python 分配的内存峰值"""
+    size = int(size_mb * 1024 * 1024)
+    original = server.config.size
+    server.config.size = size
+    downloader = make_downloader(server, 1, sink)
+
+    try:
+        tracemalloc.start()
+        with quiet():
+            result = downloader.download("https://bench.example.com/large", str(output_dir), formats)
+            downloader.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.config.size = original
+
+    return {
+        "page_bytes": size,
+        "success": result["success"],
+        "peak_bytes": peak,
+        # 峰值与页面大小之比：响应体、解析后的对象和写入缓冲各占一份
+        "peak_ratio": peak / size,
+    }
+
+
+def burst_decreases(concurrency: int) -> int:
+    """concurrency 个同时发出的请求都收到 429 时限速器降速的次数（应为 1）"""
+    limiter = RateLimiter(max_concurrency=concurrency)
+    limiter.rate = limiter.ceiling = 10.0
+    sent_at = time.monotonic()
+    barrier = threading.Barrier(concurrency)
+
+    def rate_limited():
+        barrier.wait()
+        limiter.on_rate_limited(0.01, sent_at)
+
+    threads = [threading.Thread(target=rate_limited) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return limiter.decreases
+
+
+def bench_ratelimit(server: MockServer, output_dir: Path, formats: list[str], sink: str, quota_rate: float,
+                    concurrency: int = 8) -> dict:
+    """服务器按配额限流，未指定 --rpm 的下载器以 concurrency 并发抓取，测量相对配额的吞吐量"""
+    requests = int(quota_rate * QUOTA_SECONDS)
+    config = server.config
+    original = config.quota, config.quota_window
+    config.quota, config.quota_window = max(1, round(quota_rate * QUOTA_WINDOW)), QUOTA_WINDOW
+    config.admitted.clear()
+    rate_limited = config.rate_limited
+    downloader = make_downloader(server, concurrency, sink, QUOTA_RETRIES)
+    urls = [f"https://bench.example.com/ratelimit/{i}" for i in range(requests)]
+
+    try:
+        start = time.perf_counter()
+        with quiet():
+            results = downloader.download_many(urls, str(output_dir), formats, concurrency)
+            downloader.close()
+        elapsed = time.perf_counter() - start
+    finally:
+        config.quota, config.quota_window = original
+
+    limiter = downloader.limiter
+    return {
+        "requests": requests,
+        "failed": sum(1 for r in results if not r["success"]),
+        "rate_limited": config.rate_limited - rate_limited,
+        "decreases": limiter.decreases,
+        "elapsed_seconds": elapsed,
+        "pages_per_second": requests / elapsed,
+        "quota_utilization": requests / elapsed / quota_rate,
+        "final_rate_ratio": (limiter.rate or 0.0) / quota_rate,
+        "burst_decreases": burst_decreases(concurrency),
+    }
+
+
+def run(options: dict) -> dict:
+    """按选项运行各场景，返回结果字典"""
+    formats = validate_format(options["formats"])
+    config = MockConfig(latency=options["latency"], jitter=options["jitter"], size=options["size"],
+                        error_rate=options["error_rate"], rate_limit_rate=options["rate_limit_rate"],
+                        retry_after=0.05, seed=0)
+    results = {"config": {k: v for k, v in options.items() if k not in ("json", "compare", "only")}}
+
+    with MockServer(config) as server, tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        if "single" in options["only"]:
+            print("single: 顺序抓取...")
+            results["single"] = bench_single(server, output_dir / "single", formats, options["requests"],
+                                             options["sink"])
+        if "batch" in options["only"]:
+            results["batch"] = []
+            for concurrency in options["concurrency"]:
+                print(f"batch: 并发数 {concurrency}...")
+                results["batch"].append(bench_batch(server, output_dir / "batch", formats, options["requests"],
+                                                    options["sink"], concurrency))
+        if "memory" in options["only"]:
+            print(f"memory: {options['large_size']}MB 页面...")
+            results["memory"] = bench_memory(server, output_dir / "memory", formats, options["large_size"],
+                                             options["sink"])
+        if "ratelimit" in options["only"]:
+            print(f"ratelimit: 配额 {options['quota_rate']:g} 请求/秒...")
+            results["ratelimit"] = bench_ratelimit(server, output_dir / "ratelimit", formats, options["sink"],
+                                                   options["quota_rate"])
+    return results
+
+
+def flatten(results: dict) -> dict:
+    """把结果展开为 "场景.指标" -> 数值，用于比较"""
+    flat = {}
+    for key, value in (results.get("single") or {}).items():
+        flat[f"single.{key}"] = value
+    for row in results.get("batch") or []:
+        for key, value in row.items():
+            flat[f"batch[c={row['concurrency']}].{key}"] = value
+    for key, value in (results.get("memory") or {}).items():
+        flat[f"memory.{key}"] = value
+    for key, value in (results.get("ratelimit") or {}).items():
+        flat[f"ratelimit.{key}"] = value
+    return flat
+
+
+def format_value(key: str, value) -> str:
+    if isinstance(value, bool) or value is None:
+        return str(value)
+    if key.endswith("_seconds"):
+        return f"{value * 1000:.1f}ms"
+    if key.endswith("_bytes"):
+        return f"{value / 1024 / 1024:.1f}MB"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def report(results: dict, baseline: dict = None) -> None:
+    """打印结果表格，有基线时附上变化百分比"""
+    old = flatten(baseline) if baseline else {}
+    print("\n基准测试结果:")
+    for key, value in flatten(results).items():
+        line = f"  {key:<40} {format_value(key, value):>12}"
+        previous = old.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and previous:
+            change = (value - previous) / previous * 100
+            worse = change > 0 if key.endswith(LOWER_IS_BETTER) else change < 0
+            line += f"  {change:+.1f}%{' (变差)' if worse and abs(change) >= 10 else ''}"
+        print(line)
+
+
+def main():
+    """命令行入口"""
+    options = {
+        "latency": 20.0, "jitter": 5.0, "size": 8192, "requests": 50, "concurrency": [1, 3, 8, 16],
+        "large_size": 50.0, "formats": "markdown", "sink": "files", "error_rate": 0.0, "rate_limit_rate": 0.0,
+        "quota_rate": 15.0, "only": ["single", "batch", "memory"], "json": None, "compare": None,
+    }
+    for i, arg in enumerate(sys.argv[1:], start=1):
+        has_value = i + 1 < len(sys.argv)
+        if arg == "--latency" and has_value:
+            options["latency"] = float(sys.argv[i + 1])
+        elif arg == "--jitter" and has_value:
+            options["jitter"] = float(sys.argv[i + 1])
+        elif arg == "--size" and has_value:
+            options["size"] = int(sys.argv[i + 1])
+        elif arg == "--requests" and has_value:
+            options["requests"] = int(sys.argv[i + 1])
+        elif arg == "--concurrency" and has_value:
+            options["concurrency"] = [int(c) for c in sys.argv[i + 1].split(",")]
+        elif arg == "--large-size" and has_value:
+            options["large_size"] = float(sys.argv[i + 1])
+        elif arg == "--formats" and has_value:
+            options["formats"] = sys.argv[i + 1]
+        elif arg == "--sink" and has_value:
+            options["sink"] = sys.argv[i + 1]
+        elif arg == "--error-rate" and has_value:
+            options["error_rate"] = float(sys.argv[i + 1])
+        elif arg == "--rate-limit-rate" and has_value:
+            options["rate_limit_rate"] = float(sys.argv[i + 1])
+        elif arg == "--quota-rate" and has_value:
+            options["quota_rate"] = float(sys.argv[i + 1])
+        elif arg == "--only" and has_value:
+            options["only"] = sys.argv[i + 1].split(",")
+        elif arg == "--json" and has_value:
+            options["json"] = sys.argv[i + 1]
+        elif arg == "--compare" and has_value:
+            options["compare"] = sys.argv[i + 1]
+        elif arg in ("-h", "--help"):
+            print(__doc__)
+            sys.exit(0)
+
+    baseline = json.loads(Path(options["compare"]).read_text(encoding="utf-8")) if options["compare"] else None
+    results = run(options)
+    report(results, baseline)
+
+    if options["json"]:
+        Path(options["json"]).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已写入: {options['json']}")
+
+
+if __name__ == "__main__":
+    main()
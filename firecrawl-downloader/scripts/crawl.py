@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Firecrawl Crawler - 从种子 URL 开始抓取整个站点
+
+用法:
+    python crawl.py <seed_url> <output_dir> <format> [选项]
+
+参数:
+    seed_url: 起始 URL
+    output_dir: 输出目录
+    format: 输出格式 (markdown, html, rawHtml)
+    --max-depth: 最大链接深度，种子页面为 0 (可选，默认 2)
+    --max-pages: 最多抓取的页面数 (可选，默认 100)
+    --include: 只抓取路径匹配该正则的页面，可重复 (可选)
+    --exclude: 跳过路径匹配该正则的页面，可重复 (可选)
+    --allow-subdomains: 允许抓取种子域名的子域名
+    --concurrency: 最大并发数 (可选，默认 3)
+    --rpm: 每分钟最大请求数 (可选)
+    --state: 断点文件路径 (可选，默认 <output_dir>/.crawl-state.json)
+    --restart: 忽略已有断点，从种子 URL 重新开始
+    --api-key / --no-cache / --refresh / --dedupe / --sink: 同 download.py
+
+中断后使用相同参数重新运行即可从断点继续。
+"""
+
+import json
+import os
+import re
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+from download import (
+    DEFAULT_CONCURRENCY,
+    Downloader,
+    RateLimiter,
+    failure_result,
+    make_cache,
+    validate_format,
+)
+
+
+# 每完成多少个页面写一次断点
+CHECKPOINT_EVERY = 10
+
+# 不抓取的静态资源扩展名
+SKIP_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".ico", ".css", ".js",
+    ".zip", ".tar", ".gz", ".pdf", ".mp4", ".mp3", ".woff", ".woff2", ".ttf",
+}
+
+# SDK 未返回 links 时从正文中提取链接
+MARKDOWN_LINK_RE = re.compile(r"\]\(\s*<?([^)\s>]+)>?(?:\s+\"[^\"]*\")?\s*\)")
+HTML_HREF_RE = re.compile(r"""href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+
+def normalize_url(url: str) -> str:
+    """去掉片段，小写协议和域名，用于去重"""
+    url, _ = urldefrag(url.strip())
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}{query}"
+
+
+def extract_links(content: dict, base_url: str) -> list[str]:
+    """提取页面中的链接，优先使用 SDK 返回的 links"""
+    links = content.get("links")
+    if not links:
+        links = []
+        if content.get("markdown"):
+            links += MARKDOWN_LINK_RE.findall(content["markdown"])
+        for key in ("html", "raw_html"):
+            if content.get(key):
+                links += HTML_HREF_RE.findall(content[key])
+    return [urljoin(base_url, link) for link in links if isinstance(link, str)]
+
+
+class CrawlScope:
+    """判断链接是否在抓取范围内：同域名、包含/排除路径规则、静态资源过滤"""
+
+    def __init__(self, seed_url: str, include: list[str] = None, exclude: list[str] = None,
+                 allow_subdomains: bool = False):
+        self.domain = urlsplit(seed_url).netloc.lower()
+        self.include = [re.compile(p) for p in include or []]
+        self.exclude = [re.compile(p) for p in exclude or []]
+        self.allow_subdomains = allow_subdomains
+
+    def allows(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return False
+
+        netloc = parts.netloc.lower()
+        if netloc != self.domain and not (self.allow_subdomains and netloc.endswith("." + self.domain)):
+            return False
+
+        if os.path.splitext(parts.path)[1].lower() in SKIP_EXTENSIONS:
+            return False
+        if self.include and not any(p.search(parts.path) for p in self.include):
+            return False
+        return not any(p.search(parts.path) for p in self.exclude)
+
+
+class CrawlState:
+    """
+    可恢复的抓取状态
+
+    frontier 是待抓取的 (url, depth) 队列，seen 是已发现的 URL（用于去重），
+    正在抓取的页面在写断点时放回队首，中断后不会丢失。
+    """
+
+    def __init__(self, seed_url: str, path: Path):
+        self.seed_url = normalize_url(seed_url)
+        self.path = path
+        self.frontier = deque([(self.seed_url, 0)])
+        self.seen = {self.seed_url}
+        self.done = []
+        self.failed = {}
+
+    @classmethod
+    def load(cls, seed_url: str, path: Path) -> "CrawlState":
+        """读取断点；种子 URL 不同或文件不存在时返回新状态"""
+        state = cls(seed_url, path)
+        if not path.exists():
+            return state
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("seed_url") != state.seed_url:
+            print(f"断点文件的种子 URL 不同，忽略: {path}")
+            return state
+
+        state.frontier = deque((url, depth) for url, depth in data["frontier"])
+        state.seen = set(data["seen"])
+        state.done = data["done"]
+        state.failed = data["failed"]
+        print(f"从断点继续: 已完成 {len(state.done)}，待抓取 {len(state.frontier)}")
+        return state
+
+    @property
+    def attempted(self) -> int:
+        return len(self.done) + len(self.failed)
+
+    def save(self, in_flight: dict = None) -> None:
+        """原子写入断点文件"""
+        pending = list((in_flight or {}).values()) + list(self.frontier)
+        data = {
+            "seed_url": self.seed_url,
+            "frontier": pending,
+            "seen": sorted(self.seen),
+            "done": self.done,
+            "failed": self.failed,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def crawl_page(downloader: Downloader, url: str, output_path: Path, formats: list[str]) -> tuple[dict, list[str]]:
+    """抓取并保存单个页面，返回结果字典和页面中的链接"""
+    print(f"正在抓取: {url}")
+    try:
+        content = downloader.scrape(url, formats + ["links"])
+        result = downloader.finish(url, content, output_path, formats)
+        return result, extract_links(content, url)
+    except Exception as e:
+        return failure_result(url, e), []
+
+
+def crawl(seed_url: str, output_dir: str, format_str: str, api_key: str = None, max_depth: int = 2,
+          max_pages: int = 100, include: list[str] = None, exclude: list[str] = None,
+          allow_subdomains: bool = False, concurrency: int = DEFAULT_CONCURRENCY,
+          requests_per_minute: float = None, state_file: str = None, restart: bool = False,
+          use_cache: bool = True, refresh: bool = False, dedupe: bool = False,
+          sink: str = "files") -> list[dict]:
+    """
+    从种子 URL 开始按广度优先抓取站点
+
+    参数:
+        seed_url: 起始 URL
+        output_dir: 输出目录
+        format_str: 输出格式，逗号分隔
+        api_key: Firecrawl API Key
+        max_depth: 最大链接深度，种子页面为 0
+        max_pages: 最多抓取的页面数（包括失败的页面）
+        include: 路径必须匹配其中之一的正则列表
+        exclude: 路径匹配其中之一即跳过的正则列表
+        allow_subdomains: 是否允许子域名
+        concurrency: 最大并发请求数
+        requests_per_minute: 每分钟最大请求数
+        state_file: 断点文件路径，默认 <output_dir>/.crawl-state.json
+        restart: 忽略已有断点
+        use_cache / refresh / dedupe / sink: 同 download()
+
+    返回:
+        本次运行抓取的每个页面的结果字典，结构与 download() 相同
+    """
+    formats = validate_format(format_str)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    limiter = RateLimiter(requests_per_minute, concurrency)
+    downloader = Downloader(api_key, limiter=limiter, cache=make_cache(use_cache), refresh=refresh, dedupe=dedupe,
+                            sink=sink)
+    scope = CrawlScope(seed_url, include, exclude, allow_subdomains)
+
+    state_path = Path(state_file) if state_file else output_path / ".crawl-state.json"
+    state = CrawlState(seed_url, state_path) if restart else CrawlState.load(seed_url, state_path)
+    # 过滤规则可能在两次运行之间改变，恢复时重新检查待抓取队列
+    state.frontier = deque((url, depth) for url, depth in state.frontier if depth == 0 or scope.allows(url))
+
+    print(f"站点抓取: {state.seed_url}，最大深度 {max_depth}，最多 {max_pages} 页，并发数 {concurrency}")
+    print(f"格式: {', '.join(formats)}")
+    print(f"输出目录: {output_path}")
+
+    results = []
+    in_flight = {}
+    since_checkpoint = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        try:
+            while state.frontier or in_flight:
+                while (state.frontier and len(in_flight) < concurrency
+                       and state.attempted + len(in_flight) < max_pages):
+                    url, depth = state.frontier.popleft()
+                    future = pool.submit(crawl_page, downloader, url, output_path, formats)
+                    in_flight[future] = (url, depth)
+
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    url, depth = in_flight.pop(future)
+                    result, links = future.result()
+                    results.append(result)
+
+                    if not result["success"]:
+                        state.failed[url] = result["error"]
+                        continue
+
+                    state.done.append(url)
+                    if depth >= max_depth:
+                        continue
+                    for link in links:
+                        link = normalize_url(link)
+                        if link not in state.seen and scope.allows(link):
+                            state.seen.add(link)
+                            state.frontier.append((link, depth + 1))
+
+                since_checkpoint += len(finished)
+                if since_checkpoint >= CHECKPOINT_EVERY:
+                    # 先落盘已完成的页面，再记录断点
+                    downloader.flush()
+                    state.save(in_flight)
+                    since_checkpoint = 0
+        except KeyboardInterrupt:
+            print("\n已中断，正在保存断点...")
+            for future in in_flight:
+                future.cancel()
+            downloader.close()
+            state.save(in_flight)
+            raise
+
+    downloader.close()
+    state.save()
+    return results
+
+
+def main():
+    """命令行入口"""
+    if len(sys.argv) < 4:
+        print(__doc__)
+        print("\n示例:")
+        print(f"  {sys.argv[0]} https://docs.example.com ./docs markdown --max-depth 3 --max-pages 500")
+        print(f"  {sys.argv[0]} https://example.com ./out markdown --include ^/guide/ --exclude /changelog")
+        sys.exit(1)
+
+    seed_url = sys.argv[1]
+    output_dir = sys.argv[2]
+    format_str = sys.argv[3]
+
+    # 解析可选参数
+    options = {"include": [], "exclude": []}
+    for i, arg in enumerate(sys.argv[4:], start=4):
+        has_value = i + 1 < len(sys.argv)
+        if arg == "--api-key" and has_value:
+            options["api_key"] = sys.argv[i + 1]
+        elif arg == "--max-depth" and has_value:
+            options["max_depth"] = int(sys.argv[i + 1])
+        elif arg == "--max-pages" and has_value:
+            options["max_pages"] = int(sys.argv[i + 1])
+        elif arg == "--include" and has_value:
+            options["include"].append(sys.argv[i + 1])
+        elif arg == "--exclude" and has_value:
+            options["exclude"].append(sys.argv[i + 1])
+        elif arg == "--allow-subdomains":
+            options["allow_subdomains"] = True
+        elif arg == "--concurrency" and has_value:
+            options["concurrency"] = int(sys.argv[i + 1])
+        elif arg == "--rpm" and has_value:
+            options["requests_per_minute"] = float(sys.argv[i + 1])
+        elif arg == "--state" and has_value:
+            options["state_file"] = sys.argv[i + 1]
+        elif arg == "--restart":
+            options["restart"] = True
+        elif arg == "--no-cache":
+            options["use_cache"] = False
+        elif arg == "--refresh":
+            options["refresh"] = True
+        elif arg == "--dedupe":
+            options["dedupe"] = True
+        elif arg == "--sink" and has_value:
+            options["sink"] = sys.argv[i + 1]
+
+    try:
+        results = crawl(seed_url, output_dir, format_str, **options)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    failed = [r for r in results if not r["success"]]
+    print(f"\n站点抓取完成: 成功 {len(results) - len(failed)}，失败 {len(failed)}")
+    for r in failed:
+        print(f"  失败: {r['url']}: {r.get('error')}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
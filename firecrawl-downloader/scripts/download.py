@@ -4,13 +4,26 @@ Firecrawl Downloader - 将网页内容抓取并保存为指定格式
 
 用法:
     python download.py <url> <output_dir> <format> [--api-key KEY] [--filename NAME]
+    python download.py <url_list> <output_dir> <format> --batch [--concurrency N]
 
 参数:
     url: 要抓取的网页 URL
     output_dir: 输出目录
     format: 输出格式 (markdown, html, rawHtml)
     --api-key: Firecrawl API Key (可选，从环境变量或 .env 文件读取)
+    --api-url: Firecrawl API 地址 (可选，默认读取 FIRECRAWL_API_URL，用于自建服务或 mock_server.py)
     --filename: 自定义输出文件名 (可选，默认从 URL 生成)
+    --batch: 批量模式，第一个参数为 URL 列表文件 (每行一个，"-" 表示标准输入)
+    --concurrency: 批量模式的最大并发数 (可选，默认 3)
+    --rpm: 每分钟最大请求数 (可选，默认不限制，收到 429 后自动降速)
+    --retries: 限流或临时错误的最大重试次数 (可选，默认 3)
+    --no-cache: 不读写本地抓取缓存
+    --refresh: 忽略已有缓存，重新抓取并更新缓存
+    --cache-ttl: 缓存有效期秒数 (可选，默认 86400)
+    --dedupe: 内容寻址存储，相同内容只在 <output_dir>/.objects/ 保存一份，输出文件为硬链接
+    --fsync: 持久化写入，按批 fsync 输出文件和目录
+    --sink: 输出方式 files (默认，每个格式一个文件) / jsonl (压缩 JSONL 分片) / sqlite (单个数据库)
+    --metrics: 导出指标和每个请求的追踪记录，.prom 结尾为 Prometheus 文本格式，否则为 JSON Lines
 
 支持格式:
     - markdown: 纯文本 markdown
@@ -18,9 +31,24 @@ Firecrawl Downloader - 将网页内容抓取并保存为指定格式
     - rawHtml: 原始 HTML
 """
 
+import asyncio
+import contextlib
+import contextvars
+import gzip
+import hashlib
+import json
 import os
+import random
+import re
+import sqlite3
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from typing import Iterator, Optional
 
 try:
     from dotenv import load_dotenv
@@ -34,6 +62,46 @@ except ImportError:
     print("请安装 firecrawl-py: pip install firecrawl-py")
     sys.exit(1)
 
+try:
+    from firecrawl import AsyncFirecrawl
+except ImportError:
+    # 旧版 SDK 没有异步客户端，异步 API 退回到线程池执行同步请求
+    AsyncFirecrawl = None
+
+
+# 批量模式默认并发数，与 SKILL.md 中的并发限制一致
+DEFAULT_CONCURRENCY = 3
+
+# 限流或临时错误的默认最大重试次数
+DEFAULT_MAX_RETRIES = 3
+
+# 可重试的 HTTP 状态码（429 单独处理）
+TRANSIENT_STATUS_CODES = {408, 500, 502, 503, 504}
+
+# 分块写入的块大小（字符数 / 字节数）
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+# 持久化模式下每写入多少个文件执行一次批量 fsync
+DEFAULT_FSYNC_EVERY = 64
+
+# 打包输出：JSONL 分片的最大未压缩字节数，SQLite 每多少条记录提交一次
+BUNDLE_SHARD_BYTES = 64 * 1024 * 1024
+BUNDLE_COMMIT_EVERY = 100
+
+# 输出方式
+SINKS = ("files", "jsonl", "sqlite")
+
+# Prometheus 直方图的桶上限（秒）
+METRIC_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 未指定 --api-url / FIRECRAWL_API_URL 时 SDK 使用的 API 地址
+DEFAULT_API_URL = "https://api.firecrawl.dev"
+
+# 本地抓取缓存：目录、有效期（秒）和容量上限（字节）
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "firecrawl-downloader"
+DEFAULT_CACHE_TTL = 24 * 3600
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
 
 def load_api_key() -> str:
     """从环境变量或 .env 文件加载 API Key"""
@@ -83,21 +151,8 @@ def validate_format(format_str: str) -> list[str]:
     return formats
 
 
-def download(url: str, output_dir: str, format_str: str, api_key: str = None, filename: str = None) -> dict:
-    """
-    使用 Firecrawl 抓取网页内容
-
-    参数:
-        url: 要抓取的网页 URL
-        output_dir: 输出目录
-        format_str: 输出格式，逗号分隔
-        api_key: Firecrawl API Key
-        filename: 自定义文件名 (可选，默认从 URL 生成)
-
-    返回:
-        包含结果的字典
-    """
-    # 加载 API Key
+def resolve_api_key(api_key: str = None) -> str:
+    """返回可用的 API Key，未找到时退出"""
     if not api_key:
         api_key = load_api_key()
 
@@ -109,67 +164,1383 @@ def download(url: str, output_dir: str, format_str: str, api_key: str = None, fi
         print("  3. 命令行参数: --api-key fc-xxx")
         sys.exit(1)
 
-    # 初始化客户端
-    firecrawl = Firecrawl(api_key=api_key)
+    return api_key
 
-    # 验证格式
-    formats = validate_format(format_str)
 
-    # 创建输出目录
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
+def client_options(api_key: str = None, api_url: str = None) -> dict:
+    """客户端参数：API Key，以及 API 地址（参数或 FIRECRAWL_API_URL，未设置时使用 SDK 默认地址）"""
+    options = {"api_key": resolve_api_key(api_key)}
+    api_url = api_url or os.environ.get("FIRECRAWL_API_URL")
+    if api_url:
+        options["api_url"] = api_url
+    return options
+
+
+def create_client(api_key: str = None, api_url: str = None) -> Firecrawl:
+    """创建 Firecrawl 客户端，未找到 API Key 时退出"""
+    return Firecrawl(**client_options(api_key, api_url))
+
+
+def url_to_filename(url: str) -> str:
+    """从 URL 生成文件名"""
+    return url.replace("https://", "").replace("http://", "").replace("/", "_").replace(".", "_")
+
+
+def read_url_list(source: str) -> list[str]:
+    """从文件或标准输入 ("-") 读取 URL 列表，忽略空行和 # 注释，并去重"""
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(source).read_text(encoding="utf-8").splitlines()
+
+    urls = [line.strip() for line in lines]
+    urls = [u for u in urls if u and not u.startswith("#")]
+    return list(dict.fromkeys(urls))
 
-    # 抓取网页
-    print(f"正在抓取: {url}")
-    print(f"格式: {', '.join(formats)}")
-    print(f"输出目录: {output_path}")
 
+def parse_retry_after(value) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if value is None:
+        return None
     try:
-        result = firecrawl.scrape(url, formats=formats)
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> tuple[bool, bool, Optional[float]]:
+    """
+    分类 SDK 抛出的异常
+
+    返回:
+        (是否限流, 是否可重试, Retry-After 秒数)
+    """
+    message = str(error)
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status is None:
+        # SDK 常把状态码放在错误信息里，如 "Status code 502"
+        match = re.search(r"status code:?\s*(\d{3})", message, re.IGNORECASE)
+        status = int(match.group(1)) if match else None
+
+    retry_after = None
+    headers = getattr(response, "headers", None)
+    if headers:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+    if retry_after is None:
+        # Firecrawl 的限流信息形如 "... please retry after 36s ..."
+        match = re.search(r"retry after (\d+(?:\.\d+)?)\s*s", message, re.IGNORECASE)
+        retry_after = float(match.group(1)) if match else None
+
+    rate_limited = status == 429 or "rate limit" in message.lower()
+    transient = (
+        status in TRANSIENT_STATUS_CODES
+        or isinstance(error, (TimeoutError, ConnectionError))
+        or (status is None and isinstance(error, OSError))
+        or "timed out" in message.lower()
+    )
+    return rate_limited, rate_limited or transient, retry_after
+
+
+class RateLimiter:
+    """
+    Firecrawl 请求限速器，线程安全，可在多个下载器之间共享
+
+    - 令牌桶控制每分钟请求数，并发上限由信号量控制
+    - 收到 429 时遵守 Retry-After，并把速率降到滑动窗口内服务器实际接受请求速率的 95%
+      （按不短于最长 Retry-After 的时长计算，稳定后不超过配额；最多降到原来的 1/4），
+      把触发限流时速率的 95% 记为上限
+    - 同一次过载中（在上次降速之前发出的请求，或降速后数秒内）收到的多个 429 只降速一次；
+      与速率无关的零星 429 不会让速率持续减半塌缩到最低值
+    - 之后随时间加性恢复（每秒上限的 2.5%，与期间成功的请求数无关），到达上限后以更慢的速度越过上限试探（AIMD），
+      上限随之提高，配额变大或最初估计偏低时速率可以重新增长
+    - 未指定每分钟请求数时不限速，第一次 429 时以最近一分钟滑动窗口内的实际速率估计上限；
+      指定时该速率是硬上限，试探不会超过它
+    """
+
+    # 最低速率：每分钟 1 个请求
+    MIN_RATE = 1 / 60
+
+    # 每秒恢复的速率相对上限的比例；越过上限试探时使用恢复速度的该比例
+    RECOVERY_STEP = 0.025
+    PROBE_FRACTION = 0.25
+
+    # 两次降速之间的最短秒数（同时不短于 Retry-After 和往返时间）
+    DECREASE_INTERVAL = 5.0
+
+    # 估计实际速率的滑动窗口秒数
+    WINDOW = 60.0
+
+    def __init__(self, requests_per_minute: float = None, max_concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_rate = requests_per_minute / 60 if requests_per_minute else None
+        self.ceiling = self.max_rate
+        self.rate = self.max_rate
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.decreases = 0
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._tokens = float(self.max_concurrency)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._recent = deque()
+        self._accepted = deque()
+        self._horizon = 0.0
+        self._decreased_at = float("-inf")
+        self._grown_at = time.monotonic()
+        self._step = max(self.MIN_RATE, (self.max_rate or 0) * self.RECOVERY_STEP)
+        self._rtt = None
+
+    def reserve(self) -> float:
+        """预订一次请求，返回发出请求前需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            self._prune(self._recent, now)
+
+            wait = max(0.0, self._blocked_until - now)
+            if self.rate is None:
+                return wait
+
+            # 令牌可以为负，表示已被之前的请求预订，按顺序排队
+            burst = min(float(self.max_concurrency), max(1.0, self.rate * 60))
+            self._tokens = min(burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self) -> None:
+        """阻塞直到可以发出请求；等待期间发生降速时按新的速率重新预订"""
+        while True:
+            decreases = self.decreases
+            delay = self.reserve()
+            if delay > 0:
+                time.sleep(delay)
+            if self.decreases == decreases:
+                return
+
+    @contextlib.contextmanager
+    def slot(self):
+        """占用一个并发名额"""
+        with self._slots:
+            yield
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self):
+        """
+        slot() 的 asyncio 版本，与同步下载器共用同一组并发名额
+
+        名额已满时在事件循环中轮询等待（间隔逐渐增加到 50ms），不占用线程池，取消时不会泄漏名额。
+        """
+        delay = 0.001
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _prune(self, times: deque, now: float) -> None:
+        while times and times[0] < now - self.WINDOW:
+            times.popleft()
+
+    def _window_rate(self, times: deque, now: float, min_span: float = 0.0) -> float:
+        """滑动窗口内的速率（窗口未满时按已覆盖的时长加一个往返时间计算，至少按 min_span 秒）"""
+        self._prune(times, now)
+        if not times:
+            return 0.0
+        span = max(min_span, now - times[0] + (self._rtt or 1.0))
+        return len(times) / min(self.WINDOW, max(1e-3, span))
+
+    def on_success(self, sent_at: float = None) -> None:
+        """请求成功，逐步恢复速率；sent_at 为发出请求时的 time.monotonic()，用于估计往返时间"""
+        with self._lock:
+            now = time.monotonic()
+            self._accepted.append(now)
+            if sent_at is not None:
+                self._observe_rtt(now - sent_at)
+            elapsed, self._grown_at = now - self._grown_at, now
+            if self.rate is None or self.ceiling is None:
+                return
+            if self.rate < self.ceiling:
+                self.rate = min(self.ceiling, self.rate + self._step * elapsed)
+            else:
+                self.rate += self._step * self.PROBE_FRACTION * elapsed
+                self.ceiling = self.rate
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+                self.ceiling = min(self.ceiling, self.max_rate)
+
+    def on_rate_limited(self, retry_after: float = None, sent_at: float = None) -> None:
+        """
+        收到 429，降低速率并暂停到 Retry-After 指定的时间
+
+        sent_at 早于上次降速的请求，以及上次降速后 DECREASE_INTERVAL、Retry-After 和往返时间内的 429
+        属于同一次过载，只遵守 Retry-After 不再降速。
+        """
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+                self._horizon = max(self._horizon, retry_after)
+            if sent_at is not None:
+                self._observe_rtt(now - sent_at)
+            same_burst = (sent_at is not None and sent_at < self._decreased_at) or \
+                now - self._decreased_at < max(self.DECREASE_INTERVAL, retry_after or 0.0, self._rtt or 0.0)
+            if same_burst:
+                return
+
+            current = self.rate if self.rate is not None else self._window_rate(self._recent, now)
+            current = max(self.MIN_RATE, current)
+            # 降到服务器实际接受请求的速率（配额窗口开始时的突发会让短时间内的接受速率偏高，
+            # 因此至少按 Retry-After 的时长计算），最多降到原来的 1/4
+            accepted = self._window_rate(self._accepted, now, self._horizon) * 0.95
+            self.rate = max(self.MIN_RATE, current * 0.25, min(current, accepted))
+            self.ceiling = max(self.rate, current * 0.95)
+            self._step = max(self.MIN_RATE, self.ceiling * self.RECOVERY_STEP)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = now
+            self._decreased_at = self._grown_at = now
+            self.decreases += 1
+
+    def _observe_rtt(self, seconds: float) -> None:
+        """更新往返时间的指数移动平均（调用方持有锁）"""
+        self._rtt = seconds if self._rtt is None else 0.8 * self._rtt + 0.2 * seconds
+
+    def retry_delay(self, error: Exception, attempt: int, sent_at: float = None) -> Optional[float]:
+        """
+        处理一次失败的请求（sent_at 为发出请求时的 time.monotonic()）
+
+        返回重试前的等待秒数（指数退避 + 随机抖动）；不应重试时返回 None
+        """
+        rate_limited, retryable, retry_after = classify_error(error)
+        if rate_limited:
+            self.on_rate_limited(retry_after, sent_at)
+        if not retryable or attempt >= self.max_retries:
+            return None
+
+        # Retry-After 的等待已记录在限速器中，这里只需要退避抖动
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def document_to_content(result) -> dict:
+    """将 SDK 返回的 Document 转换为各格式内容和元数据"""
+    # 处理 Pydantic Document 对象
+    return {
+        "markdown": result.markdown if hasattr(result, 'markdown') else None,
+        "html": result.html if hasattr(result, 'html') else None,
+        "raw_html": result.raw_html if hasattr(result, 'raw_html') else None,
+        "links": result.links if hasattr(result, 'links') else None,
+        "metadata": result.metadata_dict if hasattr(result, 'metadata_dict') else {},
+    }
+
+
+def content_hash(content: dict) -> str:
+    """计算抓取内容（各格式正文和元数据）的哈希"""
+    data = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ScrapeCache:
+    """
+    本地抓取缓存，按 API 地址 + URL + 请求格式存储各格式内容和元数据
+
+    - API 地址不同（如官方服务、自建服务和 mock_server.py）的结果互不命中
+
+    - 每个条目是一个 JSON 文件，超过 ttl 秒视为过期
+    - 命中时更新文件 mtime，总大小超过 max_bytes 时按 mtime 淘汰最久未使用的条目（LRU）
+    - Firecrawl 不支持条件请求，过期条目重新抓取后若内容哈希未变，只刷新时间戳（重新验证）
+    """
+
+    def __init__(self, cache_dir: Path = None, ttl: float = DEFAULT_CACHE_TTL,
+                 max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        cache_dir = cache_dir or os.environ.get("FIRECRAWL_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, url: str, formats: list[str], api_url: str = None) -> Path:
+        api_url = (api_url or DEFAULT_API_URL).rstrip("/")
+        key = hashlib.sha256(f"{api_url}\n{url}\n{','.join(sorted(formats))}".encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _read(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url: str, formats: list[str], api_url: str = None) -> Optional[dict]:
+        """返回未过期的缓存内容，未命中时返回 None"""
+        path = self._path(url, formats, api_url)
+        entry = self._read(path)
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+            return None
+
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return entry["content"]
+
+    def put(self, url: str, formats: list[str], content: dict, api_url: str = None) -> None:
+        """写入缓存；内容未变时只刷新时间戳"""
+        path = self._path(url, formats, api_url)
+        digest = content_hash(content)
+        entry = self._read(path)
+
+        if entry is not None and entry.get("hash") == digest:
+            entry["fetched_at"] = time.time()
+        else:
+            entry = {
+                "api_url": (api_url or DEFAULT_API_URL).rstrip("/"),
+                "url": url,
+                "formats": sorted(formats),
+                "fetched_at": time.time(),
+                "hash": digest,
+                "content": content,
+            }
+
+        data = json.dumps(entry, ensure_ascii=False, default=str).encode("utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        old_size = path.stat().st_size if path.exists() else 0
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(f.stat().st_size for f in self.cache_dir.glob("*/*.json"))
+            else:
+                self._size += len(data) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """删除最久未使用的条目，直到总大小降到上限的 90% 以下（调用方持有锁）"""
+        entries = []
+        for f in self.cache_dir.glob("*/*.json"):
+            with contextlib.suppress(OSError):
+                st = f.stat()
+                entries.append((st.st_mtime, st.st_size, f))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, f in entries:
+            if self._size <= target:
+                break
+            with contextlib.suppress(OSError):
+                f.unlink()
+                self._size -= size
+
+
+class AtomicWriter:
+    """
+    原子文件写入，线程安全
+
+    - 先写入同目录下的临时文件，再 os.replace 到目标路径：进程崩溃不会留下写了一半的文件，
+      替换硬链接时也不会改写共享的 blob
+    - 大内容分块写入，不在内存中生成完整的编码副本
+    - durable=True 时不逐个文件 fsync，而是记录下来，每 fsync_every 个文件或调用 sync() 时
+      统一 fsync 文件和所在目录；sync() 返回后写入的文件在断电后也不会丢失
+    """
+
+    def __init__(self, durable: bool = False, fsync_every: int = DEFAULT_FSYNC_EVERY):
+        self.durable = durable
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._files = []
+        self._dirs = set()
+
+    @staticmethod
+    def _temp_path(path: Path) -> Path:
+        return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def _commit(self, tmp: Path, path: Path, has_data: bool = True) -> None:
+        """把临时文件替换到目标路径，并记录待 fsync 的文件和目录"""
+        os.replace(tmp, path)
+        if not self.durable:
+            return
+
+        with self._lock:
+            if has_data:
+                self._files.append(path)
+            self._dirs.add(path.parent)
+            pending = len(self._files) + len(self._dirs)
+        if pending >= self.fsync_every:
+            self.sync()
+
+    def write_text(self, path: Path, text: str) -> None:
+        """原子写入 UTF-8 文本"""
+        tmp = self._temp_path(path)
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for start in range(0, len(text), WRITE_CHUNK_SIZE):
+                    f.write(text[start:start + WRITE_CHUNK_SIZE])
+            self._commit(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def write_bytes(self, path: Path, data: bytes) -> None:
+        """原子写入二进制内容"""
+        tmp = self._temp_path(path)
+        view = memoryview(data)
+        try:
+            with open(tmp, "wb") as f:
+                for start in range(0, len(view), WRITE_CHUNK_SIZE):
+                    f.write(view[start:start + WRITE_CHUNK_SIZE])
+            self._commit(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def link(self, source: Path, path: Path) -> None:
+        """原子地把 path 替换为 source 的硬链接，不支持硬链接时抛出 OSError"""
+        tmp = self._temp_path(path)
+        os.link(source, tmp)
+        self._commit(tmp, path, has_data=False)
+
+    def sync(self) -> None:
+        """fsync 所有待处理的文件和目录"""
+        with self._lock:
+            files, self._files = self._files, []
+            dirs, self._dirs = self._dirs, set()
+
+        for path in files:
+            with contextlib.suppress(FileNotFoundError):
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+        for directory in dirs:
+            # Windows 不支持 fsync 目录
+            with contextlib.suppress(OSError):
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+
+class BlobStore:
+    """
+    输出目录的内容寻址存储
+
+    正文按 SHA-256 保存在 <output_dir>/.objects/<xx>/<hash>，相同内容只写一次；
+    URL 生成的文件名硬链接到 blob，文件系统不支持硬链接时退回为普通文件。
+    文件名指向的哈希变化时追加一行到 .objects/manifest.jsonl（文件名 → 哈希），同名文件以最后一行为准；
+    重新运行写入相同内容时不追加，清单不会随运行次数增长。
+    """
+
+    def __init__(self, output_path: Path, writer: AtomicWriter = None):
+        self.root = output_path / ".objects"
+        self.manifest_path = self.root / "manifest.jsonl"
+        self.writer = writer if writer is not None else AtomicWriter()
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def write(self, path: Path, text: str) -> None:
+        """把 text 存为 blob，并让 path 指向它（分块计算哈希和写入，不生成完整的编码副本）"""
+        sha = hashlib.sha256()
+        for start in range(0, len(text), WRITE_CHUNK_SIZE):
+            sha.update(text[start:start + WRITE_CHUNK_SIZE].encode("utf-8"))
+        digest = sha.hexdigest()
+        blob = self.blob_path(digest)
+
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            self.writer.write_text(blob, text)
+
+        with contextlib.suppress(OSError):
+            if path.exists() and os.path.samefile(path, blob):
+                self._record(path, digest)
+                return
+
+        try:
+            self.writer.link(blob, path)
+        except OSError:
+            self.writer.write_text(path, text)
+        self._record(path, digest)
+
+    def _record(self, path: Path, digest: str) -> None:
+        """文件名已指向该哈希时不追加"""
+        with self._lock:
+            if self._entries is None:
+                self._entries = self.manifest()
+            if self._entries.get(path.name) == digest:
+                return
+            self._entries[path.name] = digest
+            line = json.dumps({"file": path.name, "sha256": digest}, ensure_ascii=False)
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def manifest(self) -> dict:
+        """读取清单，返回 {文件名: 哈希}"""
+        entries = {}
+        if self.manifest_path.exists():
+            for line in self.manifest_path.read_text(encoding="utf-8").splitlines():
+                entry = json.loads(line)
+                entries[entry["file"]] = entry["sha256"]
+        return entries
+
+
+FORMAT_FIELDS = {"markdown": "markdown", "html": "html", "rawHtml": "raw_html"}
+
+
+def bundle_record(url: str, formats: list[str], content: dict) -> dict:
+    """生成打包记录：URL、请求的格式、对应内容和元数据"""
+    record = {"url": url, "formats": formats, "scraped_at": time.time(), "metadata": content["metadata"]}
+    for fmt, field in FORMAT_FIELDS.items():
+        record[field] = content[field] if fmt in formats else None
+    return record
+
+
+class JsonlBundle:
+    """
+    gzip 压缩的 JSONL 分片：<output_dir>/bundle/shard-NNNNN.jsonl.gz
+
+    新的运行继续追加到最新的分片（作为新的 gzip 成员），分片未压缩大小达到 BUNDLE_SHARD_BYTES
+    时切换到下一个分片；最新分片损坏（上次运行被中断）时从新分片开始。
+    """
+
+    def __init__(self, output_path: Path):
+        self.path = output_path / "bundle"
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self._written = 0
+        shards = sorted(self.path.glob("shard-*.jsonl.gz"))
+        self._index = int(shards[-1].name[6:11]) + 1 if shards else 0
+        self._resume = shards[-1] if shards else None
+
+    def add(self, record: dict) -> str:
+        """追加一条记录，返回所在分片的路径"""
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None and self._resume is not None:
+                self._reopen()
+            if self._file is None or self._written >= BUNDLE_SHARD_BYTES:
+                self._rotate()
+            self._file.write(line)
+            self._written += len(line)
+            return str(self._shard)
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._shard = self.path / f"shard-{self._index:05d}.jsonl.gz"
+        self._index += 1
+        self._file = gzip.open(self._shard, "wb")
+        self._written = 0
+
+    def _reopen(self) -> None:
+        """以追加方式打开最新的分片（已满或损坏时不打开）"""
+        shard, self._resume = self._resume, None
+        size = 0
+        try:
+            with gzip.open(shard, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    size += len(chunk)
+        except (EOFError, OSError):
+            return
+        if size < BUNDLE_SHARD_BYTES:
+            self._shard = shard
+            self._file = gzip.open(shard, "ab")
+            self._written = size
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SqliteBundle:
+    """单个 SQLite 数据库：<output_dir>/bundle.sqlite，同一 URL 只保留最新记录"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            formats TEXT NOT NULL,
+            markdown TEXT,
+            html TEXT,
+            raw_html TEXT,
+            metadata TEXT,
+            scraped_at REAL NOT NULL
+        )
+    """
+
+    def __init__(self, output_path: Path):
+        self.path = output_path / "bundle.sqlite"
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self.SCHEMA)
+
+    def add(self, record: dict) -> str:
+        """写入一条记录，返回数据库路径"""
+        row = (
+            record["url"], ",".join(record["formats"]), record["markdown"], record["html"], record["raw_html"],
+            json.dumps(record["metadata"], ensure_ascii=False, default=str), record["scraped_at"],
+        )
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+            self._pending += 1
+            if self._pending >= BUNDLE_COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+        return str(self.path)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+class BundleReader:
+    """
+    读取打包输出
+
+    path 可以是 bundle.sqlite 文件或 JSONL 分片目录（也可以是包含它们的输出目录）。
+    记录字段：url, formats, markdown, html, raw_html, metadata, scraped_at
+
+    JSONL 的 get() 在第一次调用时遍历所有分片，建立 URL → (分片, 未压缩偏移) 索引，
+    之后每次查找只打开一个分片并定位到该行；索引建立后写入的记录需要重新打开才能查到。
+    """
+
+    def __init__(self, path: str):
+        path = Path(path)
+        if path.is_dir() and (path / "bundle.sqlite").exists():
+            path = path / "bundle.sqlite"
+        elif path.is_dir() and (path / "bundle").is_dir():
+            path = path / "bundle"
+        self.path = path
+        self.is_sqlite = path.is_file()
+        self._index = None
+
+    def __iter__(self) -> Iterator[dict]:
+        """按写入顺序遍历所有记录（JSONL 中同一 URL 可能出现多次）"""
+        if self.is_sqlite:
+            yield from self._query("SELECT * FROM pages ORDER BY scraped_at")
+            return
 
-        # 保存结果
+        for shard in sorted(self.path.glob("shard-*.jsonl.gz")):
+            try:
+                with gzip.open(shard, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        yield json.loads(line)
+            except (EOFError, OSError, ValueError):
+                # 中断时未写完的分片，读到损坏处为止
+                continue
+
+    def get(self, url: str) -> Optional[dict]:
+        """按 URL 查找最新的记录"""
+        if self.is_sqlite:
+            rows = list(self._query("SELECT * FROM pages WHERE url = ?", (url,)))
+            return rows[0] if rows else None
+
+        if self._index is None:
+            self._index = self._build_index()
+        location = self._index.get(url)
+        if location is None:
+            return None
+        shard, offset = location
+        with gzip.open(shard, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def _build_index(self) -> dict:
+        """URL → (分片, 该行的未压缩偏移)，同一 URL 以最后一条为准"""
+        index = {}
+        for shard in sorted(self.path.glob("shard-*.jsonl.gz")):
+            offset = 0
+            try:
+                with gzip.open(shard, "rb") as f:
+                    for line in f:
+                        index[json.loads(line)["url"]] = (shard, offset)
+                        offset += len(line)
+            except (EOFError, OSError, ValueError):
+                continue
+        return index
+
+    def urls(self) -> list[str]:
+        """返回所有 URL（去重，保持首次出现的顺序）"""
+        return list(dict.fromkeys(record["url"] for record in self))
+
+    def _query(self, sql: str, params: tuple = ()) -> Iterator[dict]:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(sql, params):
+                record = dict(row)
+                record["formats"] = record["formats"].split(",")
+                record["metadata"] = json.loads(record["metadata"]) if record["metadata"] else {}
+                yield record
+        finally:
+            conn.close()
+
+
+def open_bundle(path: str) -> BundleReader:
+    """打开打包输出用于读取"""
+    return BundleReader(path)
+
+
+# 当前请求的追踪记录，线程池和 asyncio.to_thread 中都能取到
+_current_trace = contextvars.ContextVar("firecrawl_trace", default=None)
+
+
+def percentile(samples: list[float], q: float) -> Optional[float]:
+    """最近秩法求百分位数，没有样本时返回 None"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Metrics:
+    """
+    线程安全的计数器、直方图和每个请求的追踪记录
+
+    直方图保留全部样本以计算精确的 p50 / p95；追踪记录包含每个 URL 的总耗时、
+    各阶段耗时 (scrape、write.<格式>)、缓存结果、重试次数和错误类型。
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.traces = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """记录一个样本，同时作为当前请求的一个阶段耗时"""
+        with self._lock:
+            self.histograms.setdefault(self._key(name, labels), []).append(value)
+        trace = _current_trace.get()
+        if trace is not None:
+            span = ".".join([name.removesuffix("_seconds"), *map(str, labels.values())])
+            trace["spans"][span] = trace["spans"].get(span, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def annotate(**fields) -> None:
+        """给当前请求的追踪记录添加字段"""
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.update(fields)
+
+    @contextlib.contextmanager
+    def trace(self, url: str):
+        """追踪一个 URL 的完整处理过程，结束时记录 page_seconds 和 pages_total"""
+        trace = {"url": url, "start": time.time(), "spans": {}, "cache": None, "retries": 0, "status": "ok"}
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+            trace["duration"] = time.perf_counter() - start
+            self.observe("page_seconds", trace["duration"])
+            self.inc("pages_total", status=trace["status"])
+            with self._lock:
+                self.traces.append(trace)
+
+    def samples(self, name: str) -> list[float]:
+        """合并所有标签下的样本"""
+        with self._lock:
+            return [v for (n, _), values in self.histograms.items() if n == name for v in values]
+
+    def total(self, name: str, **labels) -> float:
+        """合并计数器，只统计与给定标签一致的序列"""
+        with self._lock:
+            return sum(value for (n, key), value in self.counters.items()
+                       if n == name and all(dict(key).get(k) == v for k, v in labels.items()))
+
+    def summary(self) -> dict:
+        """批次汇总：页面数、吞吐量、延迟百分位、缓存命中、重试和写入字节数"""
+        with self._lock:
+            traces = list(self.traces)
+        elapsed = (max(t["start"] + t["duration"] for t in traces) - min(t["start"] for t in traces)) if traces else 0
+        page, scrape = self.samples("page_seconds"), self.samples("scrape_seconds")
+        return {
+            "pages": len(traces),
+            "succeeded": int(self.total("pages_total", status="ok")),
+            "failed": int(self.total("pages_total", status="failed")),
+            "elapsed_seconds": elapsed,
+            "pages_per_second": len(traces) / elapsed if elapsed > 0 else None,
+            "page_p50": percentile(page, 50),
+            "page_p95": percentile(page, 95),
+            "scrape_p50": percentile(scrape, 50),
+            "scrape_p95": percentile(scrape, 95),
+            "cache_hits": int(self.total("cache_total", result="hit")),
+            "cache_misses": int(self.total("cache_total", result="miss")),
+            "retries": int(self.total("retries_total")),
+            "bytes_written": int(self.total("bytes_written_total")),
+        }
+
+    def to_jsonl(self) -> str:
+        """每行一个 JSON：追踪记录、计数器、直方图，最后是汇总"""
+        with self._lock:
+            traces = list(self.traces)
+            counters = dict(self.counters)
+            histograms = {key: list(values) for key, values in self.histograms.items()}
+
+        lines = [{"type": "trace", **t} for t in traces]
+        for (name, labels), value in sorted(counters.items()):
+            lines.append({"type": "counter", "name": name, "labels": dict(labels), "value": value})
+        for (name, labels), values in sorted(histograms.items()):
+            lines.append({
+                "type": "histogram", "name": name, "labels": dict(labels), "count": len(values),
+                "sum": sum(values), "p50": percentile(values, 50), "p95": percentile(values, 95),
+            })
+        lines.append({"type": "summary", **self.summary()})
+        return "".join(json.dumps(line, ensure_ascii=False, default=str) + "\n" for line in lines)
+
+    def to_prometheus(self, prefix: str = "firecrawl_") -> str:
+        """Prometheus 文本格式（可供 node_exporter textfile collector 读取）"""
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {key: list(values) for key, values in self.histograms.items()}
+
+        def series(name: str, labels: tuple, extra: dict = None) -> str:
+            pairs = [*labels, *(extra or {}).items()]
+            if not pairs:
+                return prefix + name
+            rendered = ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs)
+            return f"{prefix}{name}{{{rendered}}}"
+
+        lines = []
+        for name in sorted({n for n, _ in counters}):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{series(name, labels)} {value}")
+        for name in sorted({n for n, _ in histograms}):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for (n, labels), values in sorted(histograms.items()):
+                if n != name:
+                    continue
+                for bound in METRIC_BUCKETS:
+                    count = sum(1 for v in values if v <= bound)
+                    lines.append(f"{series(name + '_bucket', labels, {'le': bound})} {count}")
+                lines.append(f"{series(name + '_bucket', labels, {'le': '+Inf'})} {len(values)}")
+                lines.append(f"{series(name + '_sum', labels)} {sum(values)}")
+                lines.append(f"{series(name + '_count', labels)} {len(values)}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """写入指标文件：.prom 结尾为 Prometheus 文本格式，否则为 JSON Lines"""
+        path = Path(path)
+        text = self.to_prometheus() if path.suffix == ".prom" else self.to_jsonl()
+        AtomicWriter().write_text(path, text)
+
+
+def format_summary(summary: dict) -> list[str]:
+    """把 Metrics.summary() 格式化为可打印的行"""
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}ms"
+
+    rate = summary["pages_per_second"]
+    return [
+        f"  耗时: {summary['elapsed_seconds']:.1f}s，吞吐量: {'-' if rate is None else f'{rate:.2f}'} 页/秒",
+        f"  页面延迟: p50 {ms(summary['page_p50'])}，p95 {ms(summary['page_p95'])}",
+        f"  抓取延迟: p50 {ms(summary['scrape_p50'])}，p95 {ms(summary['scrape_p95'])}",
+        f"  缓存命中: {summary['cache_hits']}，未命中: {summary['cache_misses']}，重试: {summary['retries']}",
+        f"  写入: {summary['bytes_written']} 字节",
+    ]
+
+
+class Downloader:
+    """共享同一个 Firecrawl 客户端的下载器，可在多个线程中复用"""
+
+    def __init__(self, api_key: str = None, client: Firecrawl = None, limiter: RateLimiter = None,
+                 cache: ScrapeCache = None, refresh: bool = False, dedupe: bool = False,
+                 writer: AtomicWriter = None, sink: str = "files", metrics: Metrics = None,
+                 api_url: str = None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        if client is None:
+            with self.metrics.timer("client_init_seconds"):
+                client = create_client(api_key, api_url)
+        self.client = client
+        # 缓存键中的 API 地址（客户端实际使用的地址）
+        self.api_url = getattr(client, "api_url", None) or api_url or os.environ.get("FIRECRAWL_API_URL") \
+            or DEFAULT_API_URL
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.cache = cache
+        self.refresh = refresh
+        self.dedupe = dedupe
+        self.writer = writer if writer is not None else AtomicWriter()
+        self.sink = sink
+        self._stores = {}
+        self._bundles = {}
+        self._stores_lock = threading.Lock()
+
+    def bundle(self, output_path: Path):
+        """返回输出目录对应的打包输出（每个目录一个实例）"""
+        key = output_path.resolve()
+        with self._stores_lock:
+            if key not in self._bundles:
+                bundle_class = JsonlBundle if self.sink == "jsonl" else SqliteBundle
+                self._bundles[key] = bundle_class(output_path)
+            return self._bundles[key]
+
+    def flush(self) -> None:
+        """fsync 待处理的文件，提交打包输出"""
+        self.writer.sync()
+        for bundle in list(self._bundles.values()):
+            bundle.flush()
+
+    def close(self) -> None:
+        """刷新并关闭打包输出"""
+        self.writer.sync()
+        with self._stores_lock:
+            bundles, self._bundles = list(self._bundles.values()), {}
+        for bundle in bundles:
+            bundle.close()
+
+    def blob_store(self, output_path: Path) -> BlobStore:
+        """返回输出目录对应的内容寻址存储（每个目录一个实例）"""
+        key = output_path.resolve()
+        with self._stores_lock:
+            if key not in self._stores:
+                self._stores[key] = BlobStore(output_path, self.writer)
+            return self._stores[key]
+
+    def write(self, output_path: Path, path: Path, text: str) -> None:
+        """写入一个输出文件，dedupe 模式下经过内容寻址存储"""
+        if self.dedupe:
+            self.blob_store(output_path).write(path, text)
+        else:
+            self.writer.write_text(path, text)
+
+    def cached(self, url: str, formats: list[str]) -> Optional[dict]:
+        """查询本地缓存，未启用、强制刷新或未命中时返回 None"""
+        if self.cache is None or self.refresh:
+            return None
+        content = self.cache.get(url, formats, self.api_url)
+        result = "miss" if content is None else "hit"
+        self.metrics.inc("cache_total", result=result)
+        self.metrics.annotate(cache=result)
+        if content is not None:
+            print(f"缓存命中: {url}")
+        return content
+
+    def store(self, url: str, formats: list[str], content: dict) -> None:
+        """把抓取结果写入本地缓存"""
+        if self.cache is not None:
+            self.cache.put(url, formats, content, self.api_url)
+
+    def scrape(self, url: str, formats: list[str]) -> dict:
+        """优先使用本地缓存，否则从 Firecrawl 抓取并写入缓存"""
+        content = self.cached(url, formats)
+        if content is None:
+            content = self.fetch(url, formats)
+            self.store(url, formats, content)
+        return content
+
+    def fetch(self, url: str, formats: list[str]) -> dict:
+        """抓取网页（经过限速，限流和临时错误自动重试），返回各格式内容和元数据"""
+        attempt = 0
+        with self.metrics.timer("scrape_seconds"):
+            while True:
+                self.limiter.acquire()
+                sent_at = None
+                try:
+                    with self.limiter.slot():
+                        sent_at = time.monotonic()
+                        result = self.client.scrape(url, formats=formats)
+                except Exception as e:
+                    delay = self.limiter.retry_delay(e, attempt, sent_at)
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    self.record_retry(e, attempt)
+                    print(f"请求失败，{delay:.1f}s 后重试 ({attempt}/{self.limiter.max_retries}): {url}: {e}")
+                    time.sleep(delay)
+                    continue
+
+                self.limiter.on_success(sent_at)
+                return document_to_content(result)
+
+    def record_retry(self, error: Exception, attempt: int) -> None:
+        """按原因统计重试次数"""
+        rate_limited, _, _ = classify_error(error)
+        self.metrics.inc("retries_total", reason="rate_limited" if rate_limited else "transient")
+        self.metrics.annotate(retries=attempt)
+
+    def record_failure(self, error: Exception) -> None:
+        """按异常类型统计失败的页面"""
+        self.metrics.inc("errors_total", type=type(error).__name__)
+        self.metrics.annotate(status="failed", error=type(error).__name__)
+
+    def outputs(self, content: dict, output_path: Path, formats: list[str],
+                base_filename: str) -> list[tuple[Path, str, str]]:
+        """按请求的格式列出要保存的 (路径, 内容, 格式名称)"""
+        outputs = []
+
+        if "markdown" in formats and content["markdown"]:
+            outputs.append((output_path / f"{base_filename}.md", content["markdown"], "Markdown"))
+
+        if "html" in formats and content["html"]:
+            outputs.append((output_path / f"{base_filename}.html", content["html"], "HTML"))
+
+        if "rawHtml" in formats and content["raw_html"]:
+            outputs.append((output_path / f"{base_filename}_raw.html", content["raw_html"], "Raw HTML"))
+
+        return outputs
+
+    def save(self, content: dict, output_path: Path, formats: list[str], base_filename: str) -> list[str]:
+        """按请求的格式保存内容，返回已保存的文件列表"""
         saved_files = []
+
+        for path, text, label in self.outputs(content, output_path, formats, base_filename):
+            fmt = label.lower().replace(" ", "_")
+            with self.metrics.timer("write_seconds", format=fmt):
+                self.write(output_path, path, text)
+            self.metrics.inc("bytes_written_total", path.stat().st_size, format=fmt)
+            saved_files.append(str(path))
+            print(f"已保存 {label}: {path}")
+
+        return saved_files
+
+    def download(self, url: str, output_dir: str, formats: list[str], filename: str = None) -> dict:
+        """抓取单个 URL 并保存，返回与 download() 相同结构的结果字典"""
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        print(f"正在抓取: {url}")
+
+        with self.metrics.trace(url):
+            try:
+                content = self.scrape(url, formats)
+                return self.finish(url, content, output_path, formats, filename)
+            except Exception as e:
+                self.record_failure(e)
+                return failure_result(url, e)
+
+    def finish(self, url: str, content: dict, output_path: Path, formats: list[str], filename: str = None) -> dict:
+        """保存抓取到的内容并生成成功结果"""
+        if self.sink != "files":
+            with self.metrics.timer("write_seconds", format=self.sink):
+                location = self.bundle(output_path).add(bundle_record(url, formats, content))
+            print(f"已写入 {self.sink}: {location}")
+            return {
+                "success": True,
+                "url": url,
+                "saved_files": [location],
+                "metadata": content["metadata"]
+            }
+
         # 使用自定义文件名或从 URL 生成
-        base_filename = filename if filename else url.replace("https://", "").replace("http://", "").replace("/", "_").replace(".", "_")
-
-        # 处理 Pydantic Document 对象
-        markdown_content = result.markdown if hasattr(result, 'markdown') else None
-        html_content = result.html if hasattr(result, 'html') else None
-        raw_html_content = result.raw_html if hasattr(result, 'raw_html') else None
-        metadata = result.metadata_dict if hasattr(result, 'metadata_dict') else {}
-
-        if "markdown" in formats and markdown_content:
-            md_path = output_path / f"{base_filename}.md"
-            md_path.write_text(markdown_content, encoding="utf-8")
-            saved_files.append(str(md_path))
-            print(f"已保存 Markdown: {md_path}")
-
-        if "html" in formats and html_content:
-            html_path = output_path / f"{base_filename}.html"
-            html_path.write_text(html_content, encoding="utf-8")
-            saved_files.append(str(html_path))
-            print(f"已保存 HTML: {html_path}")
-
-        if "rawHtml" in formats and raw_html_content:
-            raw_path = output_path / f"{base_filename}_raw.html"
-            raw_path.write_text(raw_html_content, encoding="utf-8")
-            saved_files.append(str(raw_path))
-            print(f"已保存 Raw HTML: {raw_path}")
+        base_filename = filename if filename else url_to_filename(url)
+        saved_files = self.save(content, output_path, formats, base_filename)
 
         return {
             "success": True,
             "url": url,
             "saved_files": saved_files,
-            "metadata": metadata
+            "metadata": content["metadata"]
         }
 
-    except Exception as e:
-        print(f"抓取失败: {e}")
-        return {
-            "success": False,
-            "url": url,
-            "error": str(e)
-        }
+    def download_many(self, urls: list[str], output_dir: str, formats: list[str],
+                      concurrency: int = DEFAULT_CONCURRENCY) -> list[dict]:
+        """使用有界线程池批量抓取，结果顺序与输入 URL 顺序一致"""
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        workers = max(1, min(concurrency, len(urls) or 1))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                return list(pool.map(lambda u: self.download(u, output_dir, formats), urls))
+        finally:
+            self.flush()
+
+
+def failure_result(url: str, error: Exception) -> dict:
+    """生成失败结果"""
+    print(f"抓取失败: {url}: {error}")
+    return {
+        "success": False,
+        "url": url,
+        "error": str(error)
+    }
+
+
+class AsyncDownloader:
+    """
+    asyncio 下载器，不阻塞事件循环
+
+    有 AsyncFirecrawl 时直接 await 异步客户端，否则在线程池中执行同步请求；
+    文件写入始终在线程池中进行。保存逻辑与 Downloader 共用，输出完全一致。
+    """
+
+    def __init__(self, api_key: str = None, limiter: RateLimiter = None, cache: ScrapeCache = None,
+                 refresh: bool = False, dedupe: bool = False, writer: AtomicWriter = None, sink: str = "files",
+                 metrics: Metrics = None, api_url: str = None):
+        options = client_options(api_key, api_url)
+        self.metrics = metrics if metrics is not None else Metrics()
+        with self.metrics.timer("client_init_seconds"):
+            self.client = AsyncFirecrawl(**options) if AsyncFirecrawl is not None else None
+            client = Firecrawl(**options)
+        self.downloader = Downloader(client=client, limiter=limiter, cache=cache, refresh=refresh, dedupe=dedupe,
+                                     writer=writer, sink=sink, metrics=self.metrics)
+        self.limiter = self.downloader.limiter
+
+    async def scrape(self, url: str, formats: list[str]) -> dict:
+        """优先使用本地缓存，否则从 Firecrawl 抓取并写入缓存（缓存读写在线程池中进行）"""
+        content = await asyncio.to_thread(self.downloader.cached, url, formats)
+        if content is None:
+            content = await self.fetch(url, formats)
+            await asyncio.to_thread(self.downloader.store, url, formats, content)
+        return content
+
+    async def fetch(self, url: str, formats: list[str]) -> dict:
+        """抓取网页（经过限速，限流和临时错误自动重试），返回各格式内容和元数据"""
+        if self.client is None:
+            return await asyncio.to_thread(self.downloader.fetch, url, formats)
+
+        attempt = 0
+        with self.metrics.timer("scrape_seconds"):
+            while True:
+                while True:
+                    decreases = self.limiter.decreases
+                    delay = self.limiter.reserve()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    if self.limiter.decreases == decreases:
+                        break
+                sent_at = None
+                try:
+                    async with self.limiter.async_slot():
+                        sent_at = time.monotonic()
+                        result = await self.client.scrape(url, formats=formats)
+                except Exception as e:
+                    delay = self.limiter.retry_delay(e, attempt, sent_at)
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    self.downloader.record_retry(e, attempt)
+                    print(f"请求失败，{delay:.1f}s 后重试 ({attempt}/{self.limiter.max_retries}): {url}: {e}")
+                    await asyncio.sleep(delay)
+                    continue
+
+                self.limiter.on_success(sent_at)
+                return document_to_content(result)
+
+    async def download(self, url: str, output_dir: str, formats: list[str], filename: str = None) -> dict:
+        """抓取单个 URL 并保存，返回与 download() 相同结构的结果字典"""
+        output_path = Path(output_dir)
+        await asyncio.to_thread(output_path.mkdir, parents=True, exist_ok=True)
+
+        print(f"正在抓取: {url}")
+
+        with self.metrics.trace(url):
+            try:
+                content = await self.scrape(url, formats)
+                return await asyncio.to_thread(self.downloader.finish, url, content, output_path, formats, filename)
+            except Exception as e:
+                self.downloader.record_failure(e)
+                return failure_result(url, e)
+
+    async def download_many(self, urls: list[str], output_dir: str, formats: list[str],
+                            concurrency: int = DEFAULT_CONCURRENCY) -> list[dict]:
+        """以信号量限制同时进行的请求数（不超过限速器的并发上限），结果顺序与输入 URL 顺序一致"""
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, self.limiter.max_concurrency)))
+
+        async def bounded(url: str) -> dict:
+            async with semaphore:
+                return await self.download(url, output_dir, formats)
+
+        try:
+            return await asyncio.gather(*(bounded(u) for u in urls))
+        finally:
+            await asyncio.to_thread(self.downloader.flush)
+
+
+def make_cache(use_cache: bool = True, cache_ttl: float = DEFAULT_CACHE_TTL) -> Optional[ScrapeCache]:
+    """按参数创建本地缓存，禁用时返回 None"""
+    return ScrapeCache(ttl=cache_ttl) if use_cache else None
+
+
+def download(url: str, output_dir: str, format_str: str, api_key: str = None, filename: str = None,
+             max_retries: int = DEFAULT_MAX_RETRIES, use_cache: bool = True, refresh: bool = False,
+             cache_ttl: float = DEFAULT_CACHE_TTL, dedupe: bool = False, fsync: bool = False,
+             sink: str = "files", metrics: Metrics = None) -> dict:
+    """
+    使用 Firecrawl 抓取网页内容
+
+    参数:
+        url: 要抓取的网页 URL
+        output_dir: 输出目录
+        format_str: 输出格式，逗号分隔
+        api_key: Firecrawl API Key
+        filename: 自定义文件名 (可选，默认从 URL 生成)
+        max_retries: 限流或临时错误的最大重试次数
+        use_cache: 是否使用本地抓取缓存
+        refresh: 忽略已有缓存，重新抓取并更新缓存
+        cache_ttl: 缓存有效期（秒）
+        dedupe: 使用内容寻址存储，相同内容只保存一份
+        fsync: 持久化写入，返回前 fsync 输出文件和目录
+        sink: 输出方式 files / jsonl / sqlite
+        metrics: 收集指标和追踪记录的 Metrics 实例（可选）
+
+    返回:
+        包含结果的字典
+    """
+    # 初始化客户端
+    downloader = Downloader(api_key, limiter=RateLimiter(max_retries=max_retries),
+                            cache=make_cache(use_cache, cache_ttl), refresh=refresh, dedupe=dedupe,
+                            writer=AtomicWriter(durable=fsync), sink=sink, metrics=metrics)
+
+    # 验证格式
+    formats = validate_format(format_str)
+
+    print(f"格式: {', '.join(formats)}")
+    print(f"输出目录: {Path(output_dir)}")
+
+    try:
+        return downloader.download(url, output_dir, formats, filename)
+    finally:
+        downloader.close()
+
+
+def download_many(urls: list[str], output_dir: str, format_str: str, api_key: str = None,
+                  concurrency: int = DEFAULT_CONCURRENCY, requests_per_minute: float = None,
+                  max_retries: int = DEFAULT_MAX_RETRIES, use_cache: bool = True, refresh: bool = False,
+                  cache_ttl: float = DEFAULT_CACHE_TTL, dedupe: bool = False, fsync: bool = False,
+                  sink: str = "files", metrics: Metrics = None) -> list[dict]:
+    """
+    批量抓取多个 URL，所有请求共享一个 Firecrawl 客户端
+
+    参数:
+        urls: 要抓取的 URL 列表
+        output_dir: 输出目录
+        format_str: 输出格式，逗号分隔
+        api_key: Firecrawl API Key
+        concurrency: 最大并发请求数 (默认 3)
+        requests_per_minute: 每分钟最大请求数 (默认不限制，收到 429 后自动降速)
+        max_retries: 限流或临时错误的最大重试次数
+        use_cache: 是否使用本地抓取缓存
+        refresh: 忽略已有缓存，重新抓取并更新缓存
+        cache_ttl: 缓存有效期（秒）
+        dedupe: 使用内容寻址存储，相同内容只保存一份
+        fsync: 持久化写入，按批 fsync 输出文件和目录
+        sink: 输出方式 files / jsonl / sqlite
+        metrics: 收集指标和追踪记录的 Metrics 实例（可选）
+
+    返回:
+        每个 URL 一个结果字典，结构与 download() 相同
+    """
+    limiter = RateLimiter(requests_per_minute, concurrency, max_retries)
+    downloader = Downloader(api_key, limiter=limiter, cache=make_cache(use_cache, cache_ttl), refresh=refresh,
+                            dedupe=dedupe, writer=AtomicWriter(durable=fsync), sink=sink, metrics=metrics)
+    formats = validate_format(format_str)
+
+    print(f"批量抓取: {len(urls)} 个 URL，并发数 {concurrency}")
+    print(f"格式: {', '.join(formats)}")
+    print(f"输出目录: {Path(output_dir)}")
+
+    try:
+        return downloader.download_many(urls, output_dir, formats, concurrency)
+    finally:
+        downloader.close()
+
+
+async def async_download(url: str, output_dir: str, format_str: str, api_key: str = None,
+                         filename: str = None, max_retries: int = DEFAULT_MAX_RETRIES, use_cache: bool = True,
+                         refresh: bool = False, cache_ttl: float = DEFAULT_CACHE_TTL,
+                         dedupe: bool = False, fsync: bool = False, sink: str = "files",
+                         metrics: Metrics = None) -> dict:
+    """
+    download() 的异步版本，输出和保存的文件与 download() 相同
+
+    参数与返回值同 download()
+    """
+    downloader = AsyncDownloader(api_key, limiter=RateLimiter(max_retries=max_retries),
+                                 cache=make_cache(use_cache, cache_ttl), refresh=refresh, dedupe=dedupe,
+                                 writer=AtomicWriter(durable=fsync), sink=sink, metrics=metrics)
+    formats = validate_format(format_str)
+
+    print(f"格式: {', '.join(formats)}")
+    print(f"输出目录: {Path(output_dir)}")
+
+    try:
+        return await downloader.download(url, output_dir, formats, filename)
+    finally:
+        await asyncio.to_thread(downloader.downloader.close)
+
+
+async def async_download_many(urls: list[str], output_dir: str, format_str: str, api_key: str = None,
+                              concurrency: int = DEFAULT_CONCURRENCY, requests_per_minute: float = None,
+                              max_retries: int = DEFAULT_MAX_RETRIES, use_cache: bool = True,
+                              refresh: bool = False, cache_ttl: float = DEFAULT_CACHE_TTL,
+                              dedupe: bool = False, fsync: bool = False, sink: str = "files",
+                              metrics: Metrics = None) -> list[dict]:
+    """
+    download_many() 的异步版本
+
+    使用 AsyncFirecrawl 时并发数只受 concurrency 限制，不需要为每个请求占用一个线程。
+    参数与返回值同 download_many()
+    """
+    limiter = RateLimiter(requests_per_minute, concurrency, max_retries)
+    downloader = AsyncDownloader(api_key, limiter=limiter, cache=make_cache(use_cache, cache_ttl),
+                                 refresh=refresh, dedupe=dedupe, writer=AtomicWriter(durable=fsync), sink=sink,
+                                 metrics=metrics)
+    formats = validate_format(format_str)
+
+    print(f"批量抓取: {len(urls)} 个 URL，并发数 {concurrency}")
+    print(f"格式: {', '.join(formats)}")
+    print(f"输出目录: {Path(output_dir)}")
+
+    try:
+        return await downloader.download_many(urls, output_dir, formats, concurrency)
+    finally:
+        await asyncio.to_thread(downloader.downloader.close)
 
 
 def main():
@@ -180,6 +1551,7 @@ def main():
         print(f"  {sys.argv[0]} https://example.com ./output markdown")
         print(f"  {sys.argv[0]} https://example.com ./output html --api-key fc-xxx")
         print(f"  {sys.argv[0]} https://example.com ./output markdown --filename mydoc")
+        print(f"  {sys.argv[0]} urls.txt ./output markdown --batch --concurrency 3")
         sys.exit(1)
 
     url = sys.argv[1]
@@ -188,14 +1560,81 @@ def main():
 
     # 解析可选参数
     api_key = None
+    api_url = None
     filename = None
+    batch = False
+    concurrency = DEFAULT_CONCURRENCY
+    requests_per_minute = None
+    max_retries = DEFAULT_MAX_RETRIES
+    use_cache = True
+    refresh = False
+    cache_ttl = DEFAULT_CACHE_TTL
+    dedupe = False
+    fsync = False
+    sink = "files"
+    metrics_file = None
     for i, arg in enumerate(sys.argv[4:], start=4):
         if arg == "--api-key" and i + 1 < len(sys.argv):
             api_key = sys.argv[i + 1]
+        elif arg == "--api-url" and i + 1 < len(sys.argv):
+            api_url = sys.argv[i + 1]
         elif arg == "--filename" and i + 1 < len(sys.argv):
             filename = sys.argv[i + 1]
+        elif arg == "--batch":
+            batch = True
+        elif arg == "--concurrency" and i + 1 < len(sys.argv):
+            concurrency = int(sys.argv[i + 1])
+        elif arg == "--rpm" and i + 1 < len(sys.argv):
+            requests_per_minute = float(sys.argv[i + 1])
+        elif arg == "--retries" and i + 1 < len(sys.argv):
+            max_retries = int(sys.argv[i + 1])
+        elif arg == "--no-cache":
+            use_cache = False
+        elif arg == "--refresh":
+            refresh = True
+        elif arg == "--cache-ttl" and i + 1 < len(sys.argv):
+            cache_ttl = float(sys.argv[i + 1])
+        elif arg == "--dedupe":
+            dedupe = True
+        elif arg == "--fsync":
+            fsync = True
+        elif arg == "--sink" and i + 1 < len(sys.argv):
+            sink = sys.argv[i + 1]
+        elif arg == "--metrics" and i + 1 < len(sys.argv):
+            metrics_file = sys.argv[i + 1]
+
+    if sink not in SINKS:
+        print(f"错误: 无效的输出方式 {sink}，可选: {', '.join(SINKS)}")
+        sys.exit(1)
+
+    if api_url:
+        os.environ["FIRECRAWL_API_URL"] = api_url
+    metrics = Metrics()
+
+    if batch:
+        urls = read_url_list(url)
+        if not urls:
+            print("错误: URL 列表为空")
+            sys.exit(1)
+
+        results = download_many(urls, output_dir, format_str, api_key, concurrency, requests_per_minute,
+                                max_retries, use_cache, refresh, cache_ttl, dedupe, fsync, sink, metrics)
+        failed = [r for r in results if not r["success"]]
+
+        print(f"\n批量抓取完成: 成功 {len(results) - len(failed)}，失败 {len(failed)}")
+        for line in format_summary(metrics.summary()):
+            print(line)
+        if metrics_file:
+            metrics.export(metrics_file)
+            print(f"  指标已写入: {metrics_file}")
+        for r in failed:
+            print(f"  失败: {r['url']}: {r.get('error')}")
+        sys.exit(1 if failed else 0)
 
-    result = download(url, output_dir, format_str, api_key, filename)
+    result = download(url, output_dir, format_str, api_key, filename, max_retries, use_cache, refresh, cache_ttl,
+                      dedupe, fsync, sink, metrics)
+    if metrics_file:
+        metrics.export(metrics_file)
 
     if result["success"]:
         print("\n抓取完成!")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Firecrawl Mock Server - 本地模拟 Firecrawl 抓取接口，用于离线测试和基准测试
+
+模拟 POST /v1/scrape 和 /v2/scrape：按请求的格式返回生成的内容，
+可配置延迟、页面大小、错误率、限流 (429) 率和滑动窗口配额。不消耗 API 额度，也不需要网络。
+
+用法:
+    python mock_server.py [选项]
+
+参数:
+    --port: 监听端口 (可选，默认 3002)
+    --latency: 平均响应延迟毫秒数 (可选，默认 0)
+    --jitter: 延迟的随机波动毫秒数 (可选，默认 0)
+    --size: 每个页面的 markdown 字节数 (可选，默认 4096)
+    --links: 每个页面包含的链接数 (可选，默认 5)
+    --error-rate: 返回 500 的比例 0-1 (可选，默认 0)
+    --rate-limit-rate: 返回 429 的比例 0-1 (可选，默认 0)
+    --retry-after: 429 响应的 Retry-After 秒数 (可选，默认 1)
+    --quota: 每个配额窗口内允许的请求数，超出时返回 429 (可选，默认不限制)
+    --quota-window: 配额窗口秒数 (可选，默认 60，即 --quota 为每分钟请求数)
+    --seed: 随机数种子 (可选)
+
+让下载器使用模拟服务器:
+    export FIRECRAWL_API_URL=http://127.0.0.1:3002
+    python download.py https://example.com/a ./output markdown --api-key fc-mock
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+DEFAULT_PORT = 3002
+
+
+class MockConfig:
+    """模拟服务器的行为参数，运行中修改立即生效"""
+
+    def __init__(self, latency: float = 0, jitter: float = 0, size: int = 4096, links: int = 5,
+                 error_rate: float = 0, rate_limit_rate: float = 0, retry_after: float = 1, seed: int = None,
+                 quota: int = 0, quota_window: float = 60):
+        self.latency = latency
+        self.jitter = jitter
+        self.size = size
+        self.links = links
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.quota = quota
+        self.quota_window = quota_window
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.admitted = deque()
+
+    def roll(self) -> tuple[float, float]:
+        """返回 (本次延迟秒数, 随机数)"""
+        with self.lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)) / 1000
+            return delay, self.random.random()
+
+    def admit(self) -> float:
+        """按滑动窗口配额接纳请求，超出配额时返回需要等待的秒数，否则返回 0"""
+        if not self.quota:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            while self.admitted and self.admitted[0] <= now - self.quota_window:
+                self.admitted.popleft()
+            if len(self.admitted) >= self.quota:
+                self.rate_limited += 1
+                return self.admitted[0] + self.quota_window - now
+            self.admitted.append(now)
+            return 0.0
+
+
+def make_page(url: str, formats: list[str], size: int, links: int) -> dict:
+    """按请求的格式生成页面内容，markdown 约为 size 字节"""
+    base = url.rstrip("/")
+    hrefs = [f"{base}/page-{i}" for i in range(links)]
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+    body = (line * (size // len(line) + 1))[:max(0, size - len(url) - 3)]
+
+    data = {"metadata": {"title": url, "sourceURL": url, "url": url, "statusCode": 200}}
+    if "markdown" in formats:
+        data["markdown"] = f"# {url}\n\n{body}"
+    if "html" in formats or "rawHtml" in formats:
+        anchors = "".join(f'<a href="{href}">{href}</a>' for href in hrefs)
+        html = f"<h1>{url}</h1><p>{body}</p>{anchors}"
+        if "html" in formats:
+            data["html"] = html
+        if "rawHtml" in formats:
+            data["rawHtml"] = f"<html><head><title>{url}</title></head><body>{html}</body></html>"
+    if "links" in formats:
+        data["links"] = hrefs
+    return data
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """处理抓取请求，行为由 server.config 决定"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.reply(400, {"success": False, "error": "Invalid JSON body"})
+
+        if urlsplit(self.path).path.rstrip("/") not in ("/v1/scrape", "/v2/scrape"):
+            return self.reply(404, {"success": False, "error": f"Not found: {self.path}"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self.reply(401, {"success": False, "error": "Unauthorized: missing API key"})
+        if not payload.get("url"):
+            return self.reply(400, {"success": False, "error": "url is required"})
+
+        delay, chance = config.roll()
+        wait = config.admit()
+        time.sleep(delay)
+
+        if wait or chance < config.rate_limit_rate:
+            retry_after = f"{wait or config.retry_after:.2f}".rstrip("0").rstrip(".")
+            message = (f"Rate limit exceeded. Consumed (req/min): 0, Remaining (req/min): 0. "
+                       f"Please retry after {retry_after}s")
+            return self.reply(429, {"success": False, "error": message}, {"Retry-After": retry_after})
+        if chance < config.rate_limit_rate + config.error_rate:
+            return self.reply(500, {"success": False, "error": "Internal server error (mock)"})
+
+        formats = payload.get("formats") or ["markdown"]
+        formats = [f if isinstance(f, str) else f.get("type", "") for f in formats]
+        data = make_page(payload["url"], formats, config.size, config.links)
+        self.reply(200, {"success": True, "data": data})
+
+    def reply(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 基准测试时不输出每个请求的日志
+        pass
+
+
+class MockServer:
+    """
+    在后台线程中运行模拟服务器
+
+        with MockServer(MockConfig(latency=50)) as server:
+            os.environ["FIRECRAWL_API_URL"] = server.url
+    """
+
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config if config is not None else MockConfig()
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = self.config
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    """命令行入口"""
+    port = DEFAULT_PORT
+    options = {}
+    for i, arg in enumerate(sys.argv[1:], start=1):
+        has_value = i + 1 < len(sys.argv)
+        if arg == "--port" and has_value:
+            port = int(sys.argv[i + 1])
+        elif arg == "--latency" and has_value:
+            options["latency"] = float(sys.argv[i + 1])
+        elif arg == "--jitter" and has_value:
+            options["jitter"] = float(sys.argv[i + 1])
+        elif arg == "--size" and has_value:
+            options["size"] = int(sys.argv[i + 1])
+        elif arg == "--links" and has_value:
+            options["links"] = int(sys.argv[i + 1])
+        elif arg == "--error-rate" and has_value:
+            options["error_rate"] = float(sys.argv[i + 1])
+        elif arg == "--rate-limit-rate" and has_value:
+            options["rate_limit_rate"] = float(sys.argv[i + 1])
+        elif arg == "--retry-after" and has_value:
+            options["retry_after"] = float(sys.argv[i + 1])
+        elif arg == "--quota" and has_value:
+            options["quota"] = int(sys.argv[i + 1])
+        elif arg == "--quota-window" and has_value:
+            options["quota_window"] = float(sys.argv[i + 1])
+        elif arg == "--seed" and has_value:
+            options["seed"] = int(sys.argv[i + 1])
+        elif arg in ("-h", "--help"):
+            print(__doc__)
+            sys.exit(0)
+
+    server = MockServer(MockConfig(**options), port=port)
+    print(f"模拟 Firecrawl 服务器: {server.url}")
+    print(f"使用: export FIRECRAWL_API_URL={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
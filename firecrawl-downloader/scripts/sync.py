@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Firecrawl Sync - 增量同步已下载的页面
+
+按 URL 列表重新抓取，与 <output_dir>/.sync-manifest.json 中记录的内容指纹比较，
+只改写内容真正变化的文件，并报告新增、变化、未变化和已移除的页面。
+
+用法:
+    python sync.py <url_list> <output_dir> <format> [选项]
+
+参数:
+    url_list: URL 列表文件 (每行一个，"-" 表示标准输入)
+    output_dir: 输出目录
+    format: 输出格式 (markdown, html, rawHtml)
+    --concurrency: 最大并发数 (可选，默认 3)
+    --rpm: 每分钟最大请求数 (可选)
+    --prune: 删除不在 URL 列表中的页面文件
+    --use-cache: 允许使用本地抓取缓存 (默认总是重新抓取)
+    --api-key / --dedupe: 同 download.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+from download import (
+    DEFAULT_CONCURRENCY,
+    Downloader,
+    RateLimiter,
+    failure_result,
+    make_cache,
+    read_url_list,
+    url_to_filename,
+    validate_format,
+)
+
+
+MANIFEST_NAME = ".sync-manifest.json"
+
+# 元数据中表示源站版本的字段（不区分大小写）
+ETAG_KEYS = {"etag"}
+LAST_MODIFIED_KEYS = {"last-modified", "lastmodified", "last_modified"}
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: Path) -> Optional[str]:
+    """磁盘上现有文件的哈希，文件不存在时返回 None"""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def source_version(metadata: dict) -> dict:
+    """从 metadata_dict 中取出 ETag / Last-Modified（如果有）"""
+    version = {"etag": None, "last_modified": None}
+    for key, value in (metadata or {}).items():
+        lowered = key.lower()
+        if lowered in ETAG_KEYS:
+            version["etag"] = value
+        elif lowered in LAST_MODIFIED_KEYS:
+            version["last_modified"] = value
+    return version
+
+
+def load_manifest(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"pages": {}}
+
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    """原子写入清单"""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def sync_page(downloader: Downloader, url: str, output_path: Path, formats: list[str],
+              entry: dict = None) -> tuple[str, dict, dict]:
+    """
+    抓取单个页面，只写入内容有变化的文件
+
+    清单中没有记录或记录的哈希不同的文件先与磁盘上的现有文件比较，内容相同时不改写，也不算作变化。
+    entry 为空或带有 removed_at（曾从 URL 列表中移除）时，有写入则视为新增。
+
+    返回:
+        (状态, 结果字典, 新的清单条目)，状态为 added / changed / unchanged / failed
+    """
+    print(f"正在同步: {url}")
+    try:
+        content = downloader.scrape(url, formats)
+    except Exception as e:
+        return "failed", failure_result(url, e), entry
+
+    old_files = (entry or {}).get("files", {})
+    files = {}
+    saved_files = []
+    written = 0
+
+    for path, text, label in downloader.outputs(content, output_path, formats, url_to_filename(url)):
+        digest = text_hash(text)
+        files[path.name] = digest
+        saved_files.append(str(path))
+        if old_files.get(path.name) == digest and path.exists():
+            continue
+        if file_hash(path) == digest:
+            continue
+        downloader.write(output_path, path, text)
+        written += 1
+        print(f"已更新 {label}: {path}")
+
+    if entry is None or "removed_at" in entry:
+        status = "added" if written else "unchanged"
+    elif written or set(old_files) - set(files):
+        # 磁盘上已是新内容的文件不算变化；不再生成的文件算作变化
+        status = "changed"
+    else:
+        status = "unchanged"
+
+    new_entry = {
+        "sha256": text_hash("\n".join(f"{name}:{digest}" for name, digest in sorted(files.items()))),
+        "scraped_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        **source_version(content["metadata"]),
+        "files": files,
+    }
+    result = {
+        "success": True,
+        "url": url,
+        "saved_files": saved_files,
+        "metadata": content["metadata"]
+    }
+    return status, result, new_entry
+
+
+def sync(urls: list[str], output_dir: str, format_str: str, api_key: str = None,
+         concurrency: int = DEFAULT_CONCURRENCY, requests_per_minute: float = None, prune: bool = False,
+         use_cache: bool = False, dedupe: bool = False) -> dict:
+    """
+    增量同步 URL 列表到输出目录
+
+    参数:
+        urls: 要同步的 URL 列表
+        output_dir: 输出目录
+        format_str: 输出格式，逗号分隔
+        api_key: Firecrawl API Key
+        concurrency: 最大并发请求数
+        requests_per_minute: 每分钟最大请求数
+        prune: 删除不在 URL 列表中的页面文件并移出清单（不删除时在清单中标记 removed_at，只报告一次）
+        use_cache: 是否允许使用本地抓取缓存（默认总是重新抓取）
+        dedupe: 使用内容寻址存储
+
+    返回:
+        {"added": [...], "changed": [...], "unchanged": [...], "removed": [...], "failed": [...],
+         "results": [每个 URL 的结果字典]}
+    """
+    formats = validate_format(format_str)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    limiter = RateLimiter(requests_per_minute, concurrency)
+    downloader = Downloader(api_key, limiter=limiter, cache=make_cache(True), refresh=not use_cache,
+                            dedupe=dedupe)
+
+    manifest_path = output_path / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    pages = manifest["pages"]
+    if manifest.get("formats") not in (None, formats):
+        print(f"格式与上次同步不同 ({', '.join(manifest['formats'])})，所有页面都将视为变化")
+        pages = {url: {**entry, "files": {}} for url, entry in pages.items()}
+    manifest["formats"] = formats
+
+    report = {"added": [], "changed": [], "unchanged": [], "removed": [], "failed": [], "results": []}
+    print(f"增量同步: {len(urls)} 个 URL，并发数 {concurrency}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {
+                pool.submit(sync_page, downloader, url, output_path, formats, pages.get(url)): url
+                for url in urls
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                status, result, entry = future.result()
+                report[status].append(url)
+                report["results"].append(result)
+                if entry is not None:
+                    pages[url] = entry
+
+        wanted = set(urls)
+        for url in sorted(set(pages) - wanted):
+            if prune:
+                report["removed"].append(url)
+                for name in pages[url].get("files", {}):
+                    (output_path / name).unlink(missing_ok=True)
+                del pages[url]
+            elif "removed_at" not in pages[url]:
+                report["removed"].append(url)
+                pages[url]["removed_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    finally:
+        downloader.writer.sync()
+        manifest["pages"] = pages
+        save_manifest(manifest_path, manifest)
+
+    return report
+
+
+def main():
+    """命令行入口"""
+    if len(sys.argv) < 4:
+        print(__doc__)
+        print("\n示例:")
+        print(f"  {sys.argv[0]} urls.txt ./output markdown")
+        print(f"  {sys.argv[0]} urls.txt ./output markdown,html --prune")
+        sys.exit(1)
+
+    urls = read_url_list(sys.argv[1])
+    output_dir = sys.argv[2]
+    format_str = sys.argv[3]
+
+    # 解析可选参数
+    options = {}
+    for i, arg in enumerate(sys.argv[4:], start=4):
+        has_value = i + 1 < len(sys.argv)
+        if arg == "--api-key" and has_value:
+            options["api_key"] = sys.argv[i + 1]
+        elif arg == "--concurrency" and has_value:
+            options["concurrency"] = int(sys.argv[i + 1])
+        elif arg == "--rpm" and has_value:
+            options["requests_per_minute"] = float(sys.argv[i + 1])
+        elif arg == "--prune":
+            options["prune"] = True
+        elif arg == "--use-cache":
+            options["use_cache"] = True
+        elif arg == "--dedupe":
+            options["dedupe"] = True
+
+    report = sync(urls, output_dir, format_str, **options)
+
+    print("\n同步完成:")
+    for status, label in [("added", "新增"), ("changed", "变化"), ("unchanged", "未变化"),
+                          ("removed", "已移除"), ("failed", "失败")]:
+        print(f"  {label}: {len(report[status])}")
+    for url in report["changed"] + report["added"]:
+        print(f"  更新: {url}")
+    for url in report["removed"]:
+        print(f"  移除: {url}")
+    for r in report["results"]:
+        if not r["success"]:
+            print(f"  失败: {r['url']}: {r.get('error')}")
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
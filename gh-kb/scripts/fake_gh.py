@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Fake gh - 离线模拟 gh CLI 的 search 子命令，用于测试 search.py
+
+支持:
+    fake_gh.py --version
+    fake_gh.py auth status
+    fake_gh.py search <repos|issues|prs|commits|code> [参数] --json <字段> [--limit N] [--] <关键词...>
+
+结果由关键词确定性生成：每个关键词对应一组固定条目，多个关键词的结果交错合并，
+因此共享关键词的两个查询会返回部分相同的条目，可用于测试合并去重。只输出 --json 请求的字段。
+
+环境变量:
+    FAKE_GH_DELAY: 每次搜索的延迟秒数 (默认 0)
+    FAKE_GH_LOG: 把每次调用的参数追加写入该文件（JSON Lines），用于统计调用次数
+    FAKE_GH_FAIL: 关键词包含该字符串时模拟限流失败（退出码 1）
+
+用法:
+    python search.py 'gh search repos "rust web"' --gh scripts/fake_gh.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+
+OWNERS = ("acme", "octo-org", "fake-labs")
+
+
+def number(seed: str, modulo: int) -> int:
+    """由字符串确定性生成 0..modulo-1 的整数"""
+    return int(hashlib.sha256(seed.encode("utf-8")).hexdigest()[:8], 16) % modulo
+
+
+def make_item(kind: str, term: str, index: int, flags: dict) -> dict:
+    """生成一个包含该类型所有常用字段的条目"""
+    slug = "-".join(term.lower().split()) or "item"
+    seed = f"{kind}:{slug}:{index}"
+    owner = OWNERS[number(seed, len(OWNERS))]
+    repo = f"{owner}/{slug}-{index}"
+    repo_info = {"name": f"{slug}-{index}", "nameWithOwner": repo, "fullName": repo,
+                 "url": f"https://github.com/{repo}"}
+    day = f"2026-{number(seed + 'm', 12) + 1:02d}-{number(seed + 'd', 28) + 1:02d}T08:00:00Z"
+    author = {"login": f"user{number(seed, 100)}", "type": "User", "is_bot": False}
+
+    if kind == "repos":
+        return {
+            "fullName": repo, "name": repo_info["name"], "url": repo_info["url"],
+            "description": f"A {term} project for testing ({index})",
+            "stargazersCount": number(seed, 50000), "forksCount": number(seed + "f", 5000),
+            "language": flags.get("language", "Python"), "updatedAt": day, "createdAt": "2024-01-01T00:00:00Z",
+            "homepage": "", "license": {"key": "mit", "name": "MIT License"}, "owner": {"login": owner},
+            "isArchived": False, "openIssuesCount": number(seed + "i", 300), "watchersCount": number(seed, 50000),
+            "defaultBranch": "main", "size": number(seed + "s", 100000), "visibility": "public",
+        }
+    if kind in ("issues", "prs"):
+        path = "pull" if kind == "prs" else "issues"
+        num = number(seed, 9000) + 1
+        return {
+            "title": f"{term}: {'improve' if kind == 'prs' else 'problem with'} case {index}",
+            "url": f"https://github.com/{repo}/{path}/{num}", "number": num,
+            "state": flags.get("state", "open"), "author": author, "commentsCount": number(seed + "c", 80),
+            "createdAt": day, "updatedAt": day, "closedAt": None, "repository": repo_info,
+            "body": f"Details about {term}. " * 10, "labels": [], "isPullRequest": kind == "prs",
+        }
+    if kind == "commits":
+        sha = hashlib.sha1(seed.encode("utf-8")).hexdigest()
+        return {
+            "sha": sha, "url": f"https://github.com/{repo}/commit/{sha}", "author": author,
+            "commit": {"message": f"Add {term} support ({index})\n\nLonger description.",
+                       "author": {"name": author["login"], "email": "dev@example.com", "date": day},
+                       "committer": {"name": author["login"], "email": "dev@example.com", "date": day}},
+            "committer": author, "repository": repo_info,
+        }
+    path = f"src/{slug}_{index}.py"
+    return {
+        "path": path, "sha": hashlib.sha1(seed.encode("utf-8")).hexdigest(),
+        "url": f"https://github.com/{repo}/blob/main/{path}", "repository": repo_info,
+        "textMatches": [{"fragment": f"def {slug.replace('-', '_')}():\n    return {index}",
+                         "property": "content", "type": "FileContent"}],
+    }
+
+
+def parse_search(args: list[str]) -> tuple[str, list[str], dict]:
+    """返回 (类型, 关键词, {参数: 值})"""
+    kind, terms, flags = args[0], [], {}
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        if arg == "--":
+            terms += args[i + 1:]
+            break
+        if arg.startswith("-"):
+            name, _, value = arg.lstrip("-").partition("=")
+            name = {"L": "limit", "R": "repo"}.get(name, name)
+            if not value and i + 1 < len(args) and not args[i + 1].startswith("-"):
+                i += 1
+                value = args[i]
+            flags[name] = value or "true"
+        else:
+            terms.append(arg)
+        i += 1
+    return kind, terms, flags
+
+
+def search(args: list[str]) -> int:
+    kind, terms, flags = parse_search(args)
+    if kind not in ("repos", "issues", "prs", "commits", "code"):
+        print(f'unknown command "{kind}" for "gh search"', file=sys.stderr)
+        return 1
+    if kind == "code" and not terms:
+        print("specify search keywords", file=sys.stderr)
+        return 1
+
+    fail = os.environ.get("FAKE_GH_FAIL")
+    if fail and any(fail in term for term in terms):
+        print("HTTP 403: API rate limit exceeded for user (https://api.github.com/search)", file=sys.stderr)
+        return 1
+
+    time.sleep(float(os.environ.get("FAKE_GH_DELAY") or 0))
+
+    limit = int(flags.get("limit", 30))
+    words = [t for t in terms if not t.startswith("-")] or ["any"]
+    # 每个关键词一组条目，交错合并
+    items = [make_item(kind, word, i, flags) for i in range(limit) for word in words][:limit]
+
+    if "json" not in flags:
+        for item in items:
+            print(item.get("url"))
+        return 0
+    fields = [f for f in flags["json"].split(",") if f]
+    print(json.dumps([{f: item[f] for f in fields if f in item} for item in items]))
+    return 0
+
+
+def main():
+    args = sys.argv[1:]
+    log = os.environ.get("FAKE_GH_LOG")
+    if log:
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(args, ensure_ascii=False) + "\n")
+
+    if args[:1] == ["--version"]:
+        print("gh version 2.63.0 (fake)")
+        sys.exit(0)
+    if args[:2] == ["auth", "status"]:
+        print("github.com\n  ✓ Logged in to github.com account fake-user")
+        sys.exit(0)
+    if args[:1] == ["search"] and len(args) > 1:
+        sys.exit(search(args[1:]))
+
+    print(f"unsupported fake gh command: {' '.join(args)}", file=sys.stderr)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+"""
+gh-kb Search - 并行执行多个 gh search 命令，缓存结果并合并去重输出
+
+用法:
+    python search.py '<gh search 命令>' ['<gh search 命令>' ...] [选项]
+    python search.py --specs <文件> [选项]
+
+参数:
+    命令: 完整的 gh search 命令（整体加引号），如
+          'gh search repos "rust web framework" --language rust --sort stars --limit 10'
+          开头的 "gh search" 可以省略；未指定 --json 时自动使用下方的默认字段，未指定 --limit 时为 10
+    --specs: 搜索规格文件（"-" 表示标准输入）。JSON 数组，元素为命令字符串或
+             {"kind": "repos", "query": "...", "flags": {"language": "rust"}, "fields": [...]}；
+             非 JSON 时每行一个命令
+    --concurrency: 同时运行的 gh 进程数 (可选，默认 4)
+    --ttl: 缓存有效期秒数 (可选，默认 3600)
+    --no-cache: 不读写本地缓存
+    --refresh: 忽略已有缓存，重新搜索并更新缓存
+    --format: 输出格式 markdown (默认，SKILL.md 中的汇总格式) / json (合并后的结构化结果)
+    --gh: gh 可执行文件 (可选，默认读取 GH_KB_GH，否则为 gh；离线测试可用 fake_gh.py)
+    --local: 先查本地全文索引，只有索引中缺少或过期的搜索才调用 gh
+    --offline: 只查本地全文索引，不调用 gh
+    --index-ttl: --local 模式下索引结果的有效期秒数 (可选，默认 604800，即 7 天)
+
+缓存按规范化后的命令（子命令、参数排序、字段排序）存储在 ~/.cache/gh-kb/，
+可用 GH_KB_CACHE_DIR 修改。执行器需要 JSON 结果，不支持 --jq、--template 和 --web。
+
+从 gh 取得的每个结果都写入同一目录下的 index.sqlite（SQLite FTS5 全文索引，记录各字段和抓取时间）。
+--local / --offline 时每个搜索先按完全相同的命令查找，再按关键词全文匹配同类型的条目
+（应用 --language、--owner、--repo、--state 及对应的 language: / user: / org: / repo: / is:open 等
+限定符过滤和 --sort 排序）。包含其他参数或限定符（如 --label、-label:wontfix、stars:>100）的搜索
+无法在本地判断：--local 时调用 gh，--offline 时报错。
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "gh-kb"
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_INDEX_TTL = 7 * 24 * 3600
+DEFAULT_CONCURRENCY = 4
+DEFAULT_LIMIT = 10
+DEFAULT_TIMEOUT = 60
+
+# 输出顺序与 SKILL.md 一致
+KINDS = ("repos", "issues", "prs", "commits", "code")
+
+KIND_TITLES = {
+    "repos": "仓库",
+    "issues": "Issues",
+    "prs": "PRs",
+    "commits": "提交",
+    "code": "代码",
+}
+
+# 汇总输出需要的字段，总是与用户指定的 --json 字段合并
+DEFAULT_FIELDS = {
+    "repos": ["fullName", "stargazersCount", "forksCount", "description", "language", "updatedAt", "url"],
+    "issues": ["title", "url", "state", "author", "commentsCount", "createdAt", "updatedAt", "repository", "body"],
+    "prs": ["title", "url", "state", "author", "commentsCount", "createdAt", "updatedAt", "repository", "body"],
+    "commits": ["sha", "commit", "author", "url", "repository"],
+    "code": ["path", "repository", "url", "textMatches"],
+}
+
+SHORT_FLAGS = {"-L": "limit", "-R": "repo", "-q": "jq", "-t": "template", "-w": "web"}
+
+# 不带值的布尔参数
+BOOL_FLAGS = {
+    "archived", "draft", "merged", "locked", "include-prs", "include-forks",
+    "no-assignee", "no-label", "no-milestone", "no-project", "web",
+}
+
+UNSUPPORTED_FLAGS = {"jq", "template", "web"}
+
+
+def parse_command(command: str) -> dict:
+    """
+    解析 gh search 命令为搜索规格
+
+    返回 {"kind", "query": [关键词...], "flags": {参数: 值或值列表}, "fields": [字段...]}
+    """
+    tokens = shlex.split(command)
+    if tokens[:1] == ["gh"]:
+        tokens = tokens[1:]
+    if tokens[:1] == ["search"]:
+        tokens = tokens[1:]
+    if not tokens:
+        raise ValueError(f"缺少搜索类型: {command}")
+
+    kind, query, flags, fields = tokens[0], [], {}, []
+    i = 1
+    while i < len(tokens):
+        token = tokens[i]
+        if token == "--":
+            query.extend(tokens[i + 1:])
+            break
+        if token.startswith("--") or token in SHORT_FLAGS:
+            name, _, value = token.lstrip("-").partition("=")
+            name = SHORT_FLAGS.get(token, name)
+            if name in BOOL_FLAGS:
+                value = value or "true"
+            elif not value:
+                if i + 1 >= len(tokens):
+                    raise ValueError(f"参数 --{name} 缺少值: {command}")
+                i += 1
+                value = tokens[i]
+            if name == "json":
+                fields.extend(f for f in value.split(",") if f)
+            elif name in flags:
+                previous = flags[name] if isinstance(flags[name], list) else [flags[name]]
+                flags[name] = previous + [value]
+            else:
+                flags[name] = value
+        else:
+            query.append(token)
+        i += 1
+
+    return {"kind": kind, "query": query, "flags": flags, "fields": fields}
+
+
+def normalize_spec(spec) -> dict:
+    """
+    规范化搜索规格：校验子命令，补全默认字段和数量，参数和字段排序
+
+    spec 可以是命令字符串或 dict（query 可以是字符串）。
+    """
+    if isinstance(spec, str):
+        spec = parse_command(spec)
+
+    kind = spec.get("kind")
+    if kind not in KINDS:
+        raise ValueError(f"不支持的搜索类型: {kind} (支持: {', '.join(KINDS)})")
+
+    query = spec.get("query") or []
+    if isinstance(query, str):
+        query = shlex.split(query)
+    if kind == "code" and not query:
+        raise ValueError("gh search code 的查询关键词不能为空")
+
+    flags = {}
+    for name, value in (spec.get("flags") or {}).items():
+        name = SHORT_FLAGS.get(name, name.lstrip("-"))
+        if name in UNSUPPORTED_FLAGS:
+            raise ValueError(f"执行器需要 JSON 结果，不支持 --{name}")
+        flags[name] = sorted(str(v) for v in value) if isinstance(value, list) else str(value)
+    flags.setdefault("limit", str(DEFAULT_LIMIT))
+
+    fields = sorted(set(spec.get("fields") or []) | set(DEFAULT_FIELDS[kind]))
+    return {"kind": kind, "query": list(query), "flags": dict(sorted(flags.items())), "fields": fields}
+
+
+def flag_args(spec: dict) -> list[str]:
+    """参数列表（不含 --json），多值参数重复出现"""
+    args = []
+    for name, value in spec["flags"].items():
+        for v in value if isinstance(value, list) else [value]:
+            args += [f"--{name}"] if name in BOOL_FLAGS and v == "true" else [f"--{name}", v]
+    return args
+
+
+def build_args(spec: dict) -> list[str]:
+    """由规范化的规格生成 gh 参数（不含 gh 本身）；关键词放在 -- 之后，支持 -label:xxx 排除语法"""
+    args = ["search", spec["kind"], *flag_args(spec), "--json", ",".join(spec["fields"])]
+    if spec["query"]:
+        args += ["--", *spec["query"]]
+    return args
+
+
+def display_command(spec: dict) -> str:
+    """用于输出尾部的命令摘要（省略 --json 字段列表）"""
+    query = spec["query"]
+    if any(term.startswith("-") for term in query):
+        return shlex.join(["gh", "search", spec["kind"], *flag_args(spec), "--", *query])
+    return shlex.join(["gh", "search", spec["kind"], *query, *flag_args(spec)])
+
+
+def spec_key(spec: dict) -> str:
+    """缓存键：规范化规格的哈希"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """本地搜索缓存：每个规范化命令一个 JSON 文件，超过 ttl 秒视为过期"""
+
+    def __init__(self, cache_dir: Path = None, ttl: float = DEFAULT_CACHE_TTL):
+        cache_dir = cache_dir or os.environ.get("GH_KB_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.ttl = ttl
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, spec: dict) -> Optional[list]:
+        """返回未过期的结果列表，未命中时返回 None"""
+        try:
+            entry = json.loads(self._path(spec_key(spec)).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry["fetched_at"] > self.ttl:
+            return None
+        return entry["results"]
+
+    def put(self, spec: dict, results: list) -> None:
+        path = self._path(spec_key(spec))
+        entry = {"spec": spec, "fetched_at": time.time(), "results": results}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# 本地查询时支持的排序字段（--sort 值 -> 条目字段）
+SORT_FIELDS = {
+    "stars": "stargazersCount",
+    "forks": "forksCount",
+    "updated": "updatedAt",
+    "created": "createdAt",
+    "comments": "commentsCount",
+    "committer-date": "updatedAt",
+    "author-date": "updatedAt",
+}
+
+# 排序字段缺失时的默认值（时间字段为 ISO 字符串，其余为数字）
+DATE_SORT_FIELDS = {"updatedAt", "createdAt"}
+
+# 本地索引能判断的参数；其他过滤参数只有 gh 能判断
+LOCAL_FLAGS = {"language", "owner", "repo", "state", "limit", "sort", "order"}
+
+# 条目中有 language 字段、能在本地按语言过滤的搜索类型（issues、prs、code 的结果没有该字段）
+LANGUAGE_KINDS = {"repos"}
+
+# 查询中本地能判断的限定符 -> 对应的过滤字段（is: 只支持 open / closed）
+LOCAL_QUALIFIERS = {"language": "language", "user": "owner", "org": "owner", "repo": "repo",
+                    "state": "state", "is": "state"}
+
+
+def item_text(kind: str, item: dict) -> tuple[str, str]:
+    """条目用于全文检索的 (标题, 正文)"""
+    if kind == "repos":
+        return item.get("fullName", ""), " ".join(filter(None, [item.get("description"),
+                                                                 " ".join(item.get("topics") or [])]))
+    if kind == "commits":
+        message = (item.get("commit") or {}).get("message") or ""
+        return (message.splitlines() or [""])[0], message
+    if kind == "code":
+        fragments = [m.get("fragment", "") for m in item.get("textMatches") or [] if isinstance(m, dict)]
+        return item.get("path", ""), "\n".join(fragments)
+    return item.get("title", ""), item.get("body") or ""
+
+
+def item_dates(kind: str, item: dict) -> tuple[str, str]:
+    """条目的 (创建时间, 更新时间)"""
+    if kind == "commits":
+        date = ((item.get("commit") or {}).get("author") or {}).get("date") or ""
+        return date, date
+    return item.get("createdAt") or "", item.get("updatedAt") or item.get("createdAt") or ""
+
+
+def fts_phrases(terms: list[str]) -> tuple[list[str], list[str]]:
+    """
+    把 gh 查询关键词转为 FTS5 短语，返回 (包含的短语, -word 排除的短语)；
+    带冒号的限定符（如 -label:wontfix、language:go）不参与全文匹配，由 local_filters 处理
+    """
+    include, exclude = [], []
+    for term in terms:
+        negative = term.startswith("-")
+        term = term.lstrip("-")
+        if not term or ":" in term:
+            continue
+        phrase = '"' + term.replace('"', '""') + '"'
+        (exclude if negative else include).append(phrase)
+    return include, exclude
+
+
+def fts_query(terms: list[str]) -> str:
+    """
+    由 gh 查询关键词生成 FTS5 查询：每个关键词（短语）作为一个带引号的短语，全部 AND，-word 转为 NOT；
+    只有排除词时 FTS5 无法单独表达 NOT，返回空字符串（见 SearchIndex.match）
+    """
+    include, exclude = fts_phrases(terms)
+    if not include:
+        return ""
+    return " NOT ".join([" AND ".join(include), *exclude])
+
+
+def local_filters(spec: dict) -> tuple[list[tuple[str, set]], list[str]]:
+    """
+    拆分搜索规格中的过滤条件
+
+    返回 (本地可判断的条件 [(字段, 可接受的值)]，每个条件都必须满足; 本地无法判断的参数和限定符)。
+    """
+    filters, unsupported = [], []
+    for name, value in spec["flags"].items():
+        if name not in LOCAL_FLAGS or (name == "language" and spec["kind"] not in LANGUAGE_KINDS):
+            unsupported.append(f"--{name}")
+        elif name == "sort" and value not in SORT_FIELDS and value != "best-match":
+            unsupported.append(f"--sort {value}")
+        elif name in ("language", "owner", "repo", "state"):
+            filters.append((name, {v.lower() for v in (value if isinstance(value, list) else [value])}))
+    for term in spec["query"]:
+        qualifier, colon, value = term.partition(":")
+        if not colon:
+            continue
+        field = LOCAL_QUALIFIERS.get(qualifier)
+        if field is None or not value or (field == "state" and value.lower() not in ("open", "closed")) \
+                or (field == "language" and spec["kind"] not in LANGUAGE_KINDS):
+            unsupported.append(term)
+        else:
+            filters.append((field, {value.lower()}))
+    return filters, unsupported
+
+
+class SearchIndex:
+    """
+    gh 搜索结果的本地全文索引（SQLite FTS5）
+
+    - items: 每个条目一行（类型 + 去重键），保存检索字段、时间和合并后的完整 JSON
+    - items_fts: 标题、正文、仓库的全文索引，由触发器与 items 同步
+    - searches: 每个规范化搜索最近一次的抓取时间和结果顺序，相同命令可直接还原结果
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            kind TEXT NOT NULL, key TEXT NOT NULL, url TEXT, repo TEXT, title TEXT, body TEXT,
+            created_at TEXT, updated_at TEXT, fetched_at REAL NOT NULL, data TEXT NOT NULL,
+            PRIMARY KEY (kind, key)
+        );
+        CREATE TABLE IF NOT EXISTS searches (
+            key TEXT PRIMARY KEY, kind TEXT NOT NULL, command TEXT NOT NULL, fetched_at REAL NOT NULL,
+            items TEXT NOT NULL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+            title, body, repo, content='items', tokenize='porter unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+            INSERT INTO items_fts(rowid, title, body, repo) VALUES (new.rowid, new.title, new.body, new.repo);
+        END;
+        CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, title, body, repo)
+                VALUES ('delete', old.rowid, old.title, old.body, old.repo);
+            INSERT INTO items_fts(rowid, title, body, repo) VALUES (new.rowid, new.title, new.body, new.repo);
+        END;
+    """
+
+    def __init__(self, path: Path = None):
+        if path is None:
+            cache_dir = os.environ.get("GH_KB_CACHE_DIR") or DEFAULT_CACHE_DIR
+            path = Path(cache_dir).expanduser() / "index.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 执行器在多个线程中读写，用一个连接加锁串行访问
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(self.SCHEMA)
+
+    def ingest(self, spec: dict, results: list, fetched_at: float = None) -> None:
+        """写入一次 gh 搜索的结果；已有条目合并字段并更新抓取时间"""
+        fetched_at = fetched_at or time.time()
+        kind = spec["kind"]
+        keys = []
+        with self._lock, self.db:
+            for item in results:
+                key = item_key(kind, item)
+                keys.append(key)
+                row = self.db.execute("SELECT data FROM items WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+                data = {**json.loads(row[0]), **item} if row else item
+                title, body = item_text(kind, data)
+                created_at, updated_at = item_dates(kind, data)
+                self.db.execute(
+                    """INSERT INTO items (kind, key, url, repo, title, body, created_at, updated_at, fetched_at, data)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (kind, key) DO UPDATE SET
+                           url = excluded.url, repo = excluded.repo, title = excluded.title, body = excluded.body,
+                           created_at = excluded.created_at, updated_at = excluded.updated_at,
+                           fetched_at = excluded.fetched_at, data = excluded.data""",
+                    (kind, key, data.get("url"), repo_name(data) or data.get("fullName"), title, body,
+                     created_at, updated_at, fetched_at, json.dumps(data, ensure_ascii=False)),
+                )
+            self.db.execute(
+                "INSERT OR REPLACE INTO searches (key, kind, command, fetched_at, items) VALUES (?, ?, ?, ?, ?)",
+                (spec_key(spec), kind, display_command(spec), fetched_at, json.dumps(keys, ensure_ascii=False)),
+            )
+
+    def _items(self, kind: str, keys: list[str]) -> list[dict]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self.db.execute(f"SELECT key, data FROM items WHERE kind = ? AND key IN ({placeholders})",
+                               (kind, *keys)).fetchall()
+        found = {key: json.loads(data) for key, data in rows}
+        return [found[key] for key in keys if key in found]
+
+    def match(self, spec: dict) -> list[tuple[dict, float]]:
+        """
+        按关键词全文匹配同类型的条目，应用过滤和排序，返回 [(条目, 抓取时间)]
+
+        调用前应先用 local_filters 确认没有本地无法判断的条件（这里忽略它们）。
+        """
+        query = fts_query(spec["query"])
+        excluded = fts_phrases(spec["query"])[1]
+        sql = "SELECT items.data, items.fetched_at FROM items"
+        params = [spec["kind"]]
+        if query:
+            sql += " JOIN items_fts ON items_fts.rowid = items.rowid WHERE items_fts MATCH ? AND items.kind = ?"
+            params.insert(0, query)
+            sql += " ORDER BY bm25(items_fts)"
+        elif excluded:
+            # 只有排除词（如 -- -rust）：同类型中不匹配任何排除词的条目
+            sql += (" WHERE items.kind = ? AND items.rowid NOT IN"
+                    " (SELECT rowid FROM items_fts WHERE items_fts MATCH ?) ORDER BY items.updated_at DESC")
+            params.append(" OR ".join(excluded))
+        else:
+            sql += " WHERE items.kind = ? ORDER BY items.updated_at DESC"
+        with self._lock:
+            try:
+                rows = self.db.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                return []
+
+        flags, fields = spec["flags"], spec["fields"]
+        filters, _ = local_filters(spec)
+        hits = []
+        for data, fetched_at in rows:
+            item = json.loads(data)
+            if all(f in item for f in fields) and self._matches_filters(item, filters):
+                hits.append((item, fetched_at))
+
+        sort_field = SORT_FIELDS.get(flags.get("sort", ""))
+        if sort_field:
+            missing = "" if sort_field in DATE_SORT_FIELDS else 0
+            hits.sort(key=lambda hit: hit[0].get(sort_field) or missing, reverse=flags.get("order") != "asc")
+        return hits
+
+    @staticmethod
+    def _matches_filters(item: dict, filters: list[tuple[str, set]]) -> bool:
+        """本地可判断的过滤条件：language、owner、repo、state"""
+        repo = (repo_name(item) or item.get("fullName") or "").lower()
+        actual = {
+            "language": (item.get("language") or "").lower(),
+            "owner": repo.split("/")[0],
+            "repo": repo,
+            "state": (item.get("state") or "").lower(),
+        }
+        return all(actual[field] in accepted for field, accepted in filters)
+
+    def answer(self, spec: dict, max_age: float, offline: bool = False) -> Optional[list]:
+        """
+        从索引回答一个搜索：相同命令在 max_age 内搜索过时按原顺序还原结果；
+        否则全文匹配，未过期的条目达到 --limit 数量时返回。offline 时忽略时间，总是返回。
+        返回 None 表示需要调用 gh；包含本地无法判断的参数或限定符时只能按完全相同的命令还原。
+        """
+        now = time.time()
+        limit = int(spec["flags"].get("limit", DEFAULT_LIMIT))
+        with self._lock:
+            row = self.db.execute("SELECT fetched_at, items FROM searches WHERE key = ?",
+                                  (spec_key(spec),)).fetchone()
+            if row and (offline or now - row[0] <= max_age):
+                return self._items(spec["kind"], json.loads(row[1]))
+
+        if local_filters(spec)[1]:
+            return None
+        fresh = [item for item, fetched_at in self.match(spec) if offline or now - fetched_at <= max_age]
+        if offline or len(fresh) >= limit:
+            return fresh[:limit]
+        return None
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SearchExecutor:
+    """
+    并行执行 gh search，最多同时运行 concurrency 个 gh 进程
+
+    相同的规格在一次运行中只执行一次；cache 为 None 时不读写缓存，refresh 时只写不读。
+    index 不为 None 时 gh 返回的结果都写入索引；mode 为 "local" 时先查索引，"offline" 时只查索引。
+    """
+
+    def __init__(self, gh: str = None, concurrency: int = DEFAULT_CONCURRENCY, cache: SearchCache = None,
+                 refresh: bool = False, timeout: float = DEFAULT_TIMEOUT, index: SearchIndex = None,
+                 mode: str = "gh", index_ttl: float = DEFAULT_INDEX_TTL):
+        self.gh = shlex.split(gh or os.environ.get("GH_KB_GH") or "gh")
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.refresh = refresh
+        self.timeout = timeout
+        self.index = index
+        self.mode = mode
+        self.index_ttl = index_ttl
+
+    def run_one(self, spec: dict) -> dict:
+        """
+        执行一个规范化的规格
+
+        返回 {"spec", "command", "results", "source", "error", "seconds"}，source 为 index / cache / gh
+        """
+        start = time.perf_counter()
+        outcome = {"spec": spec, "command": display_command(spec), "results": [], "source": None, "error": None}
+
+        results, source = None, None
+        if self.index is not None and self.mode in ("local", "offline") and not self.refresh:
+            results, source = self.index.answer(spec, self.index_ttl, self.mode == "offline"), "index"
+        if results is None and self.cache is not None and not self.refresh:
+            results, source = self.cache.get(spec), "cache"
+
+        if results is not None:
+            outcome.update(results=results, source=source)
+        elif self.mode == "offline":
+            unsupported = local_filters(spec)[1]
+            outcome["error"] = (f"离线模式：本地索引无法判断 {' '.join(unsupported)}，需要联网搜索" if unsupported
+                                else "离线模式：本地索引中没有结果")
+        else:
+            try:
+                outcome.update(results=self._call(spec), source="gh")
+                if self.cache is not None:
+                    self.cache.put(spec, outcome["results"])
+                if self.index is not None:
+                    self.index.ingest(spec, outcome["results"])
+            except RuntimeError as e:
+                outcome["error"] = str(e)
+
+        outcome["seconds"] = time.perf_counter() - start
+        return outcome
+
+    def _call(self, spec: dict) -> list:
+        try:
+            proc = subprocess.run([*self.gh, *build_args(spec)], capture_output=True, text=True,
+                                  encoding="utf-8", timeout=self.timeout)
+        except FileNotFoundError:
+            raise RuntimeError(f"未找到 gh ({self.gh[0]})，安装地址: https://github.com/cli/cli#installation")
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"gh 超时 ({self.timeout:g}s)")
+
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"gh 退出码 {proc.returncode}")
+        try:
+            results = json.loads(proc.stdout or "[]")
+        except ValueError as e:
+            raise RuntimeError(f"gh 输出不是 JSON: {e}")
+        if not isinstance(results, list):
+            raise RuntimeError("gh 输出不是结果列表")
+        return results
+
+    def run(self, specs: list) -> list[dict]:
+        """执行多个规格（命令字符串或 dict），按输入顺序返回每个不同规格的结果"""
+        unique = {}
+        for spec in specs:
+            spec = normalize_spec(spec)
+            unique.setdefault(spec_key(spec), spec)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(unique) or 1)) as pool:
+            return list(pool.map(self.run_one, unique.values()))
+
+
+def repo_name(item: dict) -> str:
+    repo = item.get("repository") or {}
+    if isinstance(repo, str):
+        return repo
+    return repo.get("nameWithOwner") or repo.get("fullName") or repo.get("name") or ""
+
+
+def item_key(kind: str, item: dict) -> str:
+    """去重键：优先使用 url，否则使用各类型的唯一字段"""
+    if item.get("url"):
+        return item["url"]
+    if kind == "repos":
+        return item.get("fullName", "")
+    if kind == "commits":
+        return f"{repo_name(item)}@{item.get('sha', '')}"
+    if kind == "code":
+        return f"{repo_name(item)}:{item.get('path', '')}"
+    return f"{repo_name(item)}#{item.get('number', item.get('title', ''))}"
+
+
+def merge_results(outcomes: list[dict]) -> dict:
+    """
+    按类型合并各命令的结果并去重（保留首次出现的顺序）
+
+    返回 {"results": {类型: [条目...]}, "commands": [命令...], "errors": [{"command", "error"}]}
+    """
+    merged = {kind: [] for kind in KINDS}
+    seen = set()
+    for outcome in outcomes:
+        kind = outcome["spec"]["kind"]
+        for item in outcome["results"]:
+            key = (kind, item_key(kind, item))
+            if key not in seen:
+                seen.add(key)
+                merged[kind].append(item)
+
+    return {
+        "results": {kind: items for kind, items in merged.items() if items},
+        "commands": [o["command"] + ("（本地索引）" if o["source"] == "index" else "") for o in outcomes],
+        "errors": [{"command": o["command"], "error": o["error"]} for o in outcomes if o["error"]],
+    }
+
+
+def short_number(value) -> str:
+    """12345 -> 12.3k"""
+    if not isinstance(value, (int, float)):
+        return str(value if value is not None else "-")
+    if value >= 1_000_000:
+        return f"{value / 1_000_000:.1f}m"
+    if value >= 1000:
+        return f"{value / 1000:.1f}k"
+    return str(value)
+
+
+def short_date(value) -> str:
+    return str(value)[:10] if value else "-"
+
+
+def excerpt(text, limit: int = 100) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def login(author) -> str:
+    if isinstance(author, dict):
+        return author.get("login") or author.get("name") or "-"
+    return str(author or "-")
+
+
+def format_item(kind: str, item: dict) -> str:
+    """按 SKILL.md Step 4 的格式输出一个条目"""
+    if kind == "repos":
+        lines = [
+            f"### [{item.get('fullName', '')}]({item.get('url', '')})",
+            f"⭐ {short_number(item.get('stargazersCount'))} | 🔀 {short_number(item.get('forksCount'))} | "
+            f"📝 {item.get('language') or '-'} | 🕐 {short_date(item.get('updatedAt'))}",
+        ]
+        if item.get("description"):
+            lines.append(f"> {excerpt(item['description'], 200)}")
+    elif kind in ("issues", "prs"):
+        lines = [
+            f"### [{item.get('title', '')}]({item.get('url', '')})",
+            f"📦 {repo_name(item)} | 👤 {login(item.get('author'))} | 💬 {item.get('commentsCount', 0)} | "
+            f"🕐 {short_date(item.get('createdAt'))}",
+        ]
+        if item.get("body"):
+            lines.append(f"> {excerpt(item['body'])}")
+    elif kind == "code":
+        lines = [f"### [{item.get('path', '')}]({item.get('url', '')})", f"📦 {repo_name(item)}"]
+        fragments = [m.get("fragment", "") for m in item.get("textMatches") or [] if isinstance(m, dict)]
+        if fragments:
+            lines.append(f"> {excerpt(fragments[0], 160)}")
+    else:
+        commit = item.get("commit") or {}
+        message = (commit.get("message") or "").splitlines() or [item.get("sha", "")[:7]]
+        author = item.get("author") or commit.get("author")
+        lines = [
+            f"### [{message[0]}]({item.get('url', '')})",
+            f"📦 {repo_name(item)} | 👤 {login(author)} | 🕐 {short_date((commit.get('author') or {}).get('date'))}",
+        ]
+    return "\n".join(lines)
+
+
+def format_markdown(merged: dict) -> str:
+    """合并结果输出为 Markdown；多种类型时按类型分节，尾部附搜索条件"""
+    results = merged["results"]
+    parts = []
+    for kind, items in results.items():
+        if len(results) > 1:
+            parts.append(f"## {KIND_TITLES[kind]} ({len(items)})")
+        parts.extend(format_item(kind, item) for item in items)
+    if not results:
+        parts.append("未找到结果")
+
+    for error in merged["errors"]:
+        parts.append(f"⚠ 搜索失败: {error['command']}\n> {error['error']}")
+
+    footer = ["---"] + [f"🔍 搜索条件：{command}" for command in merged["commands"]]
+    return "\n\n".join(parts) + "\n\n" + "\n".join(footer)
+
+
+def search(specs: list, gh: str = None, concurrency: int = DEFAULT_CONCURRENCY, use_cache: bool = True,
+           ttl: float = DEFAULT_CACHE_TTL, refresh: bool = False, mode: str = "gh",
+           index_ttl: float = DEFAULT_INDEX_TTL) -> dict:
+    """
+    执行搜索规格并返回合并后的结果（结构见 merge_results()）
+
+    mode: gh（默认，结果写入索引）/ local（先查索引）/ offline（只查索引）
+    """
+    cache = SearchCache(ttl=ttl) if use_cache else None
+    index = SearchIndex() if use_cache or mode != "gh" else None
+    executor = SearchExecutor(gh, concurrency, cache, refresh, index=index, mode=mode, index_ttl=index_ttl)
+    try:
+        return merge_results(executor.run(specs))
+    finally:
+        if index is not None:
+            index.close()
+
+
+def read_specs(source: str) -> list:
+    """读取规格文件：JSON 数组，或每行一个命令（忽略空行和 # 注释）"""
+    text = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    try:
+        specs = json.loads(text)
+    except ValueError:
+        return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    return specs if isinstance(specs, list) else [specs]
+
+
+def main():
+    """命令行入口"""
+    specs = []
+    options = {"gh": None, "concurrency": DEFAULT_CONCURRENCY, "use_cache": True, "ttl": DEFAULT_CACHE_TTL,
+               "refresh": False, "mode": "gh", "index_ttl": DEFAULT_INDEX_TTL}
+    output_format = "markdown"
+
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg in ("-h", "--help"):
+            print(__doc__)
+            sys.exit(0)
+        elif arg == "--specs":
+            specs += read_specs(next(args))
+        elif arg == "--concurrency":
+            options["concurrency"] = int(next(args))
+        elif arg == "--ttl":
+            options["ttl"] = float(next(args))
+        elif arg == "--no-cache":
+            options["use_cache"] = False
+        elif arg == "--refresh":
+            options["refresh"] = True
+        elif arg == "--format":
+            output_format = next(args)
+        elif arg == "--gh":
+            options["gh"] = next(args)
+        elif arg == "--local":
+            options["mode"] = "local"
+        elif arg == "--offline":
+            options["mode"] = "offline"
+        elif arg == "--index-ttl":
+            options["index_ttl"] = float(next(args))
+        else:
+            specs.append(arg)
+
+    if not specs:
+        print(__doc__)
+        sys.exit(1)
+    if output_format not in ("markdown", "json"):
+        print(f"错误: 不支持的输出格式: {output_format}")
+        sys.exit(1)
+
+    try:
+        merged = search(specs, **options)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    if output_format == "json":
+        print(json.dumps(merged, ensure_ascii=False, indent=2))
+    else:
+        print(format_markdown(merged))
+    sys.exit(1 if merged["errors"] and not merged["results"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Anki 卡片增量导出工具 - 把 anki-cards/YYYY-MM-DD/cards.md 导出为 Anki 可直接导入的 TSV/CSV
+
+解析 Obsidian_to_Anki 卡片语法（格式见 references/anki-integration.md），用清单文件记录每个
+卡片文件的大小、修改时间和内容哈希：未变化的文件不再读取和解析，只导出新增或修改过的卡片。
+项目积累几百次学习会话后，每次导出的工作量仍然只取决于新增的会话。
+
+用法:
+    python anki_export.py <项目目录或anki-cards目录> [--output 文件] [--format tsv|csv] [--deck 名称] [--full] [--include-synced]
+
+参数:
+    --output: 导出文件路径 (可选，默认 anki-cards/exports/anki-import-<时间>.<格式>)
+    --format: tsv 或 csv (可选，默认 tsv；指定 --output 时按扩展名推断)
+    --deck: 文件中没有 TARGET DECK 时使用的卡片组 (可选，默认为项目目录名)
+    --full: 忽略清单，重新解析并导出全部卡片
+    --include-synced: 同时导出带 <!--ID: ...--> 的卡片（默认跳过，它们已由 Obsidian_to_Anki 同步）
+
+导出文件带 Anki 文件头（#guid column 等，需要 Anki 2.1.55+）：每张卡片的 GUID 由笔记类型和第一个字段生成，
+修改答案后重新导出的卡片会更新 Anki 中已有的笔记，而不是新建重复的笔记。
+清单保存在 anki-cards/.export-manifest.json，删除它等同于 --full。
+"""
+
+import csv
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+
+MANIFEST = ".export-manifest.json"
+# 2: 不标注类型的卡片只按 {{c1::...}} 判断填空题，旧清单中的解析结果需要重新生成
+MANIFEST_VERSION = 2
+
+# 卡片中的字段前缀 -> 字段位置（Basic/问答题 为正面、背面，Cloze/填空题 为文字、背面额外）
+FIELD_PREFIXES = {
+    "Front": 0, "Text": 0, "正面": 0, "文字": 0,
+    "Back": 1, "Extra": 1, "Back Extra": 1, "背面": 1, "背面额外": 1,
+}
+
+# 问答题的字段前缀：不标注类型的卡片用了它们时总是问答题
+BASIC_PREFIXES = {"Front", "Back", "正面", "背面"}
+
+FIELD_RE = re.compile(r"^(Back Extra|背面额外|Front|Back|Text|Extra|正面|背面|文字)\s*[:：]\s?(.*)$")
+TAGS_RE = re.compile(r"^Tags\s*[:：]\s*(.*)$")
+ID_RE = re.compile(r"^<!--\s*ID:\s*(\d+)\s*-->$")
+DECK_RE = re.compile(r"^TARGET DECK\s*(?:[:：]\s*(.*))?$")
+FILE_TAGS_RE = re.compile(r"^FILE TAGS\s*(?:[:：]\s*(.*))?$")
+INLINE_RE = re.compile(r"STARTI\s*(?:\[([^\]]+)\])?\s*(.*?)\s*ENDI")
+INLINE_FIELD_RE = re.compile(r"(Back Extra|背面额外|Front|Back|Text|Extra|正面|背面|文字)\s*[:：]\s?")
+ANKI_CLOZE_RE = re.compile(r"\{\{c\d+::")
+CURLY_CLOZE_RE = re.compile(r"(?<!\{)\{(?:(\d+):)?([^{}]+)\}(?!\})")
+
+
+def strip_frontmatter(lines: list[str]) -> list[str]:
+    """去掉文件开头的 YAML frontmatter"""
+    if lines and lines[0].strip() == "---":
+        for i in range(1, len(lines)):
+            if lines[i].strip() == "---":
+                return lines[i + 1:]
+    return lines
+
+
+def curly_to_cloze(text: str) -> str:
+    """把 CurlyCloze 简化语法 {答案} / {2:答案} 转为 {{c1::答案}}"""
+    if ANKI_CLOZE_RE.search(text):
+        return text
+    counter = iter(range(1, 1000))
+
+    def replace(match):
+        number = match.group(1) or next(counter)
+        return f"{{{{c{number}::{match.group(2)}}}}}"
+
+    return CURLY_CLOZE_RE.sub(replace, text)
+
+
+def markdown_to_html(text: str) -> str:
+    """转换卡片字段中常用的 markdown：代码块、行内代码、粗体和换行"""
+    parts, code = [], None
+    for line in text.split("\n"):
+        if line.strip().startswith("```"):
+            if code is None:
+                code = []
+            else:
+                parts.append("<pre><code>" + "\n".join(html.escape(c) for c in code) + "</code></pre>")
+                code = None
+            continue
+        if code is not None:
+            code.append(line)
+            continue
+        line = html.escape(line, quote=False)
+        line = re.sub(r"`([^`]+)`", r"<code>\1</code>", line)
+        line = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", line)
+        parts.append(line)
+    if code is not None:
+        parts.extend(html.escape(c) for c in code)
+    return "<br>".join(parts)
+
+
+def make_note(note_type: str, fields: list[str], tags: list[str], deck: str, note_id: str = None,
+              prefixes: set = frozenset()) -> dict:
+    """
+    整理一张卡片：补全笔记类型、转换填空语法和 markdown
+
+    prefixes 为卡片中出现的字段前缀。不标注类型时，中文版填空题直接用 {{c1::答案}} 写内容；
+    其余（包括带 Front/Back 字段、或正文中只有普通花括号的卡片）为问答题，英文字段前缀时为 Basic。
+    """
+    fields = [f.strip() for f in fields]
+    if not note_type:
+        if ANKI_CLOZE_RE.search(fields[0]) and not prefixes & BASIC_PREFIXES:
+            note_type = "填空题"
+        else:
+            note_type = "Basic" if prefixes & {"Front", "Back"} else "问答题"
+    if note_type in ("Cloze", "填空题"):
+        fields[0] = curly_to_cloze(fields[0])
+    return {
+        "type": note_type,
+        "deck": deck,
+        "fields": [markdown_to_html(f) for f in fields],
+        "tags": list(dict.fromkeys(tags)),
+        "id": note_id,
+    }
+
+
+def parse_block(lines: list[str], deck: str, file_tags: list[str]) -> dict:
+    """解析 START 和 END 之间的一张卡片"""
+    while lines and not lines[0].strip():
+        lines = lines[1:]
+    note_type = None
+    rest = [l for l in lines[1:] if l.strip()]
+    if lines and not FIELD_RE.match(lines[0]) and rest and FIELD_RE.match(rest[0]):
+        note_type, lines = lines[0].strip(), lines[1:]
+
+    fields, tags, note_id, current, prefixes = ["", ""], [], None, 0, set()
+    for line in lines:
+        stripped = line.strip()
+        if TAGS_RE.match(stripped):
+            tags = TAGS_RE.match(stripped).group(1).split()
+            continue
+        if ID_RE.match(stripped):
+            note_id = ID_RE.match(stripped).group(1)
+            continue
+        match = FIELD_RE.match(line)
+        if match:
+            current = FIELD_PREFIXES[match.group(1)]
+            fields[current] = match.group(2)
+            prefixes.add(match.group(1))
+        else:
+            fields[current] = f"{fields[current]}\n{line}" if fields[current] else line
+    return make_note(note_type, fields, file_tags + tags, deck, note_id, prefixes)
+
+
+def parse_inline(note_type: str, body: str, deck: str, file_tags: list[str]) -> dict:
+    """解析单行卡片 STARTI [类型] Front: ... Back: ... ENDI"""
+    fields, note_id = ["", ""], None
+    match = re.search(r"<!--\s*ID:\s*(\d+)\s*-->", body)
+    if match:
+        note_id, body = match.group(1), body.replace(match.group(0), "")
+    pieces = INLINE_FIELD_RE.split(body)
+    if pieces[0].strip():
+        fields[0] = pieces[0]
+    for name, value in zip(pieces[1::2], pieces[2::2]):
+        fields[FIELD_PREFIXES[name]] = value
+    return make_note(note_type, fields, file_tags, deck, note_id, set(pieces[1::2]))
+
+
+def parse_cards(text: str, default_deck: str) -> list[dict]:
+    """解析一个卡片文件中的所有卡片"""
+    lines = strip_frontmatter(text.splitlines())
+    deck, file_tags, notes = default_deck, [], []
+    block = None
+    i = 0
+    while i < len(lines):
+        line, stripped = lines[i], lines[i].strip()
+        i += 1
+        if block is not None:
+            if stripped == "END":
+                notes.append(parse_block(block, deck, file_tags))
+                block = None
+            else:
+                block.append(line)
+            continue
+        if stripped == "START":
+            block = []
+            continue
+        for match in INLINE_RE.finditer(line):
+            notes.append(parse_inline(match.group(1), match.group(2), deck, file_tags))
+        # TARGET DECK / FILE TAGS 可以写在同一行，也可以写在下一行
+        for pattern in (DECK_RE, FILE_TAGS_RE):
+            match = pattern.match(stripped)
+            if not match:
+                continue
+            value = match.group(1)
+            if value is None and i < len(lines):
+                value, i = lines[i].strip(), i + 1
+            if pattern is DECK_RE:
+                deck = value.strip() or default_deck
+            else:
+                file_tags = (value or "").split()
+    return notes
+
+
+def note_guid(note: dict) -> str:
+    """由笔记类型和第一个字段生成 GUID（与 Anki 判断重复笔记的依据一致）"""
+    return hashlib.sha1(f"{note['type']}\x1f{note['fields'][0]}".encode("utf-8")).hexdigest()[:16]
+
+
+def note_hash(note: dict) -> str:
+    """卡片完整内容的哈希，用于判断已导出的卡片是否被修改"""
+    content = json.dumps([note["type"], note["deck"], note["fields"], sorted(note["tags"])], ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def find_card_files(cards_dir: Path) -> list[Path]:
+    """按日期顺序返回 anki-cards/YYYY-MM-DD/cards.md"""
+    return sorted(p for p in cards_dir.glob("*/cards.md") if p.is_file())
+
+
+def load_manifest(cards_dir: Path) -> dict:
+    path = cards_dir / MANIFEST
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        manifest = {}
+    manifest.setdefault("version", MANIFEST_VERSION)
+    manifest.setdefault("files", {})
+    manifest.setdefault("notes", {})
+    return manifest
+
+
+def save_manifest(cards_dir: Path, manifest: dict) -> None:
+    path = cards_dir / MANIFEST
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def collect_changes(cards_dir: Path, manifest: dict, default_deck: str,
+                    include_synced: bool = False) -> tuple[list[dict], dict]:
+    """
+    扫描卡片文件，只解析新增或修改过的文件，返回 (需要导出的卡片, 统计)
+
+    大小和修改时间都没变的文件直接跳过；变了但内容哈希相同的文件只更新记录。
+    """
+    files, notes = manifest["files"], manifest["notes"]
+    stats = {"files": 0, "parsed": 0, "new": 0, "updated": 0, "unchanged": 0, "synced": 0}
+    delta = {}
+    seen = set()
+
+    for path in find_card_files(cards_dir):
+        rel = path.relative_to(cards_dir).as_posix()
+        seen.add(rel)
+        stats["files"] += 1
+        st = path.stat()
+        entry = files.get(rel)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            continue
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        if entry and entry["sha256"] == digest:
+            entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+            continue
+
+        stats["parsed"] += 1
+        # 重复的卡片（第一个字段相同）以最后出现的版本为准
+        parsed = {}
+        for note in parse_cards(data.decode("utf-8"), default_deck):
+            if note["id"] and not include_synced:
+                stats["synced"] += 1
+                continue
+            guid = note_guid(note)
+            parsed.pop(guid, None)
+            parsed[guid] = note
+        for guid, note in parsed.items():
+            content = note_hash(note)
+            delta.pop(guid, None)
+            if notes.get(guid) == content:
+                stats["unchanged"] += 1
+            else:
+                delta[guid] = dict(note, guid=guid, hash=content)
+        files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest, "notes": list(parsed)}
+
+    for rel in set(files) - seen:
+        del files[rel]
+    stats["updated"] = sum(guid in notes for guid in delta)
+    stats["new"] = len(delta) - stats["updated"]
+    return list(delta.values()), stats
+
+
+def write_export(notes: list[dict], output: Path, fmt: str) -> None:
+    """写入带 Anki 文件头的 TSV/CSV：guid, 笔记类型, 卡片组, 字段1, 字段2, 标签"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    delimiter = "\t" if fmt == "tsv" else ","
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        f.write(f"#separator:{'Tab' if fmt == 'tsv' else 'Comma'}\n")
+        f.write("#html:true\n#guid column:1\n#notetype column:2\n#deck column:3\n#tags column:6\n")
+        writer = csv.writer(f, delimiter=delimiter, lineterminator="\n")
+        for note in notes:
+            writer.writerow([note["guid"], note["type"], note["deck"], *note["fields"], " ".join(note["tags"])])
+
+
+def resolve_cards_dir(path: Path) -> Path:
+    """接受项目目录或 anki-cards 目录"""
+    if (path / "anki-cards").is_dir():
+        return path / "anki-cards"
+    return path
+
+
+def export(path: Path, output: Path = None, fmt: str = None, deck: str = None,
+           full: bool = False, include_synced: bool = False) -> Path:
+    """导出新增或修改的卡片，返回导出文件路径（没有变化时返回 None）"""
+    cards_dir = resolve_cards_dir(path)
+    if not cards_dir.is_dir():
+        print(f"❌ 卡片目录不存在: {cards_dir}")
+        sys.exit(1)
+
+    project = cards_dir.resolve().parent if cards_dir.name == "anki-cards" else cards_dir.resolve()
+    default_deck = deck or project.name
+    fmt = fmt or (output.suffix.lstrip(".").lower() if output and output.suffix.lower() in (".csv", ".tsv") else "tsv")
+    if fmt not in ("tsv", "csv"):
+        print(f"❌ 不支持的格式: {fmt}（可选 tsv、csv）")
+        sys.exit(1)
+
+    manifest = {"version": MANIFEST_VERSION, "files": {}, "notes": {}} if full else load_manifest(cards_dir)
+    notes, stats = collect_changes(cards_dir, manifest, default_deck, include_synced)
+
+    print(f"📂 卡片文件: {stats['files']} 个，解析了 {stats['parsed']} 个新增或修改的文件")
+    if stats["synced"]:
+        print(f"⏭️  跳过 {stats['synced']} 张已通过 Obsidian_to_Anki 同步的卡片（--include-synced 可导出）")
+
+    result = None
+    if notes:
+        if output is None:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            output = cards_dir / "exports" / f"anki-import-{stamp}.{fmt}"
+        write_export(notes, output, fmt)
+        for note in notes:
+            manifest["notes"][note["guid"]] = note["hash"]
+        print(f"✅ 导出 {len(notes)} 张卡片（新增 {stats['new']}，修改 {stats['updated']}）: {output}")
+        print("   在 Anki 中：文件 → 导入，选择该文件（已有的笔记按 GUID 更新）")
+        result = output
+    else:
+        print("✅ 没有新增或修改的卡片")
+
+    # 导出文件写入成功后才更新清单，失败时下次会重新导出
+    save_manifest(cards_dir, manifest)
+    return result
+
+
+def main():
+    """命令行入口"""
+    args, options = [], {"output": None, "fmt": None, "deck": None, "full": False, "include_synced": False}
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg in ("-h", "--help"):
+            print(__doc__)
+            sys.exit(0)
+        elif arg == "--output":
+            options["output"] = Path(next(argv))
+        elif arg == "--format":
+            options["fmt"] = next(argv).lower()
+        elif arg == "--deck":
+            options["deck"] = next(argv)
+        elif arg == "--full":
+            options["full"] = True
+        elif arg == "--include-synced":
+            options["include_synced"] = True
+        else:
+            args.append(arg)
+
+    if len(args) != 1:
+        print(__doc__)
+        sys.exit(1)
+    export(Path(args[0]), **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+学习材料获取工具 - 目录页索引、章节缓存和后台预取
+
+基于 firecrawl-downloader 的下载器，管理学习项目 materials/ 目录中的
+links-map.json、main.md 和各章节文件（格式见 references/content-fetching.md）。
+打开某一章时，在后台以有限并发预取之后 N 个尚未获取的章节，下一次学习会话不再等待网络。
+
+用法:
+    python materials.py init <目录页URL> <materials目录> [--pattern 正则] [--prefetch N]
+    python materials.py get <materials目录> <章节> [--prefetch N] [--no-prefetch]
+    python materials.py prefetch <materials目录> [--count N] [--after 文件名] [--concurrency C]
+    python materials.py status <materials目录>
+
+参数:
+    init: 抓取目录页保存为 main.md，提取章节链接写入 links-map.json（不抓取章节）
+    get: 返回章节文件路径；未获取时立即抓取。章节可以是序号（从 1 开始）、文件名、URL 或标题中的文字
+    prefetch: 抓取当前章节之后 N 个未获取的章节（get 会在后台进程中自动运行）
+    status: 显示各章节的获取状态
+    --pattern: 只把 URL 匹配该正则的链接作为章节 (可选，默认同一站点、位于目录页路径下的链接)
+    --prefetch / --count: 预取的章节数 (可选，默认 2)
+    --after: 从该章节之后开始预取 (可选，默认为最近打开的章节)
+    --concurrency: 预取的最大并发数 (可选，默认 2)
+    --no-prefetch: get 时不启动后台预取
+
+抓取内容同时写入 firecrawl-downloader 的本地抓取缓存 (~/.cache/firecrawl-downloader)，多个学习项目共享。
+firecrawl-downloader 默认位于本 skill 的同级目录，可用 FIRECRAWL_DOWNLOADER_PATH 指定其 scripts 目录。
+"""
+
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+
+DEFAULT_PREFETCH = 2
+DEFAULT_CONCURRENCY = 2
+
+# 正在获取的章节超过该秒数仍未完成，视为获取进程已退出
+FETCH_STALE_SECONDS = 300
+
+# get 等待其他进程正在获取的章节的最长秒数
+FETCH_WAIT_SECONDS = 120
+
+LINKS_MAP = "links-map.json"
+LOCK_FILE = ".links-map.lock"
+PREFETCH_LOG = ".prefetch.log"
+
+MARKDOWN_LINK_RE = re.compile(r"(?<!!)\[([^\]]+)\]\((\S+?)(?:\s+\"[^\"]*\")?\)")
+
+
+def load_downloader_module():
+    """导入 firecrawl-downloader 的 download 模块（只在需要联网时导入）"""
+    path = os.environ.get("FIRECRAWL_DOWNLOADER_PATH") or \
+        Path(__file__).resolve().parents[2] / "firecrawl-downloader" / "scripts"
+    sys.path.insert(0, str(path))
+    import download
+    return download
+
+
+def make_downloader(concurrency: int = DEFAULT_CONCURRENCY):
+    """使用共享抓取缓存、并发数受限的下载器"""
+    download = load_downloader_module()
+    limiter = download.RateLimiter(max_concurrency=concurrency)
+    return download.Downloader(limiter=limiter, cache=download.ScrapeCache())
+
+
+@contextlib.contextmanager
+def map_lock(materials: Path, timeout: float = 30):
+    """links-map.json 的跨进程锁（前台 get 和后台预取可能同时更新）"""
+    lock = materials / LOCK_FILE
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            # 持有锁的进程异常退出时锁文件会残留
+            with contextlib.suppress(OSError):
+                if time.time() - lock.stat().st_mtime > timeout:
+                    lock.unlink()
+                    continue
+            if time.time() > deadline:
+                raise TimeoutError(f"等待锁超时: {lock}")
+            time.sleep(0.05)
+    try:
+        os.close(fd)
+        yield
+    finally:
+        with contextlib.suppress(OSError):
+            lock.unlink()
+
+
+def read_map(materials: Path) -> dict:
+    return json.loads((materials / LINKS_MAP).read_text(encoding="utf-8"))
+
+
+def write_map(materials: Path, links_map: dict) -> None:
+    path = materials / LINKS_MAP
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(links_map, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def all_pages(links_map: dict) -> list[dict]:
+    """按目录顺序返回所有章节（不含目录页本身）"""
+    pages = [p for p in links_map.get("fetched_pages", []) + links_map.get("pending_pages", [])
+             if p.get("filename") != "main.md"]
+    return sorted(pages, key=lambda p: p.get("index", 0))
+
+
+def update_page(materials: Path, url: str, drop: tuple = (), **fields) -> dict:
+    """在锁内更新一个章节的字段（删除 drop 中的字段），并按状态放入 fetched_pages 或 pending_pages"""
+    with map_lock(materials):
+        links_map = read_map(materials)
+        fetched, pending = links_map.setdefault("fetched_pages", []), links_map.setdefault("pending_pages", [])
+        page = next(p for p in fetched + pending if p["url"] == url)
+        page.update(fields)
+        for name in drop:
+            page.pop(name, None)
+        if page in fetched:
+            fetched.remove(page)
+        else:
+            pending.remove(page)
+        (fetched if page["status"] == "fetched" else pending).append(page)
+        pending.sort(key=lambda p: p.get("index", 0))
+        write_map(materials, links_map)
+        return page
+
+
+def extract_chapters(markdown: str, toc_url: str, pattern: str = None) -> list[tuple[str, str]]:
+    """
+    从目录页 markdown 中按出现顺序提取章节链接，返回 [(标题, URL)]
+
+    默认只保留与目录页同一站点、且位于目录页所在路径下的链接；pattern 指定时改为按正则匹配 URL。
+    """
+    toc = urlsplit(toc_url)
+    prefix = toc.path.rsplit("/", 1)[0] + "/"
+    chapters, seen = [], {urldefrag(toc_url)[0].rstrip("/")}
+    for title, href in MARKDOWN_LINK_RE.findall(markdown):
+        url = urldefrag(urljoin(toc_url, href))[0]
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or url.rstrip("/") in seen:
+            continue
+        if pattern:
+            if not re.search(pattern, url):
+                continue
+        elif parts.netloc != toc.netloc or not parts.path.startswith(prefix):
+            continue
+        seen.add(url.rstrip("/"))
+        chapters.append((" ".join(title.split()), url))
+    return chapters
+
+
+def render_page(title: str, url: str, markdown: str, fetch_date: str) -> str:
+    """章节文件：frontmatter + 内容 + 来源"""
+    body = markdown.strip()
+    if not body.startswith("#"):
+        body = f"# {title}\n\n{body}"
+    return (f"---\nsource_url: {url}\nfetch_date: {fetch_date}\ntitle: {title}\nstatus: fetched\n---\n\n"
+            f"{body}\n\n---\n\n**来源**：[原始页面]({url})\n**抓取时间**：{fetch_date}\n")
+
+
+def mark_readme(materials: Path, filename: str) -> None:
+    """把 README.md 中该章节的 ⏳ 标记改为 ✅，状态改为已获取（README 不存在或格式不同时忽略）"""
+    readme = materials / "README.md"
+    if not readme.exists():
+        return
+    lines = readme.read_text(encoding="utf-8").splitlines(keepends=True)
+    changed = False
+    for i, line in enumerate(lines):
+        if f"`{filename}`" in line and "⏳" in line:
+            lines[i] = line.replace("⏳", "✅")
+            changed = True
+            for j in range(i + 1, min(i + 4, len(lines))):
+                if "状态：" in lines[j]:
+                    lines[j] = re.sub(r"状态：.*", "状态：已获取", lines[j])
+                    break
+    if changed:
+        readme.write_text("".join(lines), encoding="utf-8")
+
+
+def record_failure(materials: Path, page: dict, error: str) -> None:
+    """追加到 failed-links.md（格式见 references/content-fetching.md）"""
+    path = materials / "failed-links.md"
+    header = "" if path.exists() else "# 无法获取的链接\n\n## 失败列表\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(f"{header}\n### {page['title']}\n- **URL**：{page['url']}\n- **失败原因**：{error}\n"
+                f"- **尝试时间**：{date.today().isoformat()}\n"
+                f"- **建议**：稍后重试，或手动访问该页面复制内容保存为 `{page['filename']}`\n")
+
+
+def claim(materials: Path, pages: list[dict]) -> list[dict]:
+    """把未获取、且没有其他进程正在获取的章节标记为 fetching，返回成功标记的章节"""
+    claimed = []
+    with map_lock(materials):
+        links_map = read_map(materials)
+        by_url = {p["url"]: p for p in links_map.get("pending_pages", [])}
+        for page in pages:
+            current = by_url.get(page["url"])
+            if current is None:
+                continue
+            busy = current.get("status") == "fetching" and \
+                time.time() - current.get("fetch_started", 0) < FETCH_STALE_SECONDS
+            if not busy:
+                current.update(status="fetching", fetch_started=time.time())
+                claimed.append(dict(current))
+        write_map(materials, links_map)
+    return claimed
+
+
+def release(materials: Path, pages: list[dict]) -> None:
+    """把本进程标记后仍处于 fetching 的章节恢复为 pending（抓取中途出错或被中断时调用）"""
+    started = {p["url"]: p.get("fetch_started") for p in pages}
+    with map_lock(materials):
+        links_map = read_map(materials)
+        changed = False
+        for page in links_map.get("pending_pages", []):
+            if page.get("status") == "fetching" and page["url"] in started and \
+                    page.get("fetch_started") == started[page["url"]]:
+                page["status"] = "pending"
+                page.pop("fetch_started", None)
+                changed = True
+        if changed:
+            write_map(materials, links_map)
+
+
+def fetch_page(materials: Path, page: dict, downloader) -> bool:
+    """抓取一个已标记的章节并保存，更新索引；失败时记录到 failed-links.md"""
+    try:
+        content = downloader.scrape(page["url"], ["markdown"])
+        if not content.get("markdown"):
+            raise ValueError("页面没有 markdown 内容")
+    except Exception as e:
+        update_page(materials, page["url"], status="failed", error=str(e), drop=("fetch_started",))
+        record_failure(materials, page, str(e))
+        print(f"获取失败: {page['filename']}: {e}")
+        return False
+
+    fetch_date = date.today().isoformat()
+    downloader.writer.write_text(materials / page["filename"],
+                                 render_page(page["title"], page["url"], content["markdown"], fetch_date))
+    update_page(materials, page["url"], status="fetched", fetch_date=fetch_date,
+                drop=("fetch_started", "error"))
+    mark_readme(materials, page["filename"])
+    print(f"已获取: {page['filename']}")
+    return True
+
+
+def init(toc_url: str, materials: Path, pattern: str = None, prefetch_count: int = DEFAULT_PREFETCH) -> dict:
+    """抓取目录页，保存 main.md 并创建 links-map.json；prefetch_count > 0 时在后台预取前几章"""
+    materials.mkdir(parents=True, exist_ok=True)
+    downloader = make_downloader()
+    content = downloader.scrape(toc_url, ["markdown"])
+    title = (content.get("metadata") or {}).get("title") or "课程主页"
+    fetch_date = date.today().isoformat()
+    downloader.writer.write_text(materials / "main.md",
+                                 render_page(title, toc_url, content["markdown"] or "", fetch_date))
+
+    chapters = extract_chapters(content["markdown"] or "", toc_url, pattern)
+    width = max(2, len(str(len(chapters))))
+    parts = urlsplit(toc_url)
+    links_map = {
+        "base_url": f"{parts.scheme}://{parts.netloc}",
+        "fetched_pages": [{"title": title, "url": toc_url, "filename": "main.md", "status": "fetched",
+                           "fetch_date": fetch_date, "index": 0}],
+        "pending_pages": [{"title": chapter_title, "url": url, "filename": f"chapter-{i:0{width}d}.md",
+                           "status": "pending", "index": i}
+                          for i, (chapter_title, url) in enumerate(chapters, start=1)],
+    }
+    with map_lock(materials):
+        write_map(materials, links_map)
+    print(f"已保存目录页: {materials / 'main.md'}")
+    print(f"章节: {len(chapters)} 个，已写入 {materials / LINKS_MAP}")
+
+    if chapters and prefetch_count > 0:
+        start_background_prefetch(materials, prefetch_count)
+    return links_map
+
+
+def find_page(links_map: dict, chapter: str) -> Optional[dict]:
+    """按序号、文件名、URL 或标题文字查找章节"""
+    pages = all_pages(links_map)
+    if chapter.isdigit():
+        return next((p for p in pages if p.get("index") == int(chapter)), None)
+    for key in ("filename", "url"):
+        page = next((p for p in pages if p.get(key) == chapter), None)
+        if page:
+            return page
+    return next((p for p in pages if chapter.lower() in p.get("title", "").lower()), None)
+
+
+def get(materials: Path, chapter: str, prefetch_count: int = DEFAULT_PREFETCH) -> Optional[Path]:
+    """
+    返回章节文件路径：已获取时直接返回；其他进程正在获取时等待；否则立即抓取
+
+    记录为最近打开的章节，并在后台预取之后 prefetch_count 个未获取的章节。
+    """
+    with map_lock(materials):
+        links_map = read_map(materials)
+        page = find_page(links_map, chapter)
+        if page is None:
+            print(f"错误: 未找到章节: {chapter}")
+            return None
+        links_map["last_opened"] = page["filename"]
+        write_map(materials, links_map)
+
+    path = materials / page["filename"]
+    deadline = time.time() + FETCH_WAIT_SECONDS
+    downloader = None
+    while not (page["status"] == "fetched" and path.exists()):
+        if page["status"] == "fetched":
+            # 索引记录为已获取但文件已被删除：重新放回待获取队列
+            page = update_page(materials, page["url"], status="pending", drop=("fetch_date",))
+        busy = page["status"] == "fetching" and time.time() - page.get("fetch_started", 0) < FETCH_STALE_SECONDS
+        if not busy:
+            downloader = downloader or make_downloader(1)
+            claimed = claim(materials, [page])
+            if claimed:
+                try:
+                    if not fetch_page(materials, claimed[0], downloader):
+                        return None
+                finally:
+                    release(materials, claimed)
+                page = find_page(read_map(materials), page["filename"])
+                continue
+        if time.time() > deadline:
+            print(f"错误: 等待后台获取超时: {page['filename']}")
+            return None
+        time.sleep(0.2)
+        page = find_page(read_map(materials), page["filename"])
+
+    if prefetch_count > 0:
+        start_background_prefetch(materials, prefetch_count, page["filename"])
+    return path
+
+
+def next_pending(links_map: dict, count: int, after: str = None) -> list[dict]:
+    """目录顺序中位于 after（默认最近打开的章节）之后、尚未获取的前 count 个章节"""
+    after = after or links_map.get("last_opened")
+    pages = all_pages(links_map)
+    start = next((p.get("index", 0) for p in pages if p["filename"] == after), 0)
+    return [p for p in pages if p.get("index", 0) > start and p["status"] != "fetched"][:count]
+
+
+def prefetch(materials: Path, count: int = DEFAULT_PREFETCH, after: str = None,
+             concurrency: int = DEFAULT_CONCURRENCY) -> list[str]:
+    """以有限并发抓取之后 count 个未获取的章节，返回成功获取的文件名"""
+    pending = next_pending(read_map(materials), count, after)
+    if not pending:
+        return []
+    # 先创建下载器再标记章节，避免导入或配置出错时章节一直停留在 fetching
+    downloader = make_downloader(concurrency)
+    pages = claim(materials, pending)
+    if not pages:
+        return []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pages)))) as pool:
+            done = list(pool.map(lambda p: fetch_page(materials, p, downloader), pages))
+    finally:
+        release(materials, pages)
+    return [p["filename"] for p, ok in zip(pages, done) if ok]
+
+
+def start_background_prefetch(materials: Path, count: int, after: str = None) -> None:
+    """在独立的后台进程中预取，不阻塞当前命令；输出写入 materials/.prefetch.log"""
+    if not next_pending(read_map(materials), count, after):
+        return
+    args = [sys.executable, str(Path(__file__).resolve()), "prefetch", str(materials), "--count", str(count)]
+    if after:
+        args += ["--after", after]
+    with open(materials / PREFETCH_LOG, "a", encoding="utf-8") as log:
+        subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                         start_new_session=True)
+    print(f"后台预取之后 {count} 个章节（日志: {materials / PREFETCH_LOG}）")
+
+
+def status(materials: Path) -> None:
+    """显示各章节的获取状态"""
+    links_map = read_map(materials)
+    icons = {"fetched": "✅", "pending": "⏳", "fetching": "🔄", "failed": "❌"}
+    for page in all_pages(links_map):
+        marker = " ← 最近打开" if page["filename"] == links_map.get("last_opened") else ""
+        print(f"{icons.get(page['status'], '?')} {page.get('index', ''):>3} {page['filename']}  {page['title']}{marker}")
+    pages = all_pages(links_map)
+    print(f"\n已获取 {sum(p['status'] == 'fetched' for p in pages)} / {len(pages)}")
+
+
+def main():
+    """命令行入口"""
+    args, options = [], {"pattern": None, "prefetch": DEFAULT_PREFETCH, "after": None,
+                         "concurrency": DEFAULT_CONCURRENCY}
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg in ("-h", "--help"):
+            print(__doc__)
+            sys.exit(0)
+        elif arg == "--pattern":
+            options["pattern"] = next(argv)
+        elif arg in ("--prefetch", "--count"):
+            options["prefetch"] = int(next(argv))
+        elif arg == "--no-prefetch":
+            options["prefetch"] = 0
+        elif arg == "--after":
+            options["after"] = next(argv)
+        elif arg == "--concurrency":
+            options["concurrency"] = int(next(argv))
+        else:
+            args.append(arg)
+
+    command = args[0] if args else None
+    if command == "init" and len(args) == 3:
+        init(args[1], Path(args[2]), options["pattern"], options["prefetch"])
+    elif command == "get" and len(args) == 3:
+        path = get(Path(args[1]), args[2], options["prefetch"])
+        if path is None:
+            sys.exit(1)
+        print(path)
+    elif command == "prefetch" and len(args) == 2:
+        fetched = prefetch(Path(args[1]), options["prefetch"], options["after"], options["concurrency"])
+        print(f"预取完成: {len(fetched)} 个章节")
+    elif command == "status" and len(args) == 2:
+        status(Path(args[1]))
+    else:
+        print(__doc__)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,38 @@
 #!/usr/bin/env python3
 """
 Package skill with UTF-8 encoding support
+
+Usage:
+    python package_skill.py [skill_path] [output_dir] [--incremental] [--workers N]
+    python package_skill.py --all [repo_root] [output_dir] [--incremental] [--workers N]
+
+--incremental reuses the compressed data of files whose CRC32 and size match the
+entry in the existing .skill archive, so only new or changed files are deflated.
+New or changed files are compressed on a thread pool (--workers, default: CPU count).
+
+--all packages every directory under repo_root (default: .) that contains a
+SKILL.md, one skill per worker process (--workers), and prints a timing report.
+Validation results are cached by SKILL.md hash in $XDG_CACHE_HOME/piv-loop-setup/
+(default: ~/.cache/piv-loop-setup/), next to the init_piv_loop.py template cache.
 """
 import sys
 import os
 import re
+import hashlib
+import json
+import struct
+import time
 import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+SKIP_DIRS = ['__pycache__', '.git']
+
+VALIDATION_CACHE = Path(os.environ.get('XDG_CACHE_HOME', '~/.cache')).expanduser() / 'piv-loop-setup' / 'skill-validation.json'
+# Bump when validate_skill() rules change so cached results are discarded
+VALIDATION_VERSION = 1
+
 def read_text_with_utf8(path):
     """Read text file with UTF-8 encoding"""
     with open(path, 'r', encoding='utf-8') as f:
@@ -59,43 +84,279 @@ def validate_skill(skill_path):
 
     return True, "Skill is valid!"
 
-def package_skill(skill_path, output_dir=None):
-    """Package skill into .skill file"""
-    skill_path = Path(skill_path)
-    name = skill_path.name
+def load_validation_cache(path=VALIDATION_CACHE):
+    try:
+        return json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+def save_validation_cache(cache, path=VALIDATION_CACHE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(cache, indent=2), encoding='utf-8')
+    os.replace(tmp, path)
 
+def validate_skill_cached(skill_path, cache):
+    """
+    validate_skill() with results cached by the SHA-256 of SKILL.md
+
+    Validation only depends on SKILL.md, so an unchanged file is not read as
+    text or parsed with yaml again. Returns (valid, message, cached).
+    """
+    try:
+        data = (Path(skill_path) / 'SKILL.md').read_bytes()
+    except OSError:
+        return (*validate_skill(skill_path), False)
+    key = f"{VALIDATION_VERSION}:{hashlib.sha256(data).hexdigest()}"
+    if key in cache:
+        valid, message = cache[key]
+        return valid, message, True
     valid, message = validate_skill(skill_path)
-    if not valid:
-        print(f"Validation failed: {message}")
-        return False
+    cache[key] = [valid, message]
+    return valid, message, False
 
+def collect_files(skill_path):
+    """List (path, arcname) pairs to package, in os.walk order"""
+    files = []
+    for root, dirs, names in os.walk(skill_path):
+        # Skip __pycache__ and .git
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in names:
+            if name.endswith('.pyc'):
+                continue
+            file_path = Path(root) / name
+            files.append((file_path, file_path.relative_to(skill_path).as_posix()))
+    return files
+
+def read_existing_entries(archive):
+    """Map arcname -> ZipInfo for reusable (deflated, unencrypted) entries of an existing archive"""
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            return {
+                info.filename: info for info in zf.infolist()
+                if info.compress_type == zipfile.ZIP_DEFLATED and not info.flag_bits & 0x1
+            }
+    except (OSError, zipfile.BadZipFile):
+        return {}
+
+def read_raw_entry(fp, info):
+    """Read the compressed bytes of an entry without decompressing them"""
+    fp.seek(info.header_offset)
+    header = fp.read(30)
+    if header[:4] != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    fp.seek(info.header_offset + 30 + name_len + extra_len)
+    return fp.read(info.compress_size)
+
+def compress_file(file_path):
+    """Read and deflate one file; returns (compressed bytes, CRC32, size)"""
+    data = file_path.read_bytes()
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+def file_crc(file_path):
+    """CRC32 and size of a file, read in chunks"""
+    crc, size = 0, 0
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+    return crc, size
+
+def write_raw_entry(zf, info, data):
+    """
+    Append an already-deflated entry to a ZipFile opened for writing.
+
+    zipfile has no public API for this, so the local header is written with
+    ZipInfo.FileHeader() and the entry registered the way ZipFile.write() does;
+    close() then writes the central directory as usual.
+    """
+    info.header_offset = zf.fp.tell()
+    info.flag_bits &= ~0x08  # sizes and CRC are known, no data descriptor
+    zf.fp.write(info.FileHeader(info.file_size > zipfile.ZIP64_LIMIT))
+    zf.fp.write(data)
+    zf.start_dir = zf.fp.tell()
+    zf.filelist.append(info)
+    zf.NameToInfo[info.filename] = info
+
+def package_skill(skill_path, output_dir=None, incremental=False, workers=None, validate=True):
+    """
+    Package skill into .skill file
+
+    With incremental=True, entries of the existing archive whose CRC32 and size
+    match the file on disk are copied over without recompressing. Everything
+    else is compressed in parallel threads (zlib releases the GIL).
+    Pass validate=False when the caller has already validated the skill.
+    """
+    skill_path = Path(skill_path)
+
+    if validate:
+        valid, message = validate_skill(skill_path)
+        if not valid:
+            print(f"Validation failed: {message}")
+            return False
+
+    stats = build_archive(skill_path, output_dir, incremental, workers)
+    if incremental:
+        print(f"Packaged: {stats['file']} ({stats['reused']} unchanged, {stats['compressed']} compressed)")
+    else:
+        print(f"Packaged: {stats['file']}")
+    return True
+
+def build_archive(skill_path, output_dir=None, incremental=False, workers=None):
+    """
+    Write <output_dir>/<name>.skill without validating
+
+    Returns {'file', 'files', 'reused', 'compressed', 'bytes'}.
+    """
+    skill_path = Path(skill_path)
     if output_dir is None:
         output_dir = skill_path.parent
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    output_file = output_dir / f"{name}.skill"
+    output_file = output_dir / f"{skill_path.name}.skill"
+    files = collect_files(skill_path)
+    existing = read_existing_entries(output_file) if incremental and output_file.exists() else {}
 
-    with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for root, dirs, files in os.walk(skill_path):
-            # Skip __pycache__ and .git
-            dirs[:] = [d for d in dirs if d not in ['__pycache__', '.git']]
-            for file in files:
-                if file.endswith('.pyc'):
-                    continue
-                file_path = Path(root) / file
-                arcname = file_path.relative_to(skill_path)
-                zf.write(file_path, arcname)
+    # Decide per file: reuse the old compressed entry or compress again
+    reuse = {}
+    for file_path, arcname in files:
+        old = existing.get(arcname)
+        if old is not None and file_crc(file_path) == (old.CRC, old.file_size):
+            reuse[arcname] = old
 
-    print(f"Packaged: {output_file}")
-    return True
+    changed = [file_path for file_path, arcname in files if arcname not in reuse]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        compressed = dict(zip(changed, pool.map(compress_file, changed)))
+
+    # Write to a temporary file first: the old archive is still being read
+    tmp_file = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+    try:
+        with zipfile.ZipFile(tmp_file, 'w', zipfile.ZIP_DEFLATED) as zf, \
+                (open(output_file, 'rb') if reuse else open(os.devnull, 'rb')) as old_fp:
+            for file_path, arcname in files:
+                info = zipfile.ZipInfo.from_file(file_path, arcname)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                if arcname in reuse:
+                    old = reuse[arcname]
+                    data = read_raw_entry(old_fp, old)
+                    info.CRC, info.file_size = old.CRC, old.file_size
+                else:
+                    data, info.CRC, info.file_size = compressed[file_path]
+                info.compress_size = len(data)
+                write_raw_entry(zf, info, data)
+        os.replace(tmp_file, output_file)
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+    return {
+        'file': str(output_file),
+        'files': len(files),
+        'reused': len(reuse),
+        'compressed': len(changed),
+        'bytes': output_file.stat().st_size,
+    }
+
+def find_skills(root):
+    """Directories directly under root that contain a SKILL.md"""
+    return sorted(d for d in Path(root).iterdir() if d.is_dir() and (d / 'SKILL.md').is_file())
+
+def _package_task(skill_path, output_dir, incremental):
+    """Worker process: build one archive, returning stats or the error"""
+    start = time.perf_counter()
+    try:
+        # One compression thread per skill: the process pool already uses every core
+        result = build_archive(skill_path, output_dir, incremental, workers=1)
+        result['error'] = None
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {e}"}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def package_all(root='.', output_dir=None, incremental=False, workers=None):
+    """
+    Validate and package every skill under root
+
+    Validation runs in this process against the cache; valid skills are then
+    packaged in a process pool. Returns one report row per skill.
+    """
+    cache = load_validation_cache()
+    rows = []
+    for skill_path in find_skills(root):
+        start = time.perf_counter()
+        valid, message, cached = validate_skill_cached(skill_path, cache)
+        rows.append({
+            'skill': skill_path.name,
+            'path': skill_path,
+            'valid': valid,
+            'message': message,
+            'validate': 'cached' if cached else f"{time.perf_counter() - start:.3f}s",
+        })
+    save_validation_cache(cache)
+
+    valid_rows = [row for row in rows if row['valid']]
+    if valid_rows:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(valid_rows))) as pool:
+            futures = [pool.submit(_package_task, row['path'], output_dir, incremental) for row in valid_rows]
+            for row, future in zip(valid_rows, futures):
+                row.update(future.result())
+    return rows
+
+def print_report(rows, elapsed):
+    """Per-skill status and timing table"""
+    table = [('Skill', 'Status', 'Validate', 'Package', 'Files', 'Reused', 'Size')]
+    for row in rows:
+        if not row['valid']:
+            table.append((row['skill'], 'invalid', row['validate'], '-', '-', '-', '-'))
+        elif row['error']:
+            table.append((row['skill'], 'failed', row['validate'], f"{row['seconds']:.2f}s", '-', '-', '-'))
+        else:
+            table.append((row['skill'], 'ok', row['validate'], f"{row['seconds']:.2f}s", str(row['files']),
+                          str(row['reused']), f"{row['bytes'] / 1024:.0f} KB"))
+    widths = [max(len(r[i]) for r in table) for i in range(len(table[0]))]
+    for i, r in enumerate(table):
+        print('  '.join(cell.ljust(width) for cell, width in zip(r, widths)).rstrip())
+        if i == 0:
+            print('  '.join('-' * width for width in widths))
+
+    failed = [row for row in rows if not row['valid'] or row['error']]
+    print(f"\n{len(rows) - len(failed)}/{len(rows)} skills packaged in {elapsed:.2f}s")
+    for row in failed:
+        print(f"  {row['skill']}: {row['message'] if not row['valid'] else row['error']}")
+    return not failed
 
 if __name__ == "__main__":
-    skill_path = sys.argv[1] if len(sys.argv) > 1 else '.'
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    args = []
+    bulk = False
+    incremental = False
+    workers = None
+    argv = iter(sys.argv[1:])
+    for arg in argv:
+        if arg == '--all':
+            bulk = True
+        elif arg == '--incremental':
+            incremental = True
+        elif arg == '--workers':
+            workers = int(next(argv))
+        else:
+            args.append(arg)
+    skill_path = args[0] if len(args) > 0 else '.'
+    output_dir = args[1] if len(args) > 1 else None
+
+    if bulk:
+        start = time.perf_counter()
+        rows = package_all(skill_path, output_dir, incremental, workers)
+        if not rows:
+            print(f"No skills found in {skill_path}")
+            sys.exit(1)
+        sys.exit(0 if print_report(rows, time.perf_counter() - start) else 1)
 
     valid, message = validate_skill(skill_path)
     print(message)
 
     if valid:
-        package_skill(skill_path, output_dir)
+        package_skill(skill_path, output_dir, incremental, workers, validate=False)
@@ -3,20 +3,282 @@
 PIV Loop 工作流配置脚本
 
 自动检测项目类型，生成 Claude Commands 配置。
+
+用法:
+    python init_piv_loop.py [--monorepo] [--debug] [--template-cache] [--rescan] [--dry-run] [--threads N]
+    python init_piv_loop.py --fleet <父目录|项目列表文件> [--workers N] [--monorepo] [--dry-run]
+
+--dry-run 只打印将创建的目录、将写入的文件和 diff，不修改磁盘；--threads 为写入文件的线程数。
+
+--fleet 为多个仓库批量配置：参数为目录时处理它的每个子目录，为文件时每行一个项目路径。
 """
 
+import contextlib
+import difflib
+import hashlib
 import json
 import os
 import re
-import shutil
 import subprocess
 import sys
-from dataclasses import dataclass
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from enum import Enum
 from pathlib import Path
 from typing import Optional
 
 
+# 扫描时直接跳过的目录：版本控制、依赖、虚拟环境、缓存和构建产物
+SKIP_DIRS = {
+    ".git", ".hg", ".svn",
+    "node_modules", "bower_components", ".pnpm-store", ".yarn",
+    ".venv", "venv", "__pycache__", ".tox", ".nox", ".eggs",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".cache",
+    "target", "build", "dist", "out", ".next", ".nuxt", ".svelte-kit", ".turbo",
+    ".gradle", ".idea", ".vscode", "coverage", "htmlcov",
+}
+
+# 包根目录的标记文件：monorepo 模式下包含其中任一文件的目录视为一个独立的包
+PACKAGE_MARKERS = {
+    "pyproject.toml", "setup.py", "package.json", "Cargo.toml", "go.mod",
+    "pom.xml", "build.gradle", "build.gradle.kts",
+}
+
+
+class GitIgnore:
+    """
+    .gitignore 规则集
+
+    支持 *、**、?、字符类、/ 锚定、目录规则（以 / 结尾）和 ! 取反；
+    子目录中的 .gitignore 只作用于该目录，后出现的规则优先。
+    """
+
+    def __init__(self):
+        self.rules = []
+
+    def extend(self, directory: Path, base: Path) -> "GitIgnore":
+        """返回加上 directory/.gitignore 规则后的新规则集，base 为该目录相对项目根目录的路径"""
+        path = directory / ".gitignore"
+        if not path.is_file():
+            return self
+        try:
+            lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
+        except OSError:
+            return self
+
+        extended = GitIgnore()
+        extended.rules = self.rules + [rule for rule in map(self._compile, lines) if rule]
+        for rule in extended.rules[len(self.rules):]:
+            rule["base"] = base.as_posix() if base.parts else ""
+        return extended
+
+    @staticmethod
+    def _compile(line: str) -> Optional[dict]:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.strip("/") if dir_only else line
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return None
+
+        regex, i = "", 0
+        while i < len(line):
+            if line.startswith("**/", i):
+                regex, i = regex + "(?:.*/)?", i + 3
+            elif line.startswith("**", i):
+                regex, i = regex + ".*", i + 2
+            elif line[i] == "*":
+                regex, i = regex + "[^/]*", i + 1
+            elif line[i] == "?":
+                regex, i = regex + "[^/]", i + 1
+            elif line[i] == "[" and "]" in line[i + 1:]:
+                end = line.index("]", i + 1)
+                regex, i = regex + "[" + line[i + 1:end].replace("!", "^", 1) + "]", end + 1
+            else:
+                regex, i = regex + re.escape(line[i]), i + 1
+
+        prefix = "^" if anchored else "(?:^|.*/)"
+        return {"regex": re.compile(prefix + regex + "$"), "negate": negate, "dir_only": dir_only}
+
+    def ignored(self, rel: Path, is_dir: bool) -> bool:
+        """判断相对项目根目录的路径是否被忽略"""
+        path = rel.as_posix()
+        result = False
+        for rule in self.rules:
+            if rule["dir_only"] and not is_dir:
+                continue
+            base = rule["base"]
+            if base:
+                if not path.startswith(base + "/"):
+                    continue
+                target = path[len(base) + 1:]
+            else:
+                target = path
+            if rule["regex"].match(target):
+                result = not rule["negate"]
+        return result
+
+
+# 模板占位符 {{name}}
+PLACEHOLDER_RE = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+# 编译后模板的磁盘缓存目录
+DEFAULT_TEMPLATE_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "piv-loop-setup"
+
+
+class Template:
+    """
+    预编译的模板
+
+    segments 是字面文本和占位符交替的列表：偶数位置为文本，奇数位置为 [名称, 原文]，
+    渲染时一次遍历拼接，不再对每个替换键扫描并复制整个字符串。
+    """
+
+    def __init__(self, segments: list):
+        self.segments = segments
+        self.placeholders = {name for name, _ in segments[1::2]}
+
+    @classmethod
+    def parse(cls, text: str) -> "Template":
+        segments, pos = [], 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            segments.append(text[pos:match.start()])
+            segments.append([match.group(1), match.group(0)])
+            pos = match.end()
+        segments.append(text[pos:])
+        return cls(segments)
+
+    def render(self, values: dict) -> tuple[str, list[str]]:
+        """返回 (渲染结果, 未提供值的占位符)；未知占位符原样保留"""
+        parts, unknown = [], []
+        for i, segment in enumerate(self.segments):
+            if i % 2 == 0:
+                parts.append(segment)
+            elif segment[0] in values:
+                parts.append(values[segment[0]])
+            else:
+                parts.append(segment[1])
+                unknown.append(segment[0])
+        return "".join(parts), unknown
+
+
+class TemplateCache:
+    """
+    模板缓存
+
+    内存中按路径缓存源文件内容、哈希和编译结果，文件大小和 mtime 不变时不再读取磁盘；
+    指定 cache_dir 时编译结果按内容哈希保存到 templates.json，供后续进程复用。
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = cache_dir
+        self._files = {}
+        self._compiled = {}
+        self._dirty = False
+        if cache_dir is not None:
+            try:
+                self._compiled = json.loads((cache_dir / "templates.json").read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._compiled = {}
+
+    def read(self, path: Path) -> tuple[bytes, str]:
+        """返回 (内容, sha256)"""
+        stat = path.stat()
+        key = (stat.st_size, stat.st_mtime_ns)
+        cached = self._files.get(path)
+        if cached is None or cached[0] != key:
+            data = path.read_bytes()
+            cached = (key, data, hashlib.sha256(data).hexdigest())
+            self._files[path] = cached
+        return cached[1], cached[2]
+
+    def compile(self, source: bytes, digest: str) -> Template:
+        """按内容哈希返回编译后的模板"""
+        segments = self._compiled.get(digest)
+        if segments is None:
+            segments = Template.parse(source.decode("utf-8")).segments
+            self._compiled[digest] = segments
+            self._dirty = True
+        return Template(segments)
+
+    def preload(self, directory: Path) -> None:
+        """读取并编译目录下的所有 .md 模板"""
+        for path in sorted(directory.rglob("*.md")):
+            self.compile(*self.read(path))
+
+    def state(self) -> dict:
+        """可在进程间传递的缓存内容"""
+        return {"cache_dir": self.cache_dir, "files": self._files, "compiled": self._compiled}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TemplateCache":
+        cache = cls()
+        cache.cache_dir = state["cache_dir"]
+        cache._files = dict(state["files"])
+        cache._compiled = dict(state["compiled"])
+        return cache
+
+    def save(self) -> None:
+        """把新编译的模板写入磁盘缓存"""
+        if self.cache_dir is None or not self._dirty:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / "templates.json"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self._compiled, ensure_ascii=False))
+        os.replace(tmp, path)
+        self._dirty = False
+
+
+# 进程内共享的模板缓存，为多个项目生成配置时模板只读取和编译一次
+TEMPLATES = TemplateCache()
+
+
+def iter_levels(root: Path):
+    """
+    按层（广度优先）遍历项目，跳过 SKIP_DIRS 和 .gitignore 忽略的路径
+
+    每层产出一个 [(目录相对路径, [文件相对路径, ...]), ...] 列表，调用方可以在任意一层结束后停止。
+    """
+    level = [(root, Path(), GitIgnore())]
+    while level:
+        next_level = []
+        listing = []
+        for directory, rel_dir, ignore in level:
+            ignore = ignore.extend(directory, rel_dir)
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            files = []
+            for entry in entries:
+                rel = rel_dir / entry.name
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    is_file = not is_dir and entry.is_file()
+                except OSError:
+                    continue
+                if is_dir and entry.name in SKIP_DIRS:
+                    continue
+                if ignore.rules and ignore.ignored(rel, is_dir):
+                    continue
+                if is_dir:
+                    next_level.append((Path(entry.path), rel, ignore))
+                elif is_file:
+                    files.append(rel)
+            listing.append((rel_dir, files))
+        yield listing
+        level = next_level
+
+
 class PackageManager(Enum):
     UV = "uv"
     NPM = "npm"
@@ -31,7 +293,7 @@ class TestFramework(Enum):
     PYTEST = "pytest"
     VITEST = "vitest"
     JEST = "jest"
-    UNittest = "unittest"
+    UNITTEST = "unittest"
     GO_TEST = "go test"
 
 
@@ -54,101 +316,351 @@ class ProjectConfig:
     framework: Optional[str]
     commands: list[str]
     skip_reference: list[str]
+    path: str = "."  # 相对仓库根目录的路径（monorepo 模式下区分各个包）
+
+
+class MarkerIndex:
+    """
+    扫描时建立的文件索引
+
+    by_name 记录文件名到路径的映射，用于锁文件、配置文件等按文件名判断的指标；
+    正则指标合并为一个预编译的匹配器，绝大多数文件一次匹配即可排除，
+    只有命中的文件才逐条确认具体是哪些指标。
+    """
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = [re.compile(p) for p in dict.fromkeys(patterns)]
+        self.combined = re.compile("|".join(f"(?:{p.pattern})" for p in self.patterns))
+        self.by_name = {}
+        self.matched = {}
+
+    def add(self, rel: Path) -> None:
+        """把一个文件加入索引"""
+        self.by_name.setdefault(rel.name, []).append(rel)
+        path = str(rel)
+        if len(self.matched) < len(self.patterns) and self.combined.search(path):
+            for pattern in self.patterns:
+                if pattern.pattern not in self.matched and pattern.search(path):
+                    self.matched[pattern.pattern] = rel
+
+    def has_name(self, name: str) -> bool:
+        return name in self.by_name
+
+    def has_match(self, pattern: str) -> bool:
+        """是否有文件路径匹配该正则指标"""
+        return pattern in self.matched
 
 
 class ProjectDetector:
     """项目类型检测器"""
 
-    def __init__(self, project_root: Path):
+    PACKAGE_MANAGER_INDICATORS = {
+        "uv.lock": PackageManager.UV,
+        "package-lock.json": PackageManager.NPM,
+        "pnpm-lock.yaml": PackageManager.PNPM,
+        "yarn.lock": PackageManager.YARN,
+        "pom.xml": PackageManager.MAVEN,
+        "build.gradle": PackageManager.GRADLE,
+        "Cargo.lock": PackageManager.CARGO,
+    }
+
+    TEST_FRAMEWORK_INDICATORS = [
+        (r"pytest\.ini|conftest\.py|pyproject\.toml", TestFramework.PYTEST),
+        (r"vitest\.config\.|@vitest/", TestFramework.VITEST),
+        (r"jest\.config\.|__tests__", TestFramework.JEST),
+        (r"unittest\.py|test_.*\.py", TestFramework.UNITTEST),
+    ]
+
+    LINTER_INDICATORS = {
+        "ruff.toml": Linter.RUFF,
+        ".eslintrc": Linter.ESLINT,
+        ".prettierrc": Linter.PRETTIER,
+        "pyproject.toml": Linter.BLACK,  # 假设 Python
+        ".flake8": Linter.FLAKE8,
+    }
+
+    LANGUAGE_INDICATORS = [
+        # Python
+        (r"pyproject\.toml|setup\.py", "python", "fastapi"),
+        (r"requirements\.txt", "python", "flask"),
+        # JavaScript/TypeScript
+        (r"package\.json", "typescript", "react"),
+        (r"tsconfig\.json", "typescript", None),
+        # Java
+        (r"pom\.xml|build\.gradle", "java", "spring"),
+        # Go
+        (r"go\.mod", "go", None),
+        # Rust
+        (r"Cargo\.toml", "rust", None),
+    ]
+
+    INDICATOR_PATTERNS = [pattern for pattern, *_ in TEST_FRAMEWORK_INDICATORS + LANGUAGE_INDICATORS]
+
+    # 包管理器、测试框架和 Linter 所属的语言：内层包只沿用同一语言的外层检测结果
+    # （外层的 pnpm-lock.yaml 不适用于内层的 Python 服务）
+    ECOSYSTEMS = {
+        PackageManager.UV: "python", PackageManager.NPM: "typescript", PackageManager.PNPM: "typescript",
+        PackageManager.YARN: "typescript", PackageManager.MAVEN: "java", PackageManager.GRADLE: "java",
+        PackageManager.CARGO: "rust",
+        TestFramework.PYTEST: "python", TestFramework.UNITTEST: "python", TestFramework.VITEST: "typescript",
+        TestFramework.JEST: "typescript", TestFramework.GO_TEST: "go",
+        Linter.RUFF: "python", Linter.BLACK: "python", Linter.FLAKE8: "python", Linter.ESLINT: "typescript",
+        Linter.PRETTIER: "typescript",
+    }
+
+    # 内层包既没有自己的标记、外层也没有同一语言的标记时，按本包语言使用的默认值
+    LANGUAGE_DEFAULTS = {
+        "python": {"package_manager": PackageManager.UV, "test_framework": TestFramework.PYTEST,
+                   "linter": Linter.RUFF},
+        "typescript": {"package_manager": PackageManager.NPM, "test_framework": TestFramework.VITEST,
+                       "linter": Linter.ESLINT},
+        "java": {"package_manager": PackageManager.MAVEN},
+        "go": {"test_framework": TestFramework.GO_TEST},
+        "rust": {"package_manager": PackageManager.CARGO},
+    }
+
+    def __init__(self, project_root: Path, scan: bool = True, parent: "ProjectDetector" = None, path: str = "."):
+        """
+        scan=False 时不扫描，由调用方通过 add_file() 填充（monorepo 模式）；
+        parent 为外层的包，本包没有包管理器、测试框架或 Linter 标记时沿用外层同一语言的检测结果。
+        """
         self.root = project_root
-        self.files = self._list_files()
+        self.parent = parent
+        self.path = path
+        self.index = MarkerIndex(self.INDICATOR_PATTERNS)
+        self.files = set()
+        if scan:
+            self._list_files()
+
+    def add_file(self, rel: Path) -> None:
+        self.files.add(rel)
+        self.index.add(rel)
+
+    def marker_files(self) -> set:
+        """检测结果依赖的标记文件（相对仓库根目录），用于检测缓存的指纹"""
+        names = set(self.PACKAGE_MANAGER_INDICATORS) | set(self.LINTER_INDICATORS) | PACKAGE_MARKERS
+        markers = {rel for name in names for rel in self.index.by_name.get(name, [])}
+        markers |= set(self.index.matched.values())
+        prefix = Path(self.path)
+        return {prefix / rel for rel in markers}
 
     def _list_files(self) -> set:
-        """列出所有文件（不含 .git）"""
-        files = set()
-        for p in self.root.rglob("*"):
-            if p.is_file() and ".git" not in p.parts:
-                files.add(p.relative_to(self.root))
-        return files
+        """
+        按层列出文件（见 iter_levels）
+
+        每扫描完一层检查一次：包管理器、测试框架、Linter 和语言都已有标记文件时停止，
+        不再进入更深的目录。
+        """
+        for listing in iter_levels(self.root):
+            for _, files in listing:
+                for rel in files:
+                    self.add_file(rel)
+            if self._markers_found():
+                break
+        return self.files
+
+    def _markers_found(self) -> bool:
+        """每一类检测是否都已有匹配的标记文件"""
+        return (
+            any(map(self.index.has_name, self.PACKAGE_MANAGER_INDICATORS))
+            and any(map(self.index.has_name, self.LINTER_INDICATORS))
+            and any(self.index.has_match(pattern) for pattern, *_ in self.TEST_FRAMEWORK_INDICATORS)
+            and any(self.index.has_match(pattern) for pattern, *_ in self.LANGUAGE_INDICATORS)
+        )
 
     def detect_package_manager(self) -> PackageManager:
         """检测包管理器"""
-        indicators = {
-            "uv.lock": PackageManager.UV,
-            "package-lock.json": PackageManager.NPM,
-            "pnpm-lock.yaml": PackageManager.PNPM,
-            "yarn.lock": PackageManager.YARN,
-            "pom.xml": PackageManager.MAVEN,
-            "build.gradle": PackageManager.GRADLE,
-            "Cargo.lock": PackageManager.CARGO,
-        }
-        for filename, pm in indicators.items():
-            if any(f.name == filename for f in self.files):
-                return pm
-        return PackageManager.NPM  # 默认
+        return self._detect("package_manager", PackageManager.NPM)
 
     def detect_test_framework(self) -> TestFramework:
         """检测测试框架"""
-        indicators = [
-            (r"pytest\.ini|conftest\.py|pyproject\.toml", TestFramework.PYTEST),
-            (r"vitest\.config\.|@vitest/", TestFramework.VITEST),
-            (r"jest\.config\.|__tests__", TestFramework.JEST),
-            (r"unittest\.py|test_.*\.py", TestFramework.unittest),
-        ]
-        for pattern, framework in indicators:
-            if any(re.search(pattern, str(f)) for f in self.files):
-                return framework
-        return TestFramework.PYTEST  # 默认
+        return self._detect("test_framework", TestFramework.PYTEST)
 
     def detect_linter(self) -> Linter:
         """检测代码检查工具"""
-        indicators = {
-            "ruff.toml": Linter.RUFF,
-            ".eslintrc": Linter.ESLINT,
-            ".prettierrc": Linter.PRETTIER,
-            "pyproject.toml": Linter.BLACK,  # 假设 Python
-            ".flake8": Linter.FLAKE8,
-        }
-        for filename, linter in indicators.items():
-            if any(f.name == filename for f in self.files):
-                return linter
-        return Linter.RUFF  # 默认
+        return self._detect("linter", Linter.RUFF)
+
+    def _own_marker(self, kind: str):
+        """本包自己的标记文件对应的检测结果，没有时返回 None"""
+        if kind == "package_manager":
+            return next((pm for name, pm in self.PACKAGE_MANAGER_INDICATORS.items() if self.index.has_name(name)),
+                        None)
+        if kind == "test_framework":
+            return next((fw for pattern, fw in self.TEST_FRAMEWORK_INDICATORS if self.index.has_match(pattern)),
+                        None)
+        return next((linter for name, linter in self.LINTER_INDICATORS.items() if self.index.has_name(name)), None)
+
+    def _detect(self, kind: str, default):
+        """
+        本包的标记优先；没有时沿用最近的、标记属于本包语言的外层包，
+        内层包仍找不到时使用本包语言的默认值，根目录使用 default
+        """
+        found = self._own_marker(kind)
+        if found is not None or self.parent is None:
+            return found if found is not None else default
+        language = self.detect_language_and_framework()[0]
+        ancestor = self.parent
+        while ancestor is not None:
+            found = ancestor._own_marker(kind)
+            if found is not None and self.ECOSYSTEMS.get(found) == language:
+                return found
+            ancestor = ancestor.parent
+        return self.LANGUAGE_DEFAULTS.get(language, {}).get(kind, default)
 
     def detect_language_and_framework(self) -> tuple[str, Optional[str]]:
         """检测语言和框架"""
-        indicators = [
-            # Python
-            (r"pyproject\.toml|setup\.py", "python", "fastapi"),
-            (r"requirements\.txt", "python", "flask"),
-            # JavaScript/TypeScript
-            (r"package\.json", "typescript", "react"),
-            (r"tsconfig\.json", "typescript", None),
-            # Java
-            (r"pom\.xml|build\.gradle", "java", "spring"),
-            # Go
-            (r"go\.mod", "go", None),
-            # Rust
-            (r"Cargo\.toml", "rust", None),
-        ]
-        for pattern, lang, framework in indicators:
-            if any(re.search(pattern, str(f)) for f in self.files):
+        for pattern, lang, framework in self.LANGUAGE_INDICATORS:
+            if self.index.has_match(pattern):
                 return lang, framework
         return "typescript", None  # 默认
 
     def detect(self) -> ProjectConfig:
         """执行完整检测"""
+        language, framework = self.detect_language_and_framework()
         return ProjectConfig(
             name=self.root.name,
             package_manager=self.detect_package_manager(),
             test_framework=self.detect_test_framework(),
             linter=self.detect_linter(),
-            language=self.detect_language_and_framework()[0],
-            framework=self.detect_language_and_framework()[1],
+            language=language,
+            framework=framework,
             commands=["core_piv_loop", "validation", "github_bug_fix", "commit"],
             skip_reference=[],
+            path=self.path,
         )
 
 
+class MonorepoDetector:
+    """
+    monorepo 检测器
+
+    一次遍历找出所有包根目录（包含 PACKAGE_MARKERS 的目录），每个文件归入离它最近的包，
+    各包分别检测。锁文件、Linter 配置等只在外层时，内层包沿用外层同一语言的检测结果。
+    """
+
+    def __init__(self, project_root: Path):
+        self.root = project_root
+        self.packages = self._scan()
+
+    def _scan(self) -> dict:
+        """返回 {包相对路径: ProjectDetector}，仓库根目录总是包含在内"""
+        packages = {Path(): ProjectDetector(self.root, scan=False)}
+        owners = {}
+        for listing in iter_levels(self.root):
+            for rel_dir, files in listing:
+                owner = owners.get(rel_dir.parent, packages[Path()])
+                if rel_dir.parts and PACKAGE_MARKERS & {f.name for f in files}:
+                    owner = ProjectDetector(self.root / rel_dir, scan=False, parent=owner, path=rel_dir.as_posix())
+                    packages[rel_dir] = owner
+                owners[rel_dir] = owner
+                depth = len(owner.root.relative_to(self.root).parts)
+                for rel in files:
+                    owner.add_file(Path(*rel.parts[depth:]))
+        return packages
+
+    def detect(self) -> list[ProjectConfig]:
+        """检测每个包；根目录本身不是包且存在子包时不单独输出"""
+        return self.select([detector for _, detector in sorted(self.packages.items())])
+
+    @staticmethod
+    def select(detectors: list[ProjectDetector]) -> list[ProjectConfig]:
+        root = next(d for d in detectors if d.path == ".")
+        is_package = any(root.index.has_name(marker) for marker in PACKAGE_MARKERS)
+        return [
+            detector.detect()
+            for detector in sorted(detectors, key=lambda d: d.path)
+            if detector.path != "." or is_package or len(detectors) == 1
+        ]
+
+
+class DetectionCache:
+    """
+    检测结果缓存：.agents/piv-detect-cache.json
+
+    记录检测到的 ProjectConfig（不含 piv-config.json 的覆盖，覆盖总是在之后重新应用）以及
+    检测依赖的标记文件、它们的所有上层目录和根目录 .gitignore 的大小与 mtime。再次运行时只检查这些指纹，
+    全部一致则直接复用结果，不再扫描项目。新增的标记文件或包（如 packages/ 下新的 package.json）
+    会改变已记录的某个目录的 mtime；添加到与已有标记无关的深层目录中的标记文件不会被发现，
+    此时使用 --rescan 重新扫描。
+    """
+
+    PATH = ".agents/piv-detect-cache.json"
+
+    def __init__(self, project_path: Path):
+        self.project_path = project_path
+        self.path = project_path / self.PATH
+
+    @staticmethod
+    def signature() -> str:
+        """检测规则的签名，规则变化后旧缓存自动失效"""
+        rules = [
+            sorted(SKIP_DIRS), sorted(PACKAGE_MARKERS),
+            [(k, v.value) for k, v in ProjectDetector.PACKAGE_MANAGER_INDICATORS.items()],
+            [(k, v.value) for k, v in ProjectDetector.TEST_FRAMEWORK_INDICATORS],
+            [(k, v.value) for k, v in ProjectDetector.LINTER_INDICATORS.items()],
+            ProjectDetector.LANGUAGE_INDICATORS,
+            sorted((k.value, v) for k, v in ProjectDetector.ECOSYSTEMS.items()),
+            {lang: {k: v.value for k, v in d.items()} for lang, d in ProjectDetector.LANGUAGE_DEFAULTS.items()},
+        ]
+        return hashlib.sha256(json.dumps(rules).encode("utf-8")).hexdigest()[:16]
+
+    def _fingerprint(self, rels: set) -> dict:
+        """{相对路径: [大小, mtime_ns]}，文件不存在时为 None"""
+        prints = {}
+        for rel in sorted(rels, key=str):
+            try:
+                stat = (self.project_path / rel).stat()
+                prints[Path(rel).as_posix()] = [stat.st_size, stat.st_mtime_ns]
+            except OSError:
+                prints[Path(rel).as_posix()] = None
+        return prints
+
+    def load(self, monorepo: bool) -> Optional[list[ProjectConfig]]:
+        """指纹全部一致时返回缓存的配置，否则返回 None"""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("signature") != self.signature() or data.get("monorepo") != monorepo:
+            return None
+        if self._fingerprint(set(data["fingerprints"])) != data["fingerprints"]:
+            return None
+
+        return [
+            ProjectConfig(**{
+                **c,
+                "package_manager": PackageManager(c["package_manager"]),
+                "test_framework": TestFramework(c["test_framework"]),
+                "linter": Linter(c["linter"]),
+            })
+            for c in data["configs"]
+        ]
+
+    def save(self, monorepo: bool, configs: list[ProjectConfig], detectors: list[ProjectDetector]) -> None:
+        """记录检测结果和依赖的标记文件指纹"""
+        markers = set().union(*(d.marker_files() for d in detectors))
+        dependencies = markers | {parent for rel in markers for parent in rel.parents} | {Path(".gitignore")}
+        configs = [
+            {
+                **asdict(c),
+                "package_manager": c.package_manager.value,
+                "test_framework": c.test_framework.value,
+                "linter": c.linter.value,
+            }
+            for c in configs
+        ]
+        data = {
+            "signature": self.signature(),
+            "monorepo": monorepo,
+            "configs": configs,
+            "fingerprints": self._fingerprint(dependencies),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2))
+        os.replace(tmp, self.path)
+
+
 class ConfigGenerator:
     """配置生成器"""
 
@@ -197,17 +709,44 @@ class ConfigGenerator:
         },
     }
 
-    def __init__(self, skill_path: Path, project_path: Path):
+    # 生成清单：记录每个输出文件的模板哈希、替换值和输出哈希，重新运行时跳过未变化的文件
+    MANIFEST = ".agents/piv-manifest.json"
+
+    def __init__(self, skill_path: Path, project_path: Path, templates: TemplateCache = None):
         self.skill_path = skill_path
         self.project_path = project_path
         self.templates_path = self.skill_path / "templates"
-
-    def generate(self, config: ProjectConfig, override: Optional[dict] = None) -> None:
-        """生成所有配置文件"""
+        self.templates = templates if templates is not None else TEMPLATES
+        self.manifest_path = self.project_path / self.MANIFEST
+        self.manifest = self._load_manifest()
+        self.outputs = {}
+        # 计划：需要创建的目录和需要写入的 (相对路径, 内容)，由 apply() 一次性写入
+        self.directories = []
+        self.pending = []
+        self.config = None
+        self.packages = []
+        self.written = []
+        self.skipped = []
+        self.warnings = {}
+
+    def generate(self, config: ProjectConfig, override: Optional[dict] = None, dry_run: bool = False,
+                 workers: int = 1) -> None:
+        """生成所有配置文件（dry_run 时只打印计划和 diff，不修改磁盘）"""
+        self.plan(config, override)
+        self._complete(dry_run, workers)
+
+    def plan(self, config: ProjectConfig, override: Optional[dict] = None) -> list[tuple[str, bytes]]:
+        """只渲染不写入：返回需要写入的 (相对路径, 内容) 列表，未变化的文件不在其中"""
         # 合并覆盖配置
         if override:
             config = self._merge_config(config, override)
 
+        self.config = config
+        self._generate(config)
+        return self.pending
+
+    def _generate(self, config: ProjectConfig) -> None:
+        """生成命令、参考文档、.agents/README.md 并更新 CLAUDE.md"""
         # 创建目录结构
         self._create_directories()
 
@@ -223,12 +762,100 @@ class ConfigGenerator:
         # 更新 CLAUDE.md
         self._update_claude_md(config)
 
-        print(f"✓ PIV Loop 工作流已配置完成")
+    def _complete(self, dry_run: bool, workers: int) -> None:
+        """执行计划（或只打印计划）并输出摘要"""
+        if dry_run:
+            self.print_plan()
+        else:
+            self.apply(workers)
+            self._finish()
+        self._print_summary(dry_run)
+
+    def _print_summary(self, dry_run: bool = False) -> None:
+        config = self.config
+        print(f"{'预演（未写入任何文件）' if dry_run else '✓ PIV Loop 工作流已配置完成'}")
         print(f"  项目: {config.name}")
         print(f"  语言: {config.language}")
         print(f"  包管理器: {config.package_manager.value}")
         print(f"  测试框架: {config.test_framework.value}")
         print(f"  Linter: {config.linter.value}")
+        if dry_run:
+            print(f"  文件: 将更新 {len(self.pending)}，未变化跳过 {len(self.skipped)}")
+        else:
+            print(f"  文件: 更新 {len(self.written)}，未变化跳过 {len(self.skipped)}")
+        for rel, names in self.warnings.items():
+            print(f"  ⚠ {rel}: 占位符未替换或为空: {', '.join(names)}")
+
+        if self.packages:
+            print(f"  包: {len(self.packages)}")
+            for c in self.packages:
+                print(f"    {c.path}: {c.language} / {c.package_manager.value} / {c.test_framework.value}")
+
+    def generate_monorepo(self, configs: list[ProjectConfig], override: Optional[dict] = None,
+                          dry_run: bool = False, workers: int = 1) -> None:
+        """monorepo 模式生成配置（dry_run 时只打印计划和 diff，不修改磁盘）"""
+        self.plan_monorepo(configs, override)
+        self._complete(dry_run, workers)
+
+    def plan_monorepo(self, configs: list[ProjectConfig],
+                      override: Optional[dict] = None) -> list[tuple[str, bytes]]:
+        """
+        monorepo：公共命令和文档按主配置（根目录的包，没有时为第一个包）生成一次，
+        再为每个包生成 .claude/commands/packages/<包>.md，参考文档覆盖所有包的语言
+
+        piv-config.json 中的 "packages": {"<包路径>": {...}} 可以单独覆盖某个包的配置。
+        只渲染不写入，返回值同 plan()。
+        """
+        override = override or {}
+        package_overrides = override.get("packages", {})
+        configs = [self._merge_config(c, package_overrides[c.path]) if c.path in package_overrides else c
+                   for c in configs]
+        primary = next((c for c in configs if c.path == "."), configs[0])
+        if primary.path != ".":
+            primary = self._merge_config(primary, {"name": self.project_path.resolve().name})
+
+        shared = {k: v for k, v in override.items() if k != "packages"}
+        if shared:
+            primary = self._merge_config(primary, shared)
+
+        self.config = primary
+        self.packages = configs
+        self._generate(primary)
+        for config in configs:
+            if config.language != primary.language:
+                self._generate_references(config)
+        self._generate_package_commands(configs)
+        return self.pending
+
+    def _generate_package_commands(self, configs: list[ProjectConfig]) -> None:
+        """为每个包生成一个命令文件，列出在该包目录下运行的安装、lint、格式化和测试命令"""
+        for config in configs:
+            r = self._get_replacements(config)
+            slug = "root" if config.path == "." else config.path.replace("/", "-")
+            framework = f" ({config.framework})" if config.framework else ""
+            content = f"""---
+description: 在 {config.path} 包中运行安装、lint 和测试
+---
+
+# /packages:{slug}：{config.name}
+
+- 路径: `{config.path}`
+- 语言: {config.language}{framework}
+- 包管理器: {config.package_manager.value}
+- 测试框架: {config.test_framework.value}
+- Linter: {config.linter.value}
+
+## 命令
+
+```bash
+cd {config.path}
+{r["install"]}
+{r["lint_command"]}
+{r["format_command"]}
+{r["test_command"]}
+```
+"""
+            self._emit(f".claude/commands/packages/{slug}.md", content.encode("utf-8"))
 
     def _merge_config(self, base: ProjectConfig, override: dict) -> ProjectConfig:
         """合并覆盖配置"""
@@ -241,11 +868,12 @@ class ConfigGenerator:
             framework=override.get("framework", base.framework),
             commands=override.get("commands", base.commands),
             skip_reference=override.get("skip_reference", base.skip_reference),
+            path=base.path,
         )
 
     def _create_directories(self) -> None:
-        """创建目录结构"""
-        dirs = [
+        """计划目录结构（由 apply() 创建）"""
+        self.directories = [
             ".claude/commands/core_piv_loop",
             ".claude/commands/validation",
             ".claude/commands/github_bug_fix",
@@ -255,8 +883,6 @@ class ConfigGenerator:
             ".agents/code-reviews",
             ".agents/system-reviews",
         ]
-        for d in dirs:
-            (self.project_path / d).mkdir(parents=True, exist_ok=True)
 
     def _get_replacements(self, config: ProjectConfig) -> dict:
         """获取模板替换值"""
@@ -271,6 +897,8 @@ class ConfigGenerator:
         return {
             **framework_replacements,
             **pm_commands,
+            "install_command": pm_commands["install"],
+            "package_manager": pm,
             "language": config.language,
             "framework": config.framework or "",
             "project_name": config.name,
@@ -291,17 +919,18 @@ class ConfigGenerator:
             self._process_template(templates_dir / "github_bug_fix", ".claude/commands/github_bug_fix", replacements)
 
         # commit 命令
-        self._copy_template(templates_dir / "commit.md", ".claude/commands/commit.md")
+        self._process_template(templates_dir / "commit.md", ".claude/commands/commit.md", replacements)
 
         # init-project 命令
         self._process_template(templates_dir / "init-project.md", ".claude/commands/init-project.md", replacements)
 
         # create-prd 命令
-        self._copy_template(templates_dir / "create-prd.md", ".claude/commands/create-prd.md")
+        self._process_template(templates_dir / "create-prd.md", ".claude/commands/create-prd.md", replacements)
 
     def _generate_references(self, config: ProjectConfig) -> None:
         """生成参考文档"""
         templates_dir = self.skill_path / "templates" / "reference"
+        replacements = self._get_replacements(config)
         lang = config.language
 
         # 根据语言选择参考文档
@@ -316,22 +945,23 @@ class ConfigGenerator:
 
         for ref in refs:
             if ref not in config.skip_reference:
-                self._copy_template(templates_dir / ref, f".claude/reference/{ref}")
+                self._process_template(templates_dir / ref, f".claude/reference/{ref}", replacements)
 
         # 部署最佳实践（通用）
         if "deployment-best-practices.md" not in config.skip_reference:
-            self._copy_template(templates_dir / "deployment-best-practices.md", ".claude/reference/deployment-best-practices.md")
+            self._process_template(templates_dir / "deployment-best-practices.md",
+                                   ".claude/reference/deployment-best-practices.md", replacements)
 
     def _generate_agents_readme(self, config: ProjectConfig) -> None:
         """生成 .agents/README.md"""
         template = self.skill_path / "assets" / "agents-readme-template.md"
         if template.exists():
-            content = template.read_text()
-            content = content.replace("{{project_name}}", config.name)
-            content = content.replace("{{language}}", config.language)
-            content = content.replace("{{test_framework}}", config.test_framework.value)
-            content = content.replace("{{package_manager}}", config.package_manager.value)
-            (self.project_path / ".agents" / "README.md").write_text(content)
+            self._process_file(template, ".agents/README.md", {
+                "project_name": config.name,
+                "language": config.language,
+                "test_framework": config.test_framework.value,
+                "package_manager": config.package_manager.value,
+            })
 
     def _update_claude_md(self, config: ProjectConfig) -> None:
         """更新 CLAUDE.md"""
@@ -360,40 +990,185 @@ class ConfigGenerator:
 """
         if "## PIV Loop 工作流" not in content:
             content += piv_section
-            claude_md.write_text(content)
+            self.pending.append(("CLAUDE.md", content.encode("utf-8")))
 
-    def _process_template(self, src_dir: Path, dst_dir: Path, replacements: dict) -> None:
-        """处理模板目录"""
+    def _process_template(self, src_dir: Path, dst_dir: str, replacements: dict) -> None:
+        """处理模板目录（也可以是单个模板文件）"""
+        if src_dir.is_file():
+            self._process_file(src_dir, dst_dir, replacements)
+            return
         if not src_dir.exists():
             return
-        for src in src_dir.rglob("*.md"):
+        for src in sorted(src_dir.rglob("*.md")):
             rel = src.relative_to(src_dir)
-            dst = dst_dir / rel
-            self._process_file(src, dst, replacements)
+            self._process_file(src, f"{dst_dir}/{rel.as_posix()}", replacements)
 
-    def _process_file(self, src: Path, dst: Path, replacements: dict) -> None:
+    def _process_file(self, src: Path, dst: str, replacements: dict) -> None:
         """处理单个模板文件"""
-        content = src.read_text()
-        for key, value in replacements.items():
-            content = content.replace(f"{{{{{key}}}}}", str(value))
-        dst.parent.mkdir(parents=True, exist_ok=True)
-        dst.write_text(content)
-
-    def _copy_template(self, src: Path, dst: Path) -> None:
-        """复制模板文件"""
-        if src.exists():
-            shutil.copy2(src, dst)
-
-
-def main():
-    """主入口"""
-    # 查找 skill 根目录
-    skill_path = Path(__file__).parent.parent
+        source, digest = self.templates.read(src)
+        self._emit(dst, source, replacements, digest)
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _load_manifest(self) -> dict:
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"files": {}}
+        return manifest if isinstance(manifest.get("files"), dict) else {"files": {}}
+
+    def _emit(self, dst: str, source: bytes, replacements: Optional[dict] = None, source_hash: str = None) -> None:
+        """
+        计划一个输出文件（dst 相对项目根目录），需要写入时加入 pending
+
+        模板哈希和替换值与清单一致、且输出文件未被改动时直接跳过，不读取也不渲染；
+        渲染结果与现有文件相同时也不写入，保持 mtime 不变。
+        模板中没有对应值或值为空的占位符记录在 warnings 中（跳过时沿用清单中的记录）。
+        同一输出文件只按第一次计划生成（monorepo 中多种语言共用的参考文档按主配置渲染）。
+        """
+        rel = Path(dst).as_posix()
+        if rel in self.outputs:
+            return
+        target = self.project_path / rel
+        values = {key: str(value) for key, value in (replacements or {}).items()}
+        source_hash = source_hash or self._hash(source)
+        entry = self.manifest["files"].get(rel)
+
+        if entry and entry["source"] == source_hash and entry["values"] == values and self._intact(target, entry):
+            self.outputs[rel] = entry
+            self.skipped.append(rel)
+            if entry.get("warnings"):
+                self.warnings[rel] = entry["warnings"]
+            return
 
-    # 解析参数
-    project_path = Path.cwd()
-    debug = "--debug" in sys.argv
+        content, warnings = source, []
+        if replacements is not None:
+            template = self.templates.compile(source, source_hash)
+            text, warnings = template.render(values)
+            warnings += sorted(name for name in template.placeholders if name in values and not values[name])
+            content = text.encode("utf-8")
+            if warnings:
+                self.warnings[rel] = warnings
+        output_hash = self._hash(content)
+
+        # 写入后的大小和 mtime 由 apply() 填入
+        size, mtime_ns = len(content), None
+        if target.is_file() and self._hash(target.read_bytes()) == output_hash:
+            stat = target.stat()
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+            self.skipped.append(rel)
+        else:
+            self.pending.append((rel, content))
+
+        self.outputs[rel] = {
+            "source": source_hash,
+            "values": values,
+            "output": output_hash,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "warnings": warnings,
+        }
 
+    def apply(self, workers: int = 1) -> list[str]:
+        """
+        一次性执行计划：先创建所有需要的目录（只对最深的目录调用一次 mkdir），
+        再写入 pending 中的文件，workers > 1 时用线程并行写入。返回写入的文件列表。
+        """
+        dirs = {self.project_path / d for d in self.directories}
+        dirs |= {(self.project_path / rel).parent for rel, _ in self.pending}
+        for d in sorted(dirs):
+            if not any(d in other.parents for other in dirs):
+                d.mkdir(parents=True, exist_ok=True)
+
+        def write(item: tuple[str, bytes]) -> tuple[str, os.stat_result]:
+            rel, content = item
+            target = self.project_path / rel
+            target.write_bytes(content)
+            return rel, target.stat()
+
+        if workers > 1 and len(self.pending) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                done = list(pool.map(write, self.pending))
+        else:
+            done = [write(item) for item in self.pending]
+
+        for rel, stat in done:
+            if rel in self.outputs:
+                self.outputs[rel].update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            self.written.append(rel)
+        self.pending = []
+        return self.written
+
+    def print_plan(self) -> None:
+        """打印计划：将创建的目录、将写入的文件及与现有内容的 unified diff（不修改磁盘）"""
+        for d in self.directories:
+            if not (self.project_path / d).is_dir():
+                print(f"创建目录: {d}/")
+        for rel, content in self.pending:
+            target = self.project_path / rel
+            old = target.read_bytes() if target.is_file() else b""
+            print(f"{'修改' if target.is_file() else '新建'}: {rel}")
+            diff = difflib.unified_diff(
+                old.decode("utf-8", errors="replace").splitlines(keepends=True),
+                content.decode("utf-8", errors="replace").splitlines(keepends=True),
+                f"a/{rel}", f"b/{rel}",
+            )
+            for line in diff:
+                print(line if line.endswith("\n") else line + "\n", end="")
+        print()
+
+    def _intact(self, target: Path, entry: dict) -> bool:
+        """输出文件是否仍是上次生成的内容（先比较大小和 mtime，不一致时再比较哈希）"""
+        try:
+            stat = target.stat()
+        except OSError:
+            return False
+        if stat.st_size == entry.get("size") and stat.st_mtime_ns == entry.get("mtime_ns"):
+            return True
+        return stat.st_size == entry.get("size") and self._hash(target.read_bytes()) == entry.get("output")
+
+    def _finish(self) -> None:
+        """写入清单（只保留本次生成的文件）"""
+        if self.outputs != self.manifest["files"]:
+            self.manifest = {"files": dict(sorted(self.outputs.items()))}
+            self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+            tmp.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2))
+            os.replace(tmp, self.manifest_path)
+        self.templates.save()
+
+
+def detect_project(project_path: Path, monorepo: bool = False,
+                   cache: DetectionCache = None) -> tuple[list[ProjectConfig], list[ProjectDetector]]:
+    """
+    检测项目配置（monorepo 模式下每个包一个）
+
+    返回 (配置列表, 检测器列表)；命中检测缓存时检测器列表为空。
+    """
+    if cache is not None:
+        configs = cache.load(monorepo)
+        if configs is not None:
+            return configs, []
+
+    if monorepo:
+        detectors = list(MonorepoDetector(project_path).packages.values())
+        return MonorepoDetector.select(detectors), detectors
+    detectors = [ProjectDetector(project_path)]
+    return [detectors[0].detect()], detectors
+
+
+def setup_project(skill_path: Path, project_path: Path, monorepo: bool = False, debug: bool = False,
+                  templates: TemplateCache = None, use_cache: bool = True, dry_run: bool = False,
+                  workers: int = 1) -> dict:
+    """
+    检测并为一个项目生成配置（dry_run 时只打印计划和 diff，不修改磁盘）
+
+    返回:
+        {"path", "configs": [ProjectConfig], "written", "skipped", "warnings"}
+        dry_run 时 written 为将要写入的文件
+    """
     # 查找覆盖配置
     config_file = project_path / "piv-config.json"
     override = None
@@ -403,20 +1178,168 @@ def main():
         if debug:
             print(f"使用覆盖配置: {override}")
 
-    # 检测项目类型
-    detector = ProjectDetector(project_path)
-    config = detector.detect()
+    generator = ConfigGenerator(skill_path, project_path, templates)
+
+    cache = DetectionCache(project_path)
+    configs, detectors = detect_project(project_path, monorepo, cache if use_cache else None)
+    if debug and not detectors:
+        print(f"使用检测缓存: {cache.path}")
+
+    # monorepo：一次遍历检测所有包
+    if monorepo:
+        if debug:
+            print(f"检测到 {len(configs)} 个包:")
+            for c in configs:
+                print(f"  {c.path}: {c.language} / {c.package_manager} / {c.test_framework} / {c.linter}")
+        generator.generate_monorepo(configs, override, dry_run, workers)
+    else:
+        config = configs[0]
+        if debug:
+            print(f"检测到的配置:")
+            print(f"  语言: {config.language}")
+            print(f"  包管理器: {config.package_manager}")
+            print(f"  测试框架: {config.test_framework}")
+            print(f"  Linter: {config.linter}")
+
+        # 生成配置
+        generator.generate(config, override, dry_run, workers)
 
     if debug:
-        print(f"检测到的配置:")
-        print(f"  语言: {config.language}")
-        print(f"  包管理器: {config.package_manager}")
-        print(f"  测试框架: {config.test_framework}")
-        print(f"  Linter: {config.linter}")
+        for rel in generator.skipped:
+            print(f"  跳过 (未变化): {rel}")
+
+    # 生成之后再记录指纹：首次生成会在根目录创建 .claude/、.agents/ 等，改变根目录的 mtime
+    if detectors and not dry_run:
+        cache.save(monorepo, configs, detectors)
+
+    return {
+        "path": str(project_path),
+        "configs": configs,
+        "written": [rel for rel, _ in generator.pending] if dry_run else generator.written,
+        "skipped": generator.skipped,
+        "warnings": generator.warnings,
+    }
+
 
-    # 生成配置
-    generator = ConfigGenerator(skill_path, project_path)
-    generator.generate(config, override)
+def list_projects(source: Path) -> list[Path]:
+    """目录：返回其中的每个子目录（不含隐藏目录）；文件：每行一个项目路径，忽略空行和 # 注释"""
+    if source.is_dir():
+        return sorted(p for p in source.iterdir() if p.is_dir() and not p.name.startswith("."))
+    lines = source.read_text().splitlines()
+    return [Path(line.strip()).expanduser() for line in lines if line.strip() and not line.startswith("#")]
+
+
+def _init_fleet_worker(state: dict) -> None:
+    """工作进程初始化：使用主进程已读取和编译的模板"""
+    global TEMPLATES
+    TEMPLATES = TemplateCache.from_state(state)
+
+
+def _fleet_task(skill_path: Path, project_path: Path, monorepo: bool, use_cache: bool, dry_run: bool) -> dict:
+    """在工作进程中配置一个项目，屏蔽逐项目输出，异常作为失败结果返回"""
+    start = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = setup_project(skill_path, project_path, monorepo, templates=TEMPLATES, use_cache=use_cache,
+                                   dry_run=dry_run)
+        result["error"] = None
+    except Exception as e:
+        result = {"path": str(project_path), "configs": [], "written": [], "skipped": [], "warnings": {},
+                  "error": f"{type(e).__name__}: {e}"}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def fleet(skill_path: Path, projects: list[Path], workers: Optional[int] = None, monorepo: bool = False,
+          templates: TemplateCache = None, use_cache: bool = True, dry_run: bool = False) -> list[dict]:
+    """
+    用进程池为多个项目配置 PIV Loop
+
+    模板在主进程中读取和编译一次，通过进程初始化函数传给每个工作进程。
+    返回每个项目一个结果字典（结构同 setup_project()，另有 error 和 seconds），顺序与输入一致。
+    """
+    templates = templates if templates is not None else TEMPLATES
+    templates.preload(skill_path / "templates")
+    templates.preload(skill_path / "assets")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(projects) or 1))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_fleet_worker,
+                             initargs=(templates.state(),)) as pool:
+        futures = [pool.submit(_fleet_task, skill_path, p.resolve(), monorepo, use_cache, dry_run)
+                   for p in projects]
+        results = [f.result() for f in futures]
+
+    templates.save()
+    return results
+
+
+def display_width(text: str) -> int:
+    """终端显示宽度（中文等全角字符占两列）"""
+    return sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+
+
+def print_fleet_summary(results: list[dict], elapsed: float) -> None:
+    """打印批量配置结果表格"""
+    rows = [("项目", "语言", "包管理器", "测试框架", "Linter", "更新/跳过", "耗时")]
+    for r in results:
+        name = Path(r["path"]).name
+        if r["error"]:
+            rows.append((name, "失败", "-", "-", "-", "-", f"{r['seconds']:.2f}s"))
+            continue
+        for c in r["configs"]:
+            label = name if c.path == "." else f"{name}/{c.path}"
+            rows.append((label, c.language, c.package_manager.value, c.test_framework.value, c.linter.value,
+                         f"{len(r['written'])}/{len(r['skipped'])}", f"{r['seconds']:.2f}s"))
+
+    widths = [max(display_width(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for i, row in enumerate(rows):
+        print("  ".join(cell + " " * (width - display_width(cell)) for cell, width in zip(row, widths)).rstrip())
+        if i == 0:
+            print("  ".join("-" * width for width in widths))
+
+    failed = [r for r in results if r["error"]]
+    print(f"\n完成: {len(results) - len(failed)} 个项目，失败 {len(failed)}，总耗时 {elapsed:.1f}s")
+    for r in failed:
+        print(f"  失败: {r['path']}: {r['error']}")
+
+
+def main():
+    """主入口"""
+    # 查找 skill 根目录
+    skill_path = Path(__file__).parent.parent
+
+    # 解析参数
+    project_path = Path.cwd()
+    debug = "--debug" in sys.argv
+    monorepo = "--monorepo" in sys.argv
+    templates = TemplateCache(DEFAULT_TEMPLATE_CACHE_DIR) if "--template-cache" in sys.argv else TEMPLATES
+    use_cache = "--rescan" not in sys.argv
+    dry_run = "--dry-run" in sys.argv
+
+    fleet_source = None
+    workers = None
+    threads = 1
+    for i, arg in enumerate(sys.argv[1:], start=1):
+        if arg == "--fleet" and i + 1 < len(sys.argv):
+            fleet_source = Path(sys.argv[i + 1]).expanduser()
+        elif arg == "--workers" and i + 1 < len(sys.argv):
+            workers = int(sys.argv[i + 1])
+        elif arg == "--threads" and i + 1 < len(sys.argv):
+            threads = int(sys.argv[i + 1])
+
+    # 批量配置多个项目
+    if fleet_source is not None:
+        projects = list_projects(fleet_source)
+        if not projects:
+            print(f"错误: 未找到项目: {fleet_source}")
+            sys.exit(1)
+        print(f"批量配置 {len(projects)} 个项目...")
+        start = time.perf_counter()
+        results = fleet(skill_path, projects, workers, monorepo, templates, use_cache, dry_run)
+        print_fleet_summary(results, time.perf_counter() - start)
+        sys.exit(1 if any(r["error"] for r in results) else 0)
+
+    setup_project(skill_path, project_path, monorepo, debug, templates, use_cache, dry_run, threads)
 
 
 if __name__ == "__main__":